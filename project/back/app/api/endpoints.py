@@ -1,16 +1,49 @@
+import logging
+from typing import Any, Dict, List, Optional
+
 from fastapi import APIRouter, HTTPException, UploadFile, File, Body
-from app.services import ingestion, statistics, quantitative
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from app.api.responses import RespuestaJSON, serializar
+from app.services import ingestion, statistics, analysis, aggregates, calentamiento, consultas, executor, jobs, metrics, model_registry
+from app.services.cache import dataset_cache
+from app.services.result_cache import result_cache
 from app.schemas.analysis import ParetoResponse, AnalisisRequest
-import pandas as pd
-import numpy as np
-import os
-import csv
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 @router.get("/health")
 def health_check():
-    return {"status": "ok", "sistema": "listo para analizar"}
+    return {"status": "ok", "sistema": "listo para analizar", "precalentamiento": calentamiento.estado()}
+
+@router.get("/cache/stats")
+def cache_stats():
+    """
+    Estadísticas de la caché de datasets (hits, misses, memoria usada).
+    """
+    return dataset_cache.estadisticas()
+
+@router.get("/cache/resultados/stats")
+def cache_resultados_stats():
+    """
+    Estadísticas de la caché de resultados de análisis (hits, misses, entradas).
+    """
+    return result_cache.estadisticas()
+
+@router.get("/ejecutor/stats")
+def ejecutor_stats():
+    """
+    Profundidad de cola, ejecuciones en curso y tiempos excedidos por herramienta.
+    """
+    return executor.estadisticas()
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def metricas():
+    """
+    Métricas en formato Prometheus: latencias por ruta y por etapa de análisis,
+    memoria del proceso, cachés y ejecutor.
+    """
+    return PlainTextResponse(metrics.exposicion(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 @router.post("/upload")
 async def upload_data(file: UploadFile = File(...)):
@@ -18,183 +51,233 @@ async def upload_data(file: UploadFile = File(...)):
     Recibe un archivo (CSV/Excel), lo guarda y retorna un resumen básico.
     """
     # Llamamos a la capa de servicio (la lógica real)
-    summary = await ingestion.process_upload(file)
+    try:
+        summary = await ingestion.process_upload(file)
+    except ValueError as e:
+        # Archivo que no se puede leer o tipar (delimitador, codificación, valores incompatibles)
+        raise HTTPException(status_code=400, detail=f"No se pudo procesar el archivo: {str(e)}")
     return summary  
 
-@router.post("/analizar/pareto", response_model=ParetoResponse)
+@router.post("/datasets/{filename}/append")
+async def append_data(filename: str, file: UploadFile = File(...)):
+    """
+    Agrega las filas de un archivo (mismas columnas) a un dataset ya subido.
+    Los análisis incrementales se actualizan solo con las filas nuevas.
+    """
+    try:
+        return await ingestion.process_append(filename, file)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Archivo no encontrado. Súbelo primero.")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/datasets/{filename}/profile")
+async def perfil_dataset(filename: str):
+    """
+    Perfil de cada columna: dtype, tipo (numerica, categorica, fecha, texto, booleana),
+    nulos, cardinalidad, mínimo/máximo, valores más frecuentes y si parece fecha.
+    """
+    try:
+        perfil = await executor.ejecutar("carga", ingestion.perfil_dataset, filename)
+        return RespuestaJSON(perfil.a_dict())
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Archivo no encontrado. Súbelo primero.")
+
+@router.post("/analizar/pareto", response_model=ParetoResponse, response_model_exclude_none=True)
 async def ejecutar_pareto(
     filename: str = Body(..., embed=True), 
-    columna: str = Body(..., embed=True)
+    columna: str = Body(..., embed=True),
+    filtros: Optional[List[Dict[str, Any]]] = Body(None, embed=True),
+    columna_valor: Optional[str] = Body(None, embed=True),
+    top_n: Optional[int] = Body(None, embed=True),
+    offset: int = Body(0, embed=True),
+    limit: Optional[int] = Body(None, embed=True)
 ):
     """
     Carga un archivo previamente subido y ejecuta el análisis de Pareto
-    sobre la columna especificada.
+    sobre la columna especificada (solo sobre las filas que cumplen `filtros`, si se indican).
+    - columna_valor: Pareto ponderado por la suma de esa columna numérica en vez de filas
+    - top_n: solo las primeras categorías; el resto se agrupa por clase ABC en `otros`
+    - offset / limit: página del ranking (total_categorias indica cuántas hay)
     """
-    file_path = f"data/{filename}"
-    
-    if not os.path.exists(file_path):
-        raise HTTPException(status_code=404, detail="Archivo no encontrado. Súbelo primero.")
-
+    pagina = (top_n, offset, limit)
     try:
-        # 1. Cargar datos (reutilizando lógica básica)
-        if filename.endswith('.csv'):
-            # Detectar el delimitador automáticamente como en process_upload
-            with open(file_path, 'r', encoding='utf-8') as f:
-                sample = f.read(4096)  # Leer primeros 4KB
-                sniffer = csv.Sniffer()
-                delimiter = sniffer.sniff(sample).delimiter
-            df = pd.read_csv(file_path, sep=delimiter, encoding='utf-8')
-        elif filename.endswith('.xlsx'):
-            df = pd.read_excel(file_path)
-        else:
-            raise HTTPException(status_code=400, detail="Formato no soportado")
-
-        # Limpiar valores numéricos con formato ($, B, M, K)
-        df = ingestion.limpiar_dataframe(df)
+        if consultas.activo():
+            # Motor SQL embebido: conteo sobre el archivo columnar, sin cargar la columna en pandas
+            resultado, total = await executor.ejecutar(
+                "pareto", consultas.pareto, filename, columna, filtros, columna_valor, *pagina
+            )
+            return {"columna_analizada": columna, "total_registros": total, "columna_valor": columna_valor, **resultado}
+
+        if not filtros and not columna_valor:
+            # Datasets con filas anexadas: conteos incrementales, sin recorrer todo el historial
+            incremental = await executor.ejecutar("pareto", _pareto_incremental, filename, columna, pagina)
+            if incremental is not None:
+                resultado, total = incremental
+                return {"columna_analizada": columna, "total_registros": total, **resultado}
+
+        # 1. Cargar solo las columnas analizadas (desde el almacenamiento columnar / caché)
+        columnas = [columna] + ([columna_valor] if columna_valor else [])
+        df = await executor.ejecutar("carga", ingestion.cargar_dataset, filename, columnas, filtros)
 
         # 2. Ejecutar lógica de Pareto
-        resultados = statistics.calcular_pareto(df, columna)
+        resultado = await executor.ejecutar(
+            "pareto", statistics.calcular_pareto, df, columna, columna_valor, *pagina
+        )
 
         # 3. Retornar respuesta estructurada
         return {
             "columna_analizada": columna,
             "total_registros": len(df),
-            "items": resultados
+            "columna_valor": columna_valor,
+            **resultado
         }
 
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Archivo no encontrado. Súbelo primero.")
+    except executor.TiempoExcedido as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error interno: {str(e)}")
 
 
+def _pareto_incremental(filename, columna, pagina):
+    return aggregates.pareto(
+        ingestion.ruta_dataset(filename), columna, lambda columnas: ingestion.cargar_dataset(filename, columnas), *pagina
+    )
+
+
 @router.post("/analizar/cuantitativo")
-async def ejecutar_analisis_cuantitativo(request: AnalisisRequest):
+async def ejecutar_analisis_cuantitativo(request: AnalisisRequest, profile: bool = False):
     """
     Endpoint maestro para todas las herramientas de análisis (Descriptivo, Inferencial, ML, NLP).
+    El header X-Cache indica si el resultado se reutilizó (hit) o se calculó (miss);
+    con parametros.guardar_modelo no se usa la caché (bypass): cada request registra su modelo.
+    Con ?profile=1 se calcula sin caché y la respuesta trae {"resultado", "perfil"}:
+    milisegundos por etapa y el resumen de cProfile de cada una.
     """
-    file_path = f"data/{request.filename}"
-    
-    if not os.path.exists(file_path):
-        raise HTTPException(status_code=404, detail="Archivo no encontrado. Sube el archivo primero.")
-
     try:
-        # 1. Cargar el DataFrame
-        if request.filename.endswith('.csv'):
-            with open(file_path, 'r', encoding='utf-8') as f:
-                sample = f.read(4096)  # Leer primeros 4KB
-                sniffer = csv.Sniffer()
-                delimiter = sniffer.sniff(sample).delimiter
-            df = pd.read_csv(file_path, sep=delimiter, encoding='utf-8')
-        elif request.filename.endswith('.xlsx'):
-            df = pd.read_excel(file_path)
-
-        # Limpiar valores numéricos con formato ($, B, M, K)
-        df = ingestion.limpiar_dataframe(df)
-
-        # 2. Router de lógica (Switch-Case según herramienta)
-        tool = request.tipo_analisis
-        
-        # --- A. ESTADÍSTICA DESCRIPTIVA ---
-        if tool == "resumen":
-            # Requiere lista de columnas numéricas (columnas_x)
-            return quantitative.descriptivo_resumen(df, request.columnas_x)
-            
-        elif tool == "frecuencias":
-            # Requiere una columna (usaremos la primera de x)
-            if not request.columnas_x: raise ValueError("Seleccione una variable.")
-            return quantitative.descriptivo_frecuencias(df, request.columnas_x[0])
-            
-        elif tool == "correlacion":
-            # Usa todas las numéricas del DF, no requiere inputs
-            return quantitative.descriptivo_correlacion(df)
-            
-        elif tool == "outliers":
-            # Requiere una columna numérica
-            if not request.columnas_x: raise ValueError("Seleccione una variable numérica.")
-            return quantitative.descriptivo_outliers(df, request.columnas_x[0])
-
-        # --- B. ESTADÍSTICA INFERENCIAL ---
-        elif tool == "ttest":
-            # Compara 2 grupos. Y = Columna Grupo (Cat), X[0] = Columna Valor (Num)
-            if not request.columna_y or not request.columnas_x: 
-                raise ValueError("Se requiere una variable de grupo (Y) y una numérica (X).")
-            return quantitative.inferencial_ttest(df, request.columna_y, request.columnas_x[0])
-            
-        elif tool == "anova":
-            # Compara 3+ grupos. Mismos inputs que T-Test
-            return quantitative.inferencial_anova(df, request.columna_y, request.columnas_x[0])
-
-        # --- C. MODELOS PREDICTIVOS ---
-        elif tool == "regresion_lineal":
-            # Y = Target (Num), X = Features (Lista Num)
-            return quantitative.predictivo_regresion_lineal(df, request.columna_y, request.columnas_x)
-            
-        elif tool == "regresion_logistica":
-            # Y = Target (Cat/Binario), X = Features (Lista Num)
-            return quantitative.predictivo_regresion_logistica(df, request.columna_y, request.columnas_x)
-            
-        elif tool == "arbol_decision":
-            # Y = Target, X = Features
-            return quantitative.predictivo_arbol_decision(df, request.columna_y, request.columnas_x)
-
-        # --- D. NO SUPERVISADO ---
-        elif tool == "kmeans":
-            # X = Features (Lista Num). Parametros opcionales n_clusters
-            n_clusters = int(request.parametros.get("n_clusters", 3))
-            return quantitative.unsupervised_kmeans(df, request.columnas_x, n_clusters)
-
-        # --- E. NLP (TEXTO) ---
-        elif tool == "nube_palabras":
-            # Y = Columna de texto
-            if not request.columna_y: raise ValueError("Seleccione la columna de texto.")
-            return quantitative.nlp_frecuencia_palabras(df, request.columna_y)
-            
-        elif tool == "sentimiento":
-            # Y = Columna de texto
-            if not request.columna_y: raise ValueError("Seleccione la columna de texto.")
-            return quantitative.nlp_sentimiento(df, request.columna_y)
-
-        # ... dentro del if/else ...
-
-        # --- F. RANDOM FOREST ---
-        elif tool == "random_forest":
-            # Detectar regresión o clasificación basado en Target
-            if np.issubdtype(df[request.columna_y].dtype, np.number):
-                tipo = "regresion"
-            else:
-                tipo = "clasificacion"
-            return quantitative.predictivo_random_forest(df, request.columna_y, request.columnas_x, tipo)
-
-        # --- G. SERIES DE TIEMPO (DESCOMPOSICIÓN) ---
-        elif tool == "descomposicion_serie":
-            # X = Columna Fecha, Y = Columna Valor
-            # Parametros opcionales: periodo (ej. 12 meses)
-            periodo = int(request.parametros.get("periodo", 12))
-            return quantitative.series_tiempo_descomposicion(df, request.columnas_x[0], request.columna_y, periodo)
-
-        # --- H. TABLA DINÁMICA ---
-        elif tool == "pivot_table":
-            # Requiere parametros específicos en el request o mapearlos
-            # Usaremos: Y = Index, X[0] = Columns, X[1] = Values
-            if len(request.columnas_x) < 2: 
-                raise ValueError("Para Pivot Table se requieren 2 columnas en X: [Columnas, Valores]")
-            
-            index_col = request.columna_y
-            columns_col = request.columnas_x[0]
-            values_col = request.columnas_x[1]
-            agg = request.parametros.get("aggfunc", "sum") # sum, mean, count
-            
-            return quantitative.wrangling_pivot_table(df, index_col, columns_col, values_col, agg)
-        
-
-        else:
-            raise HTTPException(status_code=400, detail=f"Herramienta '{tool}' no reconocida.")
+        if profile:
+            perfiles = {}
+            resultado = await analysis.analizar(request, perfiles=perfiles)
+            perfil = {"tiempos_ms": metrics.tiempos_por_etapa(metrics.peticion_actual()), **perfiles}
+            return RespuestaJSON({"resultado": resultado, "perfil": perfil}, headers={"X-Cache": "bypass"})
 
+        # Cargar las columnas necesarias y ejecutar la herramienta fuera del event loop
+        resultado, estado_cache = await analysis.analizar_memoizado(request)
+        # Serialización directa con orjson (numpy, NaN), sin jsonable_encoder
+        return RespuestaJSON(resultado, headers={"X-Cache": estado_cache})
+
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Archivo no encontrado. Sube el archivo primero.")
+    except executor.TiempoExcedido as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except ValueError as ve:
         # Errores de validación de datos (ej. faltan columnas)
         raise HTTPException(status_code=400, detail=str(ve))
     except Exception as e:
         # Errores internos (código, librerías)
-        print(f"Error procesando {request.tipo_analisis}: {str(e)}") # Log en consola
-        raise HTTPException(status_code=500, detail=f"Error interno en el análisis: {str(e)}")
\ No newline at end of file
+        logger.exception("Error procesando %s", request.tipo_analisis)
+        raise HTTPException(status_code=500, detail=f"Error interno en el análisis: {str(e)}")
+
+
+# --- MODELOS GUARDADOS (parametros["guardar_modelo"] en /analizar/cuantitativo) ---
+
+@router.get("/modelos")
+def listar_modelos():
+    return model_registry.listar()
+
+@router.get("/modelos/{modelo_id}")
+def obtener_modelo(modelo_id: str):
+    try:
+        return model_registry.obtener_metadatos(modelo_id)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Modelo no encontrado.")
+
+@router.delete("/modelos/{modelo_id}")
+def eliminar_modelo(modelo_id: str):
+    try:
+        model_registry.eliminar(modelo_id)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Modelo no encontrado.")
+    return {"modelo_id": modelo_id, "eliminado": True}
+
+@router.post("/modelos/{modelo_id}/predecir")
+async def predecir_con_modelo(modelo_id: str, file: UploadFile = File(...)):
+    """
+    Puntúa un archivo nuevo (mismas columnas de entrada) con un modelo guardado, sin reentrenar.
+    """
+    try:
+        return RespuestaJSON(await analysis.predecir_archivo(modelo_id, file))
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Modelo no encontrado.")
+    except executor.TiempoExcedido as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+# --- TRABAJOS ASÍNCRONOS (análisis largos con consulta de resultado) ---
+
+@router.post("/jobs", status_code=202)
+async def crear_trabajo(request: AnalisisRequest):
+    """
+    Encola un análisis y retorna de inmediato su job_id.
+    El resultado se consulta en GET /jobs/{job_id} o se sigue por SSE en /jobs/{job_id}/eventos.
+    """
+    trabajo = jobs.crear(request)
+    return {
+        "job_id": trabajo.id,
+        "estado": trabajo.estado,
+        "url_estado": f"/api/v1/jobs/{trabajo.id}",
+        "url_eventos": f"/api/v1/jobs/{trabajo.id}/eventos",
+    }
+
+@router.get("/jobs")
+def listar_trabajos():
+    return jobs.listar()
+
+@router.get("/jobs/{job_id}")
+def estado_trabajo(job_id: str):
+    """
+    Estado, etapa y progreso del trabajo; incluye el resultado cuando está completado.
+    """
+    trabajo = jobs.obtener(job_id)
+    if trabajo is None:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado o expirado.")
+    return RespuestaJSON(trabajo.a_dict())
+
+@router.delete("/jobs/{job_id}")
+async def cancelar_trabajo(job_id: str):
+    # async: la cancelación de la tarea y el aviso a los suscriptores ocurren en el event loop
+    trabajo = jobs.cancelar(job_id)
+    if trabajo is None:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado o expirado.")
+    return trabajo.a_dict(incluir_resultado=False)
+
+@router.get("/jobs/{job_id}/eventos")
+async def eventos_trabajo(job_id: str):
+    """
+    Server-Sent Events con el progreso del trabajo; el último evento ('fin') trae el resultado.
+    """
+    trabajo = jobs.obtener(job_id)
+    if trabajo is None:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado o expirado.")
+
+    async def emitir():
+        while True:
+            version = trabajo.version
+            terminado = trabajo.terminado
+            evento = "fin" if terminado else "progreso"
+            datos = serializar(trabajo.a_dict(incluir_resultado=terminado)).decode("utf-8")
+            yield f"event: {evento}\ndata: {datos}\n\n"
+            if terminado:
+                return
+            # Un cambio ocurrido mientras se enviaba el evento se emite enseguida (la versión ya difiere).
+            # Sin cambios en 15 s: comentario SSE para mantener viva la conexión
+            while not await trabajo.esperar_cambio(version, timeout=15):
+                yield ": ping\n\n"
+
+    return StreamingResponse(emitir(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
@@ -0,0 +1,46 @@
+import time
+
+from starlette.datastructures import MutableHeaders
+
+from app.services import metrics
+
+# Medición de cada petición HTTP (middleware ASGI puro, sin envolver el cuerpo).
+# Abre el contexto de medición de services/metrics, agrega el header
+# Server-Timing con las etapas medidas hasta el inicio de la respuesta y
+# registra la duración total en analitica_http_solicitud_segundos.
+
+
+class MedicionRequests:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        inicio = time.perf_counter()
+        token = metrics.iniciar_peticion()
+        contexto = metrics.peticion_actual()
+        estado = 500
+
+        async def enviar(mensaje):
+            nonlocal estado
+            if mensaje["type"] == "http.response.start":
+                estado = mensaje["status"]
+                headers = MutableHeaders(scope=mensaje)
+                headers.append("Server-Timing", metrics.server_timing(contexto, time.perf_counter() - inicio))
+            await send(mensaje)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            # Plantilla de la ruta (ej. /datasets/{filename}/profile): etiquetas acotadas
+            ruta = scope.get("route")
+            metrics.solicitudes_segundos.observar(
+                time.perf_counter() - inicio,
+                metodo=scope["method"],
+                ruta=getattr(ruta, "path", "sin_ruta"),
+                estado=estado,
+            )
+            metrics.terminar_peticion(token)
@@ -0,0 +1,74 @@
+import datetime
+
+import numpy as np
+import orjson
+import pandas as pd
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app.services import metrics
+
+# Serialización de respuestas con orjson.
+# Los resultados de los análisis traen escalares y arrays numpy, NaN/Infinity y
+# objetos pandas: orjson los serializa directamente (numpy nativo, NaN -> null)
+# sin pasar antes por jsonable_encoder. Lo que orjson no conoce se convierte en
+# `_por_defecto` (jsonable_encoder como último recurso, ej. modelos pydantic) y
+# los dicts con claves que orjson no acepta (ej. enteros numpy) se normalizan.
+
+OPCIONES = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def _por_defecto(obj):
+    if obj is pd.NaT or obj is pd.NA:
+        return None
+    if isinstance(obj, (pd.Timestamp, datetime.datetime, datetime.date)):
+        return obj.isoformat()
+    if isinstance(obj, (pd.Series, pd.Index)):
+        return obj.tolist()
+    if isinstance(obj, pd.DataFrame):
+        return obj.to_dict(orient="records")
+    if isinstance(obj, np.ndarray):
+        # Arrays que orjson no serializa directo (ej. dtype object o no contiguos)
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    try:
+        return jsonable_encoder(obj)
+    except ValueError as e:
+        raise TypeError(str(e))
+
+
+def _normalizar_claves(obj):
+    if isinstance(obj, dict):
+        return {
+            (k.item() if isinstance(k, np.generic) else k if isinstance(k, (str, int, float, bool)) or k is None else str(k)):
+            _normalizar_claves(v)
+            for k, v in obj.items()
+        }
+    if isinstance(obj, (list, tuple)):
+        return [_normalizar_claves(v) for v in obj]
+    return obj
+
+
+def serializar(contenido):
+    """
+    Retorna `contenido` como JSON (bytes).
+    """
+    try:
+        return orjson.dumps(contenido, default=_por_defecto, option=OPCIONES)
+    except TypeError:
+        # Poco frecuente: se recorre toda la estructura solo si orjson la rechazó
+        return orjson.dumps(_normalizar_claves(contenido), default=_por_defecto, option=OPCIONES)
+
+
+class RespuestaJSON(JSONResponse):
+    """
+    JSONResponse serializada con orjson. Retornarla directamente desde el
+    endpoint evita el paso por jsonable_encoder de FastAPI.
+    """
+
+    def render(self, content):
+        with metrics.medir("serializacion"):
+            return serializar(content)
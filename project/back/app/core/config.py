@@ -0,0 +1,128 @@
+import os
+
+# Directorio de los datasets subidos y todo lo derivado de ellos (columnar, perfiles,
+# agregados, modelos). Con varios workers o servidores debe ser el mismo para todos
+DATA_DIR = os.getenv("DATA_DIR", "data")
+
+# Caché de DataFrames parseados (compartida por todos los endpoints /analizar)
+# Presupuesto de memoria en MB; al superarlo se expulsan los datasets menos usados (LRU)
+DATASET_CACHE_MAX_MB = int(os.getenv("DATASET_CACHE_MAX_MB", "512"))
+# "proceso": caché LRU de DataFrames en cada worker; "compartido": sin caché propia,
+# cada carga lee el archivo Arrow mapeado en memoria (una sola copia para todos los
+# workers en la caché de páginas del sistema; columnas numéricas sin copiar)
+DATASET_CACHE_MODO = os.getenv("DATASET_CACHE_MODO", "proceso")
+
+# Ingesta en streaming: los CSV de al menos este tamaño se procesan por porciones
+INGESTA_STREAMING_MIN_MB = int(os.getenv("INGESTA_STREAMING_MIN_MB", "64"))
+INGESTA_CHUNK_FILAS = int(os.getenv("INGESTA_CHUNK_FILAS", "100000"))
+
+# Tipado al cargar: las columnas de texto con a lo sumo CATEGORIA_MAX_VALORES valores
+# distintos (y no más de CATEGORIA_MAX_PROPORCION de sus filas) se leen como
+# `category`; con INGESTA_TEXTO_ARROW=1 el resto del texto se lee como string[pyarrow]
+CATEGORIA_MAX_VALORES = int(os.getenv("CATEGORIA_MAX_VALORES", "1000"))
+CATEGORIA_MAX_PROPORCION = float(os.getenv("CATEGORIA_MAX_PROPORCION", "0.5"))
+INGESTA_TEXTO_ARROW = os.getenv("INGESTA_TEXTO_ARROW", "0") == "1"
+
+# Núcleos que puede usar este proceso (app/serve.py los reparte entre los workers);
+# de aquí salen por defecto los tamaños de los pools y los hilos por ajuste
+NUCLEOS = int(os.getenv("NUCLEOS", str(os.cpu_count() or 1)))
+
+# Ejecutor de análisis (los cálculos pesados no corren en el event loop)
+EJECUTOR_HILOS = int(os.getenv("EJECUTOR_HILOS", str(min(32, NUCLEOS + 4))))
+EJECUTOR_PROCESOS = int(os.getenv("EJECUTOR_PROCESOS", str(max(1, NUCLEOS // 2))))
+# Hilos por ajuste de un modelo en el pool de procesos: con todos los procesos
+# ocupados (random forest, k-means, descomposición a la vez) no se supera NUCLEOS
+HILOS_POR_PROCESO = max(1, NUCLEOS // EJECUTOR_PROCESOS)
+# Herramientas que se ejecutan en el pool de procesos (ajustes de modelos pesados en Python puro).
+# "sentimiento" corre en un hilo y reparte sus lotes de textos en el mismo pool de procesos
+EJECUTOR_HERRAMIENTAS_PROCESO = set(
+    os.getenv("EJECUTOR_HERRAMIENTAS_PROCESO", "random_forest,kmeans,descomposicion_serie").split(",")
+)
+# Máximo de ejecuciones simultáneas por herramienta: "random_forest=2,kmeans=2"
+EJECUTOR_LIMITE_DEFECTO = int(os.getenv("EJECUTOR_LIMITE_DEFECTO", "4"))
+EJECUTOR_LIMITES = {
+    herramienta: int(limite)
+    for herramienta, limite in (
+        par.split("=") for par in os.getenv("EJECUTOR_LIMITES", "random_forest=2,kmeans=2").split(",") if par
+    )
+}
+# Directorio de cupos compartidos: con varios workers (app/serve.py lo define) los
+# límites de EJECUTOR_LIMITES valen para todo el servidor y no por worker
+EJECUTOR_CUPOS_DIR = os.getenv("EJECUTOR_CUPOS_DIR", "")
+# Segundos antes de abandonar un análisis y responder 504
+EJECUTOR_TIMEOUT_S = float(os.getenv("EJECUTOR_TIMEOUT_S", "120"))
+
+# Al iniciar, importar las librerías de modelos y ejecutar cada herramienta sobre un
+# dataset sintético en segundo plano (ver services/calentamiento)
+ARRANQUE_PRECALENTAR = os.getenv("ARRANQUE_PRECALENTAR", "0") == "1"
+
+# Modo ?profile=1 de /analizar/cuantitativo: funciones listadas en el resumen de cProfile por etapa
+PERFILADO_MAX_FUNCIONES = int(os.getenv("PERFILADO_MAX_FUNCIONES", "30"))
+
+# Trabajos asíncronos (POST /jobs): tiempo que se conserva un resultado y máximo retenido
+JOBS_TTL_S = int(os.getenv("JOBS_TTL_S", "3600"))
+JOBS_MAX_RETENIDOS = int(os.getenv("JOBS_MAX_RETENIDOS", "500"))
+# Registro SQLite de trabajos compartido entre workers (vacío = solo en memoria del
+# worker que lo creó) y cada cuántos segundos los demás workers lo consultan
+JOBS_REGISTRO = os.getenv("JOBS_REGISTRO", "")
+JOBS_SONDEO_S = float(os.getenv("JOBS_SONDEO_S", "0.5"))
+
+# Caché de resultados de análisis (mismo request + misma versión del dataset)
+RESULTADOS_CACHE_MAX = int(os.getenv("RESULTADOS_CACHE_MAX", "256"))
+RESULTADOS_CACHE_TTL_S = int(os.getenv("RESULTADOS_CACHE_TTL_S", "3600"))
+# Directorio para conservar los resultados entre reinicios y compartirlos entre
+# workers (vacío = solo en memoria) y tamaño máximo que ocupan en él
+RESULTADOS_CACHE_DIR = os.getenv("RESULTADOS_CACHE_DIR", "")
+RESULTADOS_CACHE_DIR_MAX_MB = int(os.getenv("RESULTADOS_CACHE_DIR_MAX_MB", "1024"))
+
+# Agregados incrementales (datasets con filas anexadas): máximo de valores
+# distintos por columna que se siguen; por encima se usa el cálculo completo
+AGREGADOS_MAX_CATEGORIAS = int(os.getenv("AGREGADOS_MAX_CATEGORIAS", "100000"))
+
+# Gráficos: máximo de puntos por serie en las respuestas (k-means, series de tiempo);
+# se puede ajustar por request con parametros["max_points"]
+PLOT_MAX_PUNTOS = int(os.getenv("PLOT_MAX_PUNTOS", "5000"))
+
+# K-means: con más filas que KMEANS_FILAS_MUESTRA el modo "auto" ajusta sobre una
+# muestra y asigna el resto por lotes; la selección automática de k evalúa cada k
+# sobre KMEANS_FILAS_BARRIDO filas (silueta sobre KMEANS_FILAS_SILUETA) en paralelo
+KMEANS_FILAS_MUESTRA = int(os.getenv("KMEANS_FILAS_MUESTRA", "100000"))
+KMEANS_FILAS_BARRIDO = int(os.getenv("KMEANS_FILAS_BARRIDO", "20000"))
+KMEANS_FILAS_SILUETA = int(os.getenv("KMEANS_FILAS_SILUETA", "3000"))
+KMEANS_HILOS = int(os.getenv("KMEANS_HILOS", str(HILOS_POR_PROCESO)))
+
+# Random forest: cada ajuste usa por defecto RF_HILOS hilos (todos los núcleos) y
+# parametros["n_jobs"] puede pedir hasta RF_MAX_HILOS (tope del servidor). Con varios
+# bosques a la vez (hasta EJECUTOR_LIMITES["random_forest"]) los hilos superan a los
+# núcleos: un ajuste solo termina antes y varios se reparten la CPU. RF_HILOS=1 (o
+# HILOS_POR_PROCESO) evita esa sobresuscripción a cambio de ajustes solos más lentos.
+# RF_FILAS_GRADIENTE: filas a partir de las que algoritmo="auto" usa gradient boosting por histogramas
+RF_MAX_HILOS = int(os.getenv("RF_MAX_HILOS", str(NUCLEOS)))
+RF_HILOS = min(int(os.getenv("RF_HILOS", str(RF_MAX_HILOS))), RF_MAX_HILOS)
+RF_FILAS_GRADIENTE = int(os.getenv("RF_FILAS_GRADIENTE", "200000"))
+
+# Modelos entrenados guardados con parametros["guardar_modelo"] (ver services/model_registry.py)
+MODELOS_DIR = os.getenv("MODELOS_DIR", os.path.join(DATA_DIR, "modelos"))
+
+# Sentimiento: textos por lote enviado al pool de procesos y polaridades
+# recordadas entre análisis (por hash del texto normalizado)
+SENTIMIENTO_LOTE = int(os.getenv("SENTIMIENTO_LOTE", "2000"))
+SENTIMIENTO_CACHE_MAX = int(os.getenv("SENTIMIENTO_CACHE_MAX", "500000"))
+
+# Nube de palabras: filas de texto por porción (las porciones se reparten en el
+# pool de procesos) y stopwords adicionales para todo el servidor ("palabra1,palabra2")
+NLP_FILAS_POR_PORCION = int(os.getenv("NLP_FILAS_POR_PORCION", "50000"))
+NLP_STOPWORDS_EXTRA = {p.strip().lower() for p in os.getenv("NLP_STOPWORDS_EXTRA", "").split(",") if p.strip()}
+
+# Tablas dinámicas: máximo de categorías por dimensión (fila o columna)
+PIVOT_MAX_CATEGORIAS = int(os.getenv("PIVOT_MAX_CATEGORIAS", "100"))
+
+# Motor de consultas para Pareto y tablas dinámicas: "pandas" o "duckdb" (opcional,
+# ver services/consultas): agrega sobre el archivo columnar sin cargarlo en pandas
+MOTOR_CONSULTAS = os.getenv("MOTOR_CONSULTAS", "pandas")
+CONSULTAS_HILOS = int(os.getenv("CONSULTAS_HILOS", str(NUCLEOS)))
+CONSULTAS_PIVOT_MAX_CATEGORIAS = int(os.getenv("CONSULTAS_PIVOT_MAX_CATEGORIAS", "1000"))
+
+# Perfil de columnas: por encima de esta cardinalidad una columna de texto se
+# considera identificador/texto libre (mismo límite que las dimensiones de pivot)
+PERFIL_ALTA_CARDINALIDAD = int(os.getenv("PERFIL_ALTA_CARDINALIDAD", "100"))
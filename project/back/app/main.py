@@ -1,11 +1,29 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.api import endpoints
+from app.api.middleware import MedicionRequests
+from app.api.responses import RespuestaJSON
+from app.core import config
+from app.services import calentamiento, executor
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Precalentamiento en segundo plano: el servidor acepta peticiones (y /health) mientras tanto
+    tarea = asyncio.create_task(calentamiento.en_segundo_plano()) if config.ARRANQUE_PRECALENTAR else None
+    yield
+    if tarea is not None:
+        tarea.cancel()
+    # Al apagar: detener los pools de hilos/procesos de análisis
+    executor.cerrar()
 
 app = FastAPI(
     title="Motor de Analítica de Datos",
     description="Backend para procesamiento de datos, Pareto y generación de reportes.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=RespuestaJSON
 )
 
 # Configuración CORS (Permite que React en localhost:3000 hable con este backend)
@@ -22,8 +40,13 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Para que el frontend pueda leer hit/miss de la caché de resultados y los tiempos por etapa
+    expose_headers=["X-Cache", "Server-Timing"],
 )
 
+# Server-Timing y latencias de GET /api/v1/metrics (ver services/metrics.py)
+app.add_middleware(MedicionRequests)
+
 # Incluir las rutas
 app.include_router(endpoints.router, prefix="/api/v1")
 
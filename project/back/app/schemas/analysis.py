@@ -4,14 +4,25 @@ from typing import List, Optional, Dict, Any
 class ParetoItem(BaseModel):
     etiqueta: str            # Ej: "Fallo de Motor", "Retraso Logístico"
     frecuencia: int          # Cuántas veces pasó
+    valor: Optional[float] = None  # Suma de columna_valor (solo en el Pareto ponderado)
     porcentaje: float        # % individual
     acumulado: float         # % acumulado
     clase: str               # "A", "B", o "C"
 
+class ParetoOtros(BaseModel):
+    clase: str               # Clase ABC de las categorías agrupadas
+    categorias: int          # Cuántas categorías fuera de top_n hay en la clase
+    frecuencia: int
+    valor: Optional[float] = None
+    porcentaje: float
+
 class ParetoResponse(BaseModel):
     columna_analizada: str
     total_registros: int
-    items: List[ParetoItem]  # Lista de filas procesadas
+    items: List[ParetoItem]  # Lista de filas procesadas (la página pedida)
+    total_categorias: Optional[int] = None  # Categorías del ranking completo (para paginar)
+    columna_valor: Optional[str] = None
+    otros: Optional[List[ParetoOtros]] = None  # Con top_n: el resto agrupado por clase
 
 class AnalisisRequest(BaseModel):
     filename: str
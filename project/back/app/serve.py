@@ -0,0 +1,61 @@
+import os
+
+# Lanzador para producción: uvicorn con varios workers dimensionados a los núcleos.
+#
+#   python -m app.serve                      # un worker por núcleo
+#   SERVIDOR_WORKERS=4 SERVIDOR_PUERTO=8080 python -m app.serve
+#
+# Cada worker es un proceso con sus propios pools de análisis, así que los
+# núcleos se reparten: cada uno recibe NUCLEOS = núcleos / workers y de ahí
+# app.core.config deriva sus procesos y los hilos por ajuste. Con más de un worker además:
+#   - DATA_DIR se fija como ruta absoluta (todos leen y escriben el mismo almacén)
+#   - DATASET_CACHE_MODO=compartido: los datasets se leen mapeados en memoria en
+#     vez de guardar una copia del DataFrame en cada worker
+#   - RESULTADOS_CACHE_DIR=<DATA_DIR>/resultados: los resultados calculados por un
+#     worker los reutilizan los demás (índice SQLite, ver services/result_cache)
+#   - EJECUTOR_CUPOS_DIR=<DATA_DIR>/cupos: los límites por herramienta de
+#     EJECUTOR_LIMITES (ej. random_forest=2) valen para todos los workers juntos
+#   - JOBS_REGISTRO=<DATA_DIR>/trabajos.sqlite: el estado de los trabajos de
+#     POST /jobs lo ve cualquier worker (consulta, eventos y cancelación), sin
+#     necesidad de afinidad de sesión en el balanceador (ver services/jobs)
+# Cualquier variable ya definida en el entorno tiene prioridad.
+
+
+def _nucleos():
+    try:
+        # Núcleos asignados al proceso (contenedores, taskset), no los de la máquina
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def configurar_entorno(workers, nucleos):
+    """
+    Variables de entorno que heredan los workers; debe llamarse antes de importar app.core.config.
+    """
+    os.environ.setdefault("NUCLEOS", str(max(1, nucleos // workers)))
+    if workers > 1:
+        os.environ["DATA_DIR"] = os.path.abspath(os.environ.get("DATA_DIR", "data"))
+        os.environ.setdefault("DATASET_CACHE_MODO", "compartido")
+        os.environ.setdefault("RESULTADOS_CACHE_DIR", os.path.join(os.environ["DATA_DIR"], "resultados"))
+        os.environ.setdefault("EJECUTOR_CUPOS_DIR", os.path.join(os.environ["DATA_DIR"], "cupos"))
+        os.environ.setdefault("JOBS_REGISTRO", os.path.join(os.environ["DATA_DIR"], "trabajos.sqlite"))
+
+
+def main():
+    import uvicorn
+
+    nucleos = _nucleos()
+    workers = int(os.getenv("SERVIDOR_WORKERS", "0")) or nucleos
+    configurar_entorno(workers, nucleos)
+
+    uvicorn.run(
+        "app.main:app",
+        host=os.getenv("SERVIDOR_HOST", "0.0.0.0"),
+        port=int(os.getenv("SERVIDOR_PUERTO", "8000")),
+        workers=workers,
+    )
+
+
+if __name__ == "__main__":
+    main()
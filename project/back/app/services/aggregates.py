@@ -0,0 +1,376 @@
+import json
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+
+from app.core import config
+from app.services import moments, quantitative, statistics, storage
+
+# Agregados incrementales de los datasets con filas anexadas.
+# Para las herramientas cuyo resultado se deriva de estadísticas suficientes
+# combinables (conteos, sumas de momentos, productos cruzados, parciales por
+# celda de la tabla dinámica) se guarda el agregado junto al dataset:
+#   data/ventas.csv.agregados.pkl -> {"version": ..., "agregados": {clave: agregado}}
+# Cada agregado se construye la primera vez que se pide (una pasada completa) y
+# luego, al anexar filas, se actualiza solo con las filas nuevas.
+# Los datasets sin filas anexadas siguen el cálculo normal sobre el DataFrame.
+
+HERRAMIENTAS_INCREMENTALES = {"resumen", "frecuencias", "correlacion", "pivot_table"}
+
+EXTENSION_AGREGADOS = ".agregados.pkl"
+
+_memoria = {}  # file_location -> (version, agregados)
+
+
+def bloqueo(file_location):
+    """
+    Lock por dataset (también entre workers): serializa los anexos y la
+    construcción de agregados, así un agregado siempre corresponde a la
+    versión con la que se etiqueta.
+    """
+    return storage.bloqueo_dataset(file_location)
+
+
+class ConteoValores:
+    """
+    Conteo de cada valor no nulo de una columna, en orden de primera aparición
+    (el mismo que usa `value_counts` para desempatar).
+    """
+
+    def __init__(self, columna, conteos):
+        self.columna = columna
+        self.conteos = conteos
+
+    @staticmethod
+    def _contar(serie):
+        conteos = serie.value_counts(sort=False)
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            # Cada segmento trae sus propias categorías: se combinan como valores
+            conteos = conteos[conteos > 0]
+            conteos.index = conteos.index.astype(object)
+        return conteos
+
+    @classmethod
+    def desde_df(cls, df, columna):
+        return cls(columna, cls._contar(df[columna]))
+
+    @property
+    def utilizable(self):
+        return len(self.conteos) <= config.AGREGADOS_MAX_CATEGORIAS
+
+    def actualizar(self, df):
+        nuevos = self._contar(df[self.columna])
+        existentes = nuevos.index.isin(self.conteos.index)
+        sumados = self.conteos.add(nuevos[existentes].reindex(self.conteos.index, fill_value=0))
+        self.conteos = pd.concat([sumados.astype(self.conteos.dtype), nuevos[~existentes]])
+
+
+class MomentosColumnas:
+    """
+    Momentos, t-digest y frecuentes de las columnas numéricas pedidas (`descriptivo_resumen`).
+    """
+
+    def __init__(self, dtypes, parcial):
+        self.dtypes = dtypes
+        self.parcial = parcial
+
+    @classmethod
+    def desde_df(cls, df, columnas):
+        datos = df[list(dict.fromkeys(columnas))].select_dtypes(include=[np.number])
+        return cls(datos.dtypes, moments.MomentosParciales.desde_matriz(moments.a_matriz(datos)))
+
+    utilizable = True
+
+    def actualizar(self, df):
+        nuevo = moments.MomentosParciales.desde_matriz(moments.a_matriz(df[list(self.dtypes.index)]))
+        self.parcial = self.parcial.combinar(nuevo)
+
+
+class ProductosCruzados:
+    """
+    Sumas por pares de columnas numéricas (filas con ambos valores presentes):
+    n, Σx, Σx² y Σxy, sobre los valores desplazados por la media inicial para
+    no perder precisión. Alcanzan para la correlación de Pearson por pares.
+    """
+
+    def __init__(self, columnas, desplazamiento):
+        self.columnas = columnas
+        self.desplazamiento = desplazamiento
+        k = len(columnas)
+        self.n = np.zeros((k, k))
+        self.suma = np.zeros((k, k))
+        self.suma_cuadrados = np.zeros((k, k))
+        self.productos = np.zeros((k, k))
+
+    @classmethod
+    def desde_df(cls, df):
+        datos = df.select_dtypes(include=[np.number])
+        matriz = moments.a_matriz(datos)
+        with np.errstate(invalid="ignore"):
+            desplazamiento = np.nan_to_num(np.nanmean(matriz, axis=0)) if len(matriz) else np.zeros(matriz.shape[1])
+        agregado = cls(list(datos.columns), desplazamiento)
+        agregado._acumular(matriz)
+        return agregado
+
+    utilizable = True
+
+    def actualizar(self, df):
+        self._acumular(moments.a_matriz(df[self.columnas]))
+
+    def _acumular(self, matriz):
+        presentes = ~np.isnan(matriz)
+        valores = np.where(presentes, matriz - self.desplazamiento, 0.0)
+        mascara = presentes.astype(np.float64)
+        self.n += mascara.T @ mascara
+        # suma[i, j] = Σ x_i sobre las filas donde x_j también está presente
+        self.suma += valores.T @ mascara
+        self.suma_cuadrados += (valores ** 2).T @ mascara
+        self.productos += valores.T @ valores
+
+    def correlacion(self):
+        with np.errstate(invalid="ignore", divide="ignore"):
+            n = self.n
+            covarianza = self.productos - self.suma * self.suma.T / n
+            var_x = self.suma_cuadrados - self.suma ** 2 / n
+            var_y = var_x.T
+            r = covarianza / np.sqrt(var_x * var_y)
+            r = np.where((n > 1) & (var_x > 0) & (var_y > 0), np.clip(r, -1.0, 1.0), np.nan)
+        return pd.DataFrame(r, index=self.columnas, columns=self.columnas)
+
+
+class PivotParcial:
+    """
+    Suma, conteo, mínimo y máximo de `values` por celda (index, columns) y las
+    categorías vistas de cada eje (para validar como `wrangling_pivot_table`).
+    """
+
+    AGREGACIONES = {"sum": "sum", "count": "count", "min": "min", "max": "max"}
+
+    def __init__(self, index, columns, values, dtypes, grupos, categorias):
+        self.index = index
+        self.columns = columns
+        self.values = values
+        self.dtypes = dtypes
+        self.grupos = grupos
+        self.categorias = categorias
+
+    @classmethod
+    def desde_df(cls, df, index, columns, values):
+        return cls(index, columns, values, df.dtypes, cls._agrupar(df, index, columns, values), cls._categorias(df, index, columns))
+
+    @staticmethod
+    def _agrupar(df, index, columns, values):
+        grupos = df.groupby([index, columns], sort=False, observed=True)[values].agg(["sum", "count", "min", "max"])
+        # Niveles `category` como valores: cada segmento trae sus propias categorías
+        return grupos.set_axis(grupos.index.set_levels([
+            nivel.astype(object) if isinstance(nivel, pd.CategoricalIndex) else nivel for nivel in grupos.index.levels
+        ]))
+
+    @staticmethod
+    def _categorias(df, index, columns):
+        unicos = {col: df[col].dropna().unique() for col in (index, columns)}
+        return {
+            col: pd.Index(valores.astype(object) if isinstance(valores, pd.Categorical) else valores)
+            for col, valores in unicos.items()
+        }
+
+    @property
+    def utilizable(self):
+        return all(len(c) <= config.AGREGADOS_MAX_CATEGORIAS for c in self.categorias.values())
+
+    def actualizar(self, df):
+        nuevos = self._agrupar(df, self.index, self.columns, self.values)
+        self.grupos = pd.concat([self.grupos, nuevos]).groupby(level=[0, 1], sort=False).agg(
+            {"sum": "sum", "count": "sum", "min": "min", "max": "max"}
+        )
+        for col, vistas in self._categorias(df, self.index, self.columns).items():
+            self.categorias[col] = self.categorias[col].append(vistas).unique()
+
+    def pivot(self, aggfunc):
+        """
+        La tabla de `df.pivot_table` para `aggfunc`; None si no se puede armar
+        desde los parciales (ej. median).
+        """
+        if aggfunc == "mean":
+            with np.errstate(invalid="ignore", divide="ignore"):
+                serie = self.grupos["sum"] / self.grupos["count"].where(self.grupos["count"] > 0)
+        elif aggfunc in self.AGREGACIONES:
+            serie = self.grupos[self.AGREGACIONES[aggfunc]]
+        else:
+            return None
+        # Como pivot_table: las celdas sin valor no generan filas ni columnas
+        serie = serie.dropna().sort_index()
+        return serie.unstack(level=1)
+
+
+# --- ALMACENAMIENTO ---
+
+def ruta_agregados(file_location):
+    return f"{file_location}{EXTENSION_AGREGADOS}"
+
+
+def _cargar(file_location, version):
+    """
+    Agregados vigentes para `version` (dict vacío si no hay o son de otra versión).
+    Debe llamarse con el bloqueo del dataset tomado.
+    """
+    en_memoria = _memoria.get(file_location)
+    if en_memoria is not None and en_memoria[0] == version:
+        return en_memoria[1]
+
+    agregados = {}
+    try:
+        with open(ruta_agregados(file_location), "rb") as f:
+            guardado = pickle.load(f)
+        if guardado["version"] == version:
+            agregados = guardado["agregados"]
+    except FileNotFoundError:
+        pass
+    except Exception:
+        # Archivo corrupto o de un formato anterior: se reconstruye al pedirlo
+        pass
+    _memoria[file_location] = (version, agregados)
+    return agregados
+
+
+def _guardar(file_location, version, agregados):
+    _memoria[file_location] = (version, agregados)
+    temporal = f"{ruta_agregados(file_location)}.tmp"
+    with open(temporal, "wb") as f:
+        pickle.dump({"version": version, "agregados": agregados}, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temporal, ruta_agregados(file_location))
+
+
+def eliminar(file_location):
+    with bloqueo(file_location):
+        _memoria.pop(file_location, None)
+        if os.path.exists(ruta_agregados(file_location)):
+            os.remove(ruta_agregados(file_location))
+
+
+def actualizar(file_location, version_anterior, version_nueva, df_nuevo):
+    """
+    Incorpora las filas anexadas a los agregados existentes (trabajo proporcional
+    a las filas nuevas). Debe llamarse con el bloqueo del dataset tomado.
+    """
+    agregados = _cargar(file_location, version_anterior)
+    vigentes = {}
+    for clave, agregado in agregados.items():
+        agregado.actualizar(df_nuevo)
+        if agregado.utilizable:
+            vigentes[clave] = agregado
+    _guardar(file_location, version_nueva, vigentes)
+
+
+def _obtener(file_location, clave, construir):
+    """
+    Agregado `clave` del dataset; si aún no existe se construye con
+    `construir()` (una pasada completa) y se guarda. None si no es utilizable
+    o el dataset no tiene filas anexadas.
+    """
+    with bloqueo(file_location):
+        manifiesto = storage.leer_manifiesto(file_location)
+        if not manifiesto.get("segmentos"):
+            return None
+        version = manifiesto["version"]
+        agregados = _cargar(file_location, version)
+        if clave not in agregados and file_location in _memoria:
+            # Otro worker pudo haberlo construido para esta misma versión: releer del disco
+            del _memoria[file_location]
+            agregados = _cargar(file_location, version)
+        if clave not in agregados:
+            agregado = construir()
+            if agregado is None or not agregado.utilizable:
+                return None
+            agregados = {**agregados, clave: agregado}
+            _guardar(file_location, version, agregados)
+        return agregados[clave]
+
+
+# --- RESULTADOS DESDE AGREGADOS ---
+
+def pareto(file_location, columna, cargar, top_n=None, offset=0, limit=None):
+    """
+    (resultado, total_registros) del Pareto de `columna`, o None si no aplica.
+    `cargar(columnas)` retorna el DataFrame del dataset.
+    """
+    def construir():
+        df = cargar([columna])
+        if columna not in df.columns:
+            return None
+        return ConteoValores.desde_df(df, columna)
+
+    agregado = _obtener(file_location, f"conteo:{columna}", construir)
+    if agregado is None:
+        return None
+    resultado = statistics.pareto_desde_conteos(agregado.conteos, None, top_n, offset, limit)
+    return resultado, storage.leer_manifiesto(file_location)["filas"]
+
+
+def resultado(file_location, request, cargar):
+    """
+    Resultado de `request` calculado desde los agregados, o None si la
+    herramienta o sus parámetros requieren el cálculo completo.
+    """
+    tool = request.tipo_analisis
+
+    if tool == "frecuencias" and request.columnas_x:
+        columna = request.columnas_x[0]
+
+        def construir():
+            df = cargar([columna])
+            return ConteoValores.desde_df(df, columna) if columna in df.columns else None
+
+        agregado = _obtener(file_location, f"conteo:{columna}", construir)
+        return quantitative.frecuencias_desde_conteos(agregado.conteos) if agregado else None
+
+    if tool == "resumen":
+        columnas = list(dict.fromkeys(request.columnas_x))
+
+        def construir():
+            df = cargar(columnas)
+            if any(c not in df.columns for c in columnas) or df.empty:
+                return None
+            agregado = MomentosColumnas.desde_df(df, columnas)
+            return agregado if len(agregado.dtypes) else None
+
+        agregado = _obtener(file_location, f"momentos:{json.dumps(columnas)}", construir)
+        if agregado is None:
+            return None
+        # Sin tablas de frecuencias completas los cuantiles serían aproximados: solo si se pidió
+        if request.parametros.get("cuantiles") != "aproximado" and not agregado.parcial.cuantiles_exactos():
+            return None
+        return quantitative.resumen_desde_estadisticas(agregado.parcial.finalizar(), agregado.dtypes)
+
+    if tool == "correlacion":
+        agregado = _obtener(file_location, "productos", lambda: ProductosCruzados.desde_df(cargar(None)))
+        if agregado is None:
+            return None
+        return quantitative.correlacion_desde_matriz(
+            agregado.correlacion(), request.parametros.get("formato", "heatmap"), bool(request.parametros.get("triangular", False))
+        )
+
+    if tool == "pivot_table" and len(request.columnas_x) >= 2:
+        index, columns, values = request.columna_y, request.columnas_x[0], request.columnas_x[1]
+        aggfunc = request.parametros.get("aggfunc", "sum")
+        if aggfunc != "mean" and aggfunc not in PivotParcial.AGREGACIONES:
+            return None
+
+        def construir():
+            df = cargar([index, columns, values])
+            error = quantitative.validar_pivot(df.dtypes, lambda col: df[col].nunique(dropna=True), index, columns, values)
+            if error:
+                return None
+            return PivotParcial.desde_df(df, index, columns, values)
+
+        agregado = _obtener(file_location, f"pivot:{json.dumps([index, columns, values])}", construir)
+        if agregado is None:
+            return None
+        error = quantitative.validar_pivot(
+            agregado.dtypes, lambda col: len(agregado.categorias[col]), index, columns, values
+        )
+        return error or quantitative.formatear_pivot(agregado.pivot(aggfunc), request.parametros.get("formato", "heatmap"))
+
+    return None
@@ -0,0 +1,330 @@
+from app.core import config
+from app.services import aggregates, consultas, downsampling, executor, ingestion, metrics, model_registry, quantitative
+from app.services.result_cache import clave_resultado, result_cache
+
+# Herramientas que trabajan sobre todas las columnas del archivo (no se puede proyectar)
+HERRAMIENTAS_SIN_PROYECCION = {"correlacion"}
+
+
+def columnas_requeridas(request):
+    """
+    Columnas que necesita la herramienta pedida; None si necesita el archivo completo.
+    """
+    if request.tipo_analisis in HERRAMIENTAS_SIN_PROYECCION:
+        return None
+    columnas = list(request.columnas_x)
+    if request.columna_y:
+        columnas.append(request.columna_y)
+    return list(dict.fromkeys(columnas))
+
+
+def _sin_progreso(etapa, progreso):
+    pass
+
+
+async def _etapa(etapa, perfiles, herramienta, funcion, *args):
+    """
+    Ejecuta `funcion(*args)` en el ejecutor midiendo la etapa (metrics.medir).
+    Con `perfiles` (dict) la corre bajo cProfile y guarda el resumen en perfiles[etapa].
+    """
+    with metrics.medir(etapa):
+        if perfiles is None:
+            return await executor.ejecutar(herramienta, funcion, *args)
+        resultado, resumen = await executor.ejecutar(herramienta, metrics.ejecutar_perfilado, funcion, *args)
+        perfiles[etapa] = perfiles.get(etapa, "") + resumen
+        return resultado
+
+
+async def analizar(request, al_avanzar=_sin_progreso, perfiles=None):
+    """
+    Flujo completo de un AnalisisRequest: carga las columnas necesarias
+    (almacenamiento columnar / caché) y ejecuta la herramienta en el ejecutor.
+    `al_avanzar(etapa, progreso)` se llama al cambiar de etapa (0-100).
+    `perfiles`: dict donde dejar el resumen de cProfile de cada etapa (modo ?profile=1).
+    """
+    metrics.etiquetar(request.tipo_analisis)
+    al_avanzar("cargando", 10)
+    # Filas a considerar (parametros["filtros"], ver services/filtros)
+    filtros = request.parametros.get("filtros")
+
+    if request.tipo_analisis in consultas.HERRAMIENTAS and consultas.activo():
+        # Motor SQL embebido: agrega sobre el archivo columnar sin cargar el DataFrame
+        resultado = await _etapa("consulta", perfiles, request.tipo_analisis, consultas.analizar, request)
+        al_avanzar("completado", 100)
+        return resultado
+
+    validado = False
+    if request.tipo_analisis == "pivot_table" and len(request.columnas_x) >= 2:
+        # Columnas que no sirven como dimensiones: se rechaza con el perfil, sin leer los datos
+        # (con filtros las categorías se cuentan después, sobre las filas filtradas)
+        error = await _etapa("validacion", perfiles, "carga", validar_pivot_con_perfil, request, filtros)
+        if error is not None:
+            al_avanzar("completado", 100)
+            return error
+        validado = not filtros
+
+    if request.tipo_analisis in aggregates.HERRAMIENTAS_INCREMENTALES and not filtros:
+        # Datasets con filas anexadas: derivar el resultado de los agregados incrementales
+        # (se mantienen sobre todas las filas: con filtros se calcula sobre las filtradas)
+        resultado = await _etapa("incremental", perfiles, request.tipo_analisis, analizar_con_agregados, request)
+        if resultado is not None:
+            al_avanzar("completado", 100)
+            return resultado
+
+    df = await _etapa(
+        "carga", perfiles, "carga", ingestion.cargar_dataset, request.filename, columnas_requeridas(request), filtros
+    )
+
+    al_avanzar("analizando", 40)
+    resultado = await _etapa("calculo", perfiles, request.tipo_analisis, ejecutar_herramienta, df, request, validado)
+
+    al_avanzar("completado", 100)
+    return resultado
+
+
+def validar_pivot_con_perfil(request, filtros=None):
+    """
+    Valida la tabla dinámica con el perfil de columnas. La cardinalidad del perfil
+    es la de todo el archivo: con `filtros` no se valida aquí.
+    """
+    perfil = ingestion.perfil_dataset(request.filename)
+    return quantitative.validar_pivot(
+        perfil.dtypes(), None if filtros else perfil.cardinalidad,
+        request.columna_y, request.columnas_x[0], request.columnas_x[1]
+    )
+
+
+def analizar_con_agregados(request):
+    """
+    Resultado desde los agregados incrementales del dataset; None si no tiene
+    filas anexadas o la herramienta requiere el cálculo completo.
+    """
+    return aggregates.resultado(
+        ingestion.ruta_dataset(request.filename),
+        request,
+        lambda columnas: ingestion.cargar_dataset(request.filename, columnas),
+    )
+
+
+def _buscar_resultado(request):
+    clave = clave_resultado(request, ingestion.version_dataset(request.filename))
+    return clave, result_cache.obtener(clave)
+
+
+async def analizar_memoizado(request, al_avanzar=_sin_progreso):
+    """
+    Igual que `analizar`, pero reutiliza el resultado si el mismo request ya se
+    ejecutó sobre la misma versión del dataset.
+    Retorna (resultado, "hit" | "miss" | "bypass").
+    """
+    if request.parametros.get("guardar_modelo"):
+        # Guardar el modelo es un efecto: cada request registra el suyo (un resultado
+        # en caché apuntaría a un modelo que pudo eliminarse con DELETE /modelos/{id})
+        return await analizar(request, al_avanzar), "bypass"
+
+    metrics.etiquetar(request.tipo_analisis)
+    with metrics.medir("cache"):
+        clave, resultado = await executor.ejecutar("carga", _buscar_resultado, request)
+    if resultado is not None:
+        al_avanzar("completado", 100)
+        return resultado, "hit"
+
+    resultado = await analizar(request, al_avanzar)
+    await executor.ejecutar("carga", result_cache.guardar, clave, resultado)
+    return resultado, "miss"
+
+
+async def predecir_archivo(modelo_id, file):
+    """
+    Puntúa un archivo subido (CSV/Excel) con un modelo del registro.
+    """
+    if not file.filename.endswith(('.csv', '.xlsx')):
+        raise ValueError("Formato no soportado")
+    # Falla rápido (404) si el modelo no existe, antes de leer el archivo
+    model_registry.obtener_metadatos(modelo_id)
+    return await executor.ejecutar("prediccion", _predecir_archivo, modelo_id, file)
+
+
+def _predecir_archivo(modelo_id, file):
+    crudo, _ = ingestion.leer_subida(file, f"{ingestion.UPLOAD_DIR}/prediccion")
+    # Misma limpieza que recibieron los datos de entrenamiento ($, B, M, K)
+    return model_registry.predecir(modelo_id, ingestion.limpiar_dataframe(crudo))
+
+
+def registro_modelo(request, df):
+    """
+    Huella del dataset de entrenamiento si el request pide guardar el modelo; None si no.
+    """
+    if not request.parametros.get("guardar_modelo"):
+        return None
+    return {
+        "filename": request.filename,
+        "version": ingestion.version_dataset(request.filename),
+        "filas": len(df),
+    }
+
+
+def ejecutar_herramienta(df, request, validado=False):
+    """
+    Router de lógica (Switch-Case según herramienta).
+    Recibe el DataFrame ya cargado y el AnalisisRequest; es una función de módulo
+    para poder ejecutarse tanto en un hilo como en un proceso del ejecutor.
+    `validado`: la tabla dinámica ya se validó con el perfil (ver `analizar`).
+    """
+    tool = request.tipo_analisis
+    
+    # --- A. ESTADÍSTICA DESCRIPTIVA ---
+    if tool == "resumen":
+        # Requiere lista de columnas numéricas (columnas_x)
+        # Parametros opcionales: cuantiles="aproximado" (t-digest, para columnas muy grandes)
+        aproximado = request.parametros.get("cuantiles") == "aproximado"
+        return quantitative.descriptivo_resumen(df, request.columnas_x, aproximado)
+        
+    elif tool == "frecuencias":
+        # Requiere una columna (usaremos la primera de x)
+        if not request.columnas_x: raise ValueError("Seleccione una variable.")
+        return quantitative.descriptivo_frecuencias(df, request.columnas_x[0])
+        
+    elif tool == "correlacion":
+        # Usa todas las numéricas del DF, no requiere inputs
+        # Parametros opcionales: formato (heatmap, compacto, binario), triangular (solo triángulo superior)
+        return quantitative.descriptivo_correlacion(
+            df, request.parametros.get("formato", "heatmap"), bool(request.parametros.get("triangular", False))
+        )
+        
+    elif tool == "outliers":
+        # Requiere una columna numérica
+        if not request.columnas_x: raise ValueError("Seleccione una variable numérica.")
+        return quantitative.descriptivo_outliers(df, request.columnas_x[0])
+
+    # --- B. ESTADÍSTICA INFERENCIAL ---
+    elif tool == "ttest":
+        # Compara 2 grupos. Y = Columna Grupo (Cat), X[0] = Columna Valor (Num)
+        if not request.columna_y or not request.columnas_x: 
+            raise ValueError("Se requiere una variable de grupo (Y) y una numérica (X).")
+        return quantitative.inferencial_ttest(df, request.columna_y, request.columnas_x[0])
+        
+    elif tool == "anova":
+        # Compara 3+ grupos. Mismos inputs que T-Test
+        return quantitative.inferencial_anova(df, request.columna_y, request.columnas_x[0])
+
+    # --- C. MODELOS PREDICTIVOS ---
+    # Parametro opcional en todos: guardar_modelo=true (retorna modelo_id para /modelos/{id}/predecir)
+    elif tool == "regresion_lineal":
+        # Y = Target (Num), X = Features (Lista Num)
+        # Parametros opcionales: max_points (muestra del gráfico real vs predicho)
+        max_puntos = downsampling.max_puntos(request.parametros) if "max_points" in request.parametros else None
+        return quantitative.predictivo_regresion_lineal(
+            df, request.columna_y, request.columnas_x, max_puntos, registro=registro_modelo(request, df)
+        )
+        
+    elif tool == "regresion_logistica":
+        # Y = Target (Cat/Binario), X = Features (Lista Num)
+        return quantitative.predictivo_regresion_logistica(
+            df, request.columna_y, request.columnas_x, registro=registro_modelo(request, df)
+        )
+        
+    elif tool == "arbol_decision":
+        # Y = Target, X = Features
+        return quantitative.predictivo_arbol_decision(
+            df, request.columna_y, request.columnas_x, registro=registro_modelo(request, df)
+        )
+
+    # --- D. NO SUPERVISADO ---
+    elif tool == "kmeans":
+        # X = Features (Lista Num). Parametros opcionales n_clusters (entero o "auto"),
+        # k_min/k_max (rango de "auto"), modo (auto, completo, minibatch, muestra), max_points
+        n_clusters = request.parametros.get("n_clusters", 3)
+        if n_clusters != "auto":
+            n_clusters = int(n_clusters)
+        k_min = int(request.parametros.get("k_min", 2))
+        k_max = int(request.parametros.get("k_max", 10))
+        max_puntos = downsampling.max_puntos(request.parametros)
+        modo = request.parametros.get("modo", "auto")
+        return quantitative.unsupervised_kmeans(
+            df, request.columnas_x, n_clusters, max_puntos, modo, k_min, k_max
+        )
+
+    # --- E. NLP (TEXTO) ---
+    elif tool == "nube_palabras":
+        # Y = Columna de texto
+        if not request.columna_y: raise ValueError("Seleccione la columna de texto.")
+        # Parametros opcionales: top_n, ngramas (1, 2, 3), stopwords (lista de palabras a excluir)
+        return quantitative.nlp_frecuencia_palabras(
+            df, request.columna_y,
+            top_n=int(request.parametros.get("top_n", 50)),
+            ngramas=int(request.parametros.get("ngramas", 1)),
+            stopwords_extra=request.parametros.get("stopwords", ()),
+        )
+        
+    elif tool == "sentimiento":
+        # Y = Columna de texto
+        if not request.columna_y: raise ValueError("Seleccione la columna de texto.")
+        return quantitative.nlp_sentimiento(df, request.columna_y)
+
+    # --- F. RANDOM FOREST ---
+    elif tool == "random_forest":
+        # Detectar regresión o clasificación basado en Target
+        if quantitative.es_numerica(df[request.columna_y].dtype):
+            tipo = "regresion"
+        else:
+            tipo = "clasificacion"
+        # Parametros opcionales: n_estimators, max_depth, max_samples, n_jobs (por defecto
+        # RF_HILOS, -1 = todos, tope RF_MAX_HILOS; la respuesta informa los hilos usados),
+        # validacion (holdout, oob), algoritmo (random_forest, gradient_boosting, auto)
+        parametros = request.parametros
+        n_jobs = int(parametros.get("n_jobs", config.RF_HILOS))
+        n_jobs = config.RF_MAX_HILOS if n_jobs <= 0 else min(n_jobs, config.RF_MAX_HILOS)
+        max_depth = parametros.get("max_depth")
+        max_samples = parametros.get("max_samples")
+        return quantitative.predictivo_random_forest(
+            df, request.columna_y, request.columnas_x, tipo,
+            n_estimators=int(parametros.get("n_estimators", 100)),
+            max_depth=int(max_depth) if max_depth is not None else None,
+            max_samples=(float(max_samples) if float(max_samples) <= 1 else int(max_samples))
+            if max_samples is not None else None,
+            n_jobs=n_jobs,
+            validacion=parametros.get("validacion", "holdout"),
+            algoritmo=parametros.get("algoritmo", "random_forest"),
+            filas_gradiente=config.RF_FILAS_GRADIENTE,
+            registro=registro_modelo(request, df),
+        )
+
+    # --- G. SERIES DE TIEMPO (DESCOMPOSICIÓN) ---
+    elif tool == "descomposicion_serie":
+        # X = Columna Fecha, Y = Columna Valor
+        # Parametros opcionales: periodo (ej. 12 meses), max_points, muestreo (lttb, minmax)
+        periodo = int(request.parametros.get("periodo", 12))
+        max_puntos = downsampling.max_puntos(request.parametros)
+        metodo = request.parametros.get("muestreo", "lttb")
+        return quantitative.series_tiempo_descomposicion(
+            df, request.columnas_x[0], request.columna_y, periodo, max_puntos, metodo
+        )
+
+    # --- H. TABLA DINÁMICA ---
+    elif tool == "pivot_table":
+        # Requiere parametros específicos en el request o mapearlos
+        # Usaremos: Y = Index, X[0] = Columns, X[1] = Values
+        if len(request.columnas_x) < 2: 
+            raise ValueError("Para Pivot Table se requieren 2 columnas en X: [Columnas, Valores]")
+        
+        index_col = request.columna_y
+        columns_col = request.columnas_x[0]
+        values_col = request.columnas_x[1]
+        agg = request.parametros.get("aggfunc", "sum") # sum, mean, count
+        formato = request.parametros.get("formato", "heatmap") # heatmap, compacto, binario
+        
+        if validado:
+            return quantitative.wrangling_pivot_table(df, index_col, columns_col, values_col, agg, formato, validar=False)
+        if request.parametros.get("filtros"):
+            # Filas filtradas: categorías presentes en el DataFrame cargado
+            return quantitative.wrangling_pivot_table(df, index_col, columns_col, values_col, agg, formato)
+        # Cardinalidades desde el perfil de columnas (sin nunique sobre los datos)
+        perfil = ingestion.perfil_dataset(request.filename)
+        return quantitative.wrangling_pivot_table(
+            df, index_col, columns_col, values_col, agg, formato, contar_categorias=perfil.cardinalidad
+        )
+    
+
+    else:
+        raise ValueError(f"Herramienta '{tool}' no reconocida.")
@@ -0,0 +1,165 @@
+import os
+import threading
+from collections import OrderedDict
+
+from app.core import config
+from app.services.storage import hash_archivo
+
+
+class DatasetCache:
+    """
+    Caché LRU de DataFrames ya parseados y limpios, acotada por memoria.
+
+    Cada entrada se identifica por la ruta del archivo (y el conjunto de
+    columnas pedido, sin importar su orden) y se valida contra su mtime/tamaño; si cambian, se
+    recalcula el hash del contenido para decidir si el archivo realmente
+    cambió. Las lecturas devuelven una copia, así las funciones que mutan
+    el DataFrame no corrompen la versión en caché.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entradas = OrderedDict()  # (ruta, columnas) -> dict(df, mtime, size, hash, bytes)
+        self._hashes = {}  # ruta -> (mtime, size, hash), evita re-hashear la misma versión
+        self._bytes_totales = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expulsiones = 0
+
+    def obtener(self, ruta, cargador, columnas=None):
+        """
+        Retorna una copia del DataFrame de `ruta` (solo `columnas` si se indican).
+        Si no está en caché (o el archivo cambió) lo construye con `cargador()`
+        y lo guarda.
+        """
+        stat = os.stat(ruta)
+        firma = (stat.st_mtime_ns, stat.st_size)
+        # [a, b] y [b, a] comparten entrada; el orden pedido se aplica al leer
+        clave = (ruta, tuple(sorted(set(columnas))) if columnas is not None else None)
+
+        with self._lock:
+            df = self._buscar(clave, firma, columnas)
+            if df is not None:
+                self.hits += 1
+                return df
+
+        # mtime/tamaño distintos: comparar contenido antes de descartar la entrada
+        contenido_hash = self._hash(ruta, firma)
+        with self._lock:
+            for entrada in self._entradas_de(ruta):
+                if entrada["hash"] == contenido_hash:
+                    entrada["mtime"], entrada["size"] = firma
+            df = self._buscar(clave, firma, columnas)
+            if df is not None:
+                self.hits += 1
+                return df
+            self.misses += 1
+
+        df = cargador()
+        self._guardar(clave, df, firma, contenido_hash)
+        return self._proyectar(df, columnas)
+
+    def version(self, ruta):
+        """
+        Hash del contenido del archivo en caché (None si no está cargado).
+        """
+        with self._lock:
+            for entrada in self._entradas_de(ruta):
+                return entrada["hash"]
+            return None
+
+    def invalidar(self, ruta):
+        with self._lock:
+            for clave in [c for c in self._entradas if c[0] == ruta]:
+                self._bytes_totales -= self._entradas.pop(clave)["bytes"]
+            self._hashes.pop(ruta, None)
+
+    def limpiar(self):
+        with self._lock:
+            self._entradas.clear()
+            self._hashes.clear()
+            self._bytes_totales = 0
+
+    def estadisticas(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entradas": len(self._entradas),
+                "bytes_usados": int(self._bytes_totales),
+                "bytes_maximos": int(self.max_bytes),
+                "hits": self.hits,
+                "misses": self.misses,
+                "expulsiones": self.expulsiones,
+                "tasa_aciertos": (self.hits / total) if total else 0.0,
+            }
+
+    def _entradas_de(self, ruta):
+        return [e for c, e in self._entradas.items() if c[0] == ruta]
+
+    def _buscar(self, clave, firma, columnas):
+        """
+        Busca la proyección exacta o, si no está, el dataset completo de la misma ruta.
+        Debe llamarse con el lock tomado.
+        """
+        for candidata in (clave, (clave[0], None)):
+            entrada = self._entradas.get(candidata)
+            if entrada is None or (entrada["mtime"], entrada["size"]) != firma:
+                continue
+            self._entradas.move_to_end(candidata)
+            return self._proyectar(entrada["df"], columnas)
+        return None
+
+    @staticmethod
+    def _proyectar(df, columnas):
+        """
+        Copia de `df` con las `columnas` presentes en el orden pedido (todas si es None).
+        """
+        if columnas is None:
+            return df.copy()
+        return df[[c for c in dict.fromkeys(columnas) if c in df.columns]].copy()
+
+    def _hash(self, ruta, firma):
+        with self._lock:
+            conocido = self._hashes.get(ruta)
+            if conocido is not None and conocido[:2] == firma:
+                return conocido[2]
+        contenido_hash = hash_archivo(ruta)
+        with self._lock:
+            self._hashes[ruta] = (*firma, contenido_hash)
+        return contenido_hash
+
+    def _guardar(self, clave, df, firma, contenido_hash):
+        tamano = int(df.memory_usage(deep=True).sum())
+
+        with self._lock:
+            # Las entradas de otra versión del mismo archivo ya no sirven
+            for otra in [c for c, e in self._entradas.items() if c[0] == clave[0] and e["hash"] != contenido_hash]:
+                self._bytes_totales -= self._entradas.pop(otra)["bytes"]
+
+            anterior = self._entradas.pop(clave, None)
+            if anterior is not None:
+                self._bytes_totales -= anterior["bytes"]
+
+            # Un dataset más grande que todo el presupuesto no se cachea
+            if tamano > self.max_bytes:
+                return
+
+            # Expulsar los menos usados hasta que quepa
+            while self._entradas and self._bytes_totales + tamano > self.max_bytes:
+                _, expulsada = self._entradas.popitem(last=False)
+                self._bytes_totales -= expulsada["bytes"]
+                self.expulsiones += 1
+
+            self._entradas[clave] = {
+                "df": df,
+                "mtime": firma[0],
+                "size": firma[1],
+                "hash": contenido_hash,
+                "bytes": tamano,
+            }
+            self._bytes_totales += tamano
+
+
+# Instancia única compartida por todo el proceso
+dataset_cache = DatasetCache(config.DATASET_CACHE_MAX_MB * 1024 * 1024)
@@ -0,0 +1,144 @@
+import importlib
+import logging
+import time
+
+import numpy as np
+import pandas as pd
+
+from app.core import config
+from app.schemas.analysis import AnalisisRequest
+from app.services import analysis, executor
+
+# Precalentamiento opcional al iniciar (ARRANQUE_PRECALENTAR=1).
+# scikit-learn, scipy.stats, statsmodels y TextBlob se importan dentro de cada
+# herramienta, así que un worker arranca rápido pero la primera petición de cada
+# herramienta paga la importación y las inicializaciones perezosas de esas
+# librerías (submódulos, lexicón de TextBlob, pools de joblib). El precalentamiento
+# corre en segundo plano una vez que el servidor ya responde /health: importa los
+# módulos y ejecuta cada herramienta sobre un dataset sintético pequeño, en este
+# proceso y en cada proceso del pool (desde el inicializador del pool: también
+# los procesos que se crean después, ej. al recrear el pool, arrancan calientes).
+
+logger = logging.getLogger(__name__)
+
+MODULOS = (
+    "scipy.stats",
+    "sklearn.cluster",
+    "sklearn.ensemble",
+    "sklearn.inspection",
+    "sklearn.linear_model",
+    "sklearn.metrics",
+    "sklearn.model_selection",
+    "sklearn.preprocessing",
+    "sklearn.tree",
+    "statsmodels.tsa.seasonal",
+    "textblob",
+)
+
+# Herramientas que usan las dependencias pesadas: (columnas_x, columna_y, parametros)
+# sobre el dataset de `_dataset_sintetico`
+HERRAMIENTAS = {
+    "ttest": (["Valor"], "Grupo", {}),
+    "anova": (["Valor"], "Categoria", {}),
+    "regresion_lineal": (["Valor", "Categoria"], "Monto", {}),
+    "regresion_logistica": (["Valor", "Monto"], "Grupo", {}),
+    "arbol_decision": (["Valor", "Monto"], "Grupo", {}),
+    "kmeans": (["Valor", "Monto"], "", {"n_clusters": 3}),
+    "random_forest": (["Valor", "Monto"], "Grupo", {"n_estimators": 10}),
+    "sentimiento": ([], "Texto", {}),
+    "descomposicion_serie": (["Fecha"], "Monto", {"periodo": 12}),
+}
+
+_estado = {"estado": "desactivado" if not config.ARRANQUE_PRECALENTAR else "pendiente", "segundos": None}
+_errores_proceso = {}  # en un proceso del pool: herramientas que fallaron al calentarlo
+
+
+def estado():
+    """
+    Estado del precalentamiento (desactivado, pendiente, en_curso, completado, error) y su duración.
+    """
+    return dict(_estado)
+
+
+def _dataset_sintetico(filas=240, semilla=42):
+    rng = np.random.default_rng(semilla)
+    valor = rng.normal(50, 10, filas)
+    return pd.DataFrame({
+        "Grupo": rng.choice(["A", "B"], filas),
+        "Categoria": pd.Categorical(rng.choice(["X", "Y", "Z"], filas)),
+        "Valor": valor,
+        "Monto": valor * 3 + rng.normal(0, 5, filas),
+        "Texto": rng.choice(["muy buen servicio", "terrible atención", "producto normal"], filas),
+        "Fecha": pd.date_range("2000-01-01", periods=filas, freq="MS"),
+    })
+
+
+def calentar(herramientas):
+    """
+    Importa MODULOS y ejecuta las `herramientas` sobre el dataset sintético.
+    Es de módulo para poder correr también en el pool de procesos.
+    Retorna {herramienta: error} de las que fallaron.
+    """
+    for modulo in MODULOS:
+        importlib.import_module(modulo)
+
+    df = _dataset_sintetico()
+    errores = {}
+    for herramienta in herramientas:
+        columnas_x, columna_y, parametros = HERRAMIENTAS[herramienta]
+        request = AnalisisRequest(
+            filename="", tipo_analisis=herramienta, columnas_x=columnas_x, columna_y=columna_y, parametros=parametros
+        )
+        try:
+            analysis.ejecutar_herramienta(df.copy(), request)
+        except Exception as e:
+            errores[herramienta] = str(e)
+    return errores
+
+
+def inicializar_proceso():
+    """
+    Inicializador de cada proceso del pool (ver executor): antes de su primer
+    trabajo lo calienta con las herramientas que corren en procesos.
+    """
+    try:
+        _errores_proceso.update(calentar([h for h in HERRAMIENTAS if executor.usa_procesos(h)]))
+    except Exception as e:
+        # Un inicializador que falla deja inservible todo el pool
+        _errores_proceso["importacion"] = str(e)
+
+
+def errores_proceso(_):
+    return dict(_errores_proceso)
+
+
+def precalentar():
+    """
+    Calienta este proceso con las herramientas que corren en hilos; los procesos
+    del pool se calientan en su inicializador.
+    """
+    errores = calentar([h for h in HERRAMIENTAS if not executor.usa_procesos(h)])
+    # Tareas mínimas para que el pool levante sus procesos ahora (y no en la primera
+    # petición) y reporte los errores de cada uno. El pool no garantiza a qué proceso
+    # va cada tarea: da igual, cada proceso se calienta solo al iniciar.
+    for errores_de_proceso in executor.mapear_en_procesos(errores_proceso, range(config.EJECUTOR_PROCESOS)):
+        errores.update(errores_de_proceso)
+    return errores
+
+
+async def en_segundo_plano():
+    """
+    Tarea lanzada desde el lifespan de la aplicación: no bloquea el arranque.
+    """
+    _estado["estado"] = "en_curso"
+    inicio = time.perf_counter()
+    try:
+        errores = await executor.ejecutar("precalentamiento", precalentar, timeout=None)
+    except Exception:
+        logger.exception("Error en el precalentamiento")
+        _estado["estado"] = "error"
+    else:
+        for herramienta, error in errores.items():
+            logger.warning("Precalentamiento de %s falló: %s", herramienta, error)
+        _estado["estado"] = "completado"
+    _estado["segundos"] = round(time.perf_counter() - inicio, 3)
@@ -0,0 +1,106 @@
+import numpy as np
+from joblib import Parallel, delayed
+
+from app.core import config
+
+# Ajuste de k-means escalable.
+# KMeans(n_init=10) sobre todas las filas es cuadrático en la práctica para
+# millones de filas. Modos (parametros["modo"]):
+#   - completo:  KMeans sobre todas las filas (comportamiento original)
+#   - minibatch: MiniBatchKMeans sobre todas las filas
+#   - muestra:   KMeans sobre una muestra; el resto se asigna al centroide más cercano por lotes
+#   - auto:      completo hasta KMEANS_FILAS_MUESTRA filas, muestra por encima
+# La selección automática de k (n_clusters="auto") ajusta cada k candidato en
+# paralelo sobre una submuestra y elige el de mayor silueta.
+
+MODOS = ("auto", "completo", "minibatch", "muestra")
+FILAS_POR_LOTE = 100_000
+
+
+def _muestra(n, filas, semilla=42):
+    if n <= filas:
+        return np.arange(n)
+    return np.sort(np.random.default_rng(semilla).choice(n, filas, replace=False))
+
+
+def asignar_por_lotes(modelo, matriz, filas=FILAS_POR_LOTE):
+    """
+    Etiqueta todas las filas con el modelo ya ajustado, sin materializar de
+    una vez la matriz de distancias de todo el dataset.
+    """
+    etiquetas = np.empty(len(matriz), dtype=np.int32)
+    for inicio in range(0, len(matriz), filas):
+        etiquetas[inicio:inicio + filas] = modelo.predict(matriz[inicio:inicio + filas])
+    return etiquetas
+
+
+def resolver_modo(modo, filas):
+    if modo not in MODOS:
+        raise ValueError(f"Modo de k-means '{modo}' no soportado. Use: {', '.join(MODOS)}.")
+    if modo == "auto":
+        return "completo" if filas <= config.KMEANS_FILAS_MUESTRA else "muestra"
+    return modo
+
+
+def ajustar(matriz, n_clusters, modo="completo", semilla=42):
+    """
+    Retorna (modelo, etiquetas) para la matriz ya estandarizada.
+    """
+    from sklearn.cluster import KMeans, MiniBatchKMeans
+
+    if modo == "completo":
+        modelo = KMeans(n_clusters=n_clusters, random_state=semilla, n_init=10).fit(matriz)
+        return modelo, modelo.labels_
+
+    if modo == "minibatch":
+        modelo = MiniBatchKMeans(
+            n_clusters=n_clusters, random_state=semilla, n_init=3, batch_size=min(len(matriz), 4096)
+        ).fit(matriz)
+        return modelo, modelo.labels_
+
+    muestra = _muestra(len(matriz), config.KMEANS_FILAS_MUESTRA, semilla)
+    modelo = KMeans(n_clusters=n_clusters, random_state=semilla, n_init=10).fit(matriz[muestra])
+    return modelo, asignar_por_lotes(modelo, matriz)
+
+
+def _evaluar_k(matriz, k, semilla):
+    from sklearn.cluster import KMeans
+    from sklearn.metrics import silhouette_score
+
+    modelo = KMeans(n_clusters=k, random_state=semilla, n_init=3).fit(matriz)
+    if len(np.unique(modelo.labels_)) < 2:
+        return float(modelo.inertia_), None
+    silueta = silhouette_score(
+        matriz, modelo.labels_, sample_size=min(len(matriz), config.KMEANS_FILAS_SILUETA), random_state=semilla
+    )
+    return float(modelo.inertia_), float(silueta)
+
+
+def elegir_k(matriz, k_min=2, k_max=10, semilla=42):
+    """
+    Barrido de k (codo y silueta) sobre una submuestra, un k por hilo: KMeans
+    y silhouette_score trabajan en código nativo y liberan el GIL.
+    """
+    if k_min < 2:
+        raise ValueError("k_min debe ser al menos 2.")
+    muestra = matriz[_muestra(len(matriz), config.KMEANS_FILAS_BARRIDO, semilla)]
+    k_max = min(k_max, len(muestra) - 1)
+    if k_max < k_min:
+        raise ValueError("No hay suficientes datos para elegir el número de clusters.")
+
+    candidatos = list(range(k_min, k_max + 1))
+    evaluaciones = Parallel(n_jobs=min(config.KMEANS_HILOS, len(candidatos)), prefer="threads")(
+        delayed(_evaluar_k)(muestra, k, semilla) for k in candidatos
+    )
+    inercias = [inercia for inercia, _ in evaluaciones]
+    siluetas = [silueta for _, silueta in evaluaciones]
+    validos = [(s, k) for s, k in zip(siluetas, candidatos) if s is not None]
+    elegido = max(validos)[1] if validos else k_min
+
+    return elegido, {
+        "k": candidatos,
+        "inercia": inercias,  # Para el gráfico de codo
+        "silueta": siluetas,
+        "k_elegido": elegido,
+        "filas_evaluadas": len(muestra),
+    }
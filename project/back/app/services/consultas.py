@@ -0,0 +1,153 @@
+import importlib.util
+
+from app.core import config
+from app.services import filtros as filtros_filas
+from app.services import ingestion, quantitative, statistics, storage
+
+# Motor de consultas embebido (MOTOR_CONSULTAS=duckdb).
+# El Pareto (conteo de valores) y las tablas dinámicas se resuelven con una
+# consulta de DuckDB sobre el dataset columnar, sin armar el DataFrame completo:
+#   - Arrow lee solo las columnas de la consulta y descarta al escanear las filas
+#     que no cumplen los filtros (ver services/filtros)
+#   - DuckDB agrupa en paralelo (CONSULTAS_HILOS hilos)
+#   - a Python vuelve solo el resultado agregado
+# Así las dimensiones de una tabla dinámica pueden tener hasta
+# CONSULTAS_PIVOT_MAX_CATEGORIAS categorías en vez de PIVOT_MAX_CATEGORIAS.
+
+# Dependencia opcional (sin duckdb todo se calcula con pandas). Se importa al consultar:
+# cargarla al iniciar cuesta ~30 MB por worker aunque el motor no se use
+DUCKDB_DISPONIBLE = importlib.util.find_spec("duckdb") is not None
+
+HERRAMIENTAS = {"pivot_table"}
+
+# aggfunc de pandas -> función de agregación SQL
+AGREGACIONES = {
+    "sum": "SUM",
+    "mean": "AVG",
+    "count": "COUNT",
+    "min": "MIN",
+    "max": "MAX",
+    "median": "MEDIAN",
+    "std": "STDDEV_SAMP",
+}
+
+
+def activo():
+    return config.MOTOR_CONSULTAS == "duckdb" and DUCKDB_DISPONIBLE
+
+
+def _identificador(columna):
+    return '"' + columna.replace('"', '""') + '"'
+
+
+def consultar(file_location, columnas, sql, filtros=None):
+    """
+    Ejecuta `sql` sobre la tabla `datos`: las `columnas` del dataset con los `filtros` aplicados.
+    Retorna el resultado como DataFrame.
+    """
+    import duckdb
+
+    datos = storage.dataset_arrow(file_location)
+    escaneo = datos.scanner(columns=list(dict.fromkeys(columnas)), filter=filtros_filas.expresion(filtros, datos.schema))
+    conexion = duckdb.connect()
+    try:
+        conexion.execute(f"SET threads = {max(1, config.CONSULTAS_HILOS)}")
+        conexion.register("datos", escaneo)
+        return conexion.execute(sql).df()
+    finally:
+        conexion.close()
+
+
+def _validar_columnas(file_location, columnas):
+    disponibles = {c["nombre"] for c in storage.leer_manifiesto(file_location)["columnas"]}
+    for columna in columnas:
+        if columna not in disponibles:
+            raise ValueError(f"La columna '{columna}' no existe en el archivo.")
+
+
+def conteo_valores(file_location, columna, filtros=None, columna_valor=None):
+    """
+    (conteo de cada valor no nulo de `columna`, suma de `columna_valor` por valor
+    o None, total de filas que cumplen los filtros).
+    """
+    columnas = [columna] + ([columna_valor] if columna_valor else [])
+    _validar_columnas(file_location, columnas)
+    col = _identificador(columna)
+    if columna_valor:
+        v = _identificador(columna_valor)
+        sql = f"SELECT {col} AS valor, COUNT(*) AS n, SUM({v}) AS peso, MIN({v}) AS minimo FROM datos GROUP BY 1"
+    else:
+        sql = f"SELECT {col} AS valor, COUNT(*) AS n FROM datos GROUP BY 1"
+    conteos = consultar(file_location, columnas, sql, filtros)
+    total = int(conteos["n"].sum())
+    conteos = conteos[conteos["valor"].notna()]
+    # El orden de los grupos de DuckDB no es determinista: los empates los resuelve pareto_desde_conteos
+    conteos = conteos.set_index("valor").rename_axis(None)
+    if not columna_valor:
+        return conteos["n"], None, total
+    statistics.validar_columna_valor(columna_valor, minimo=conteos["minimo"].min())
+    return conteos["n"], conteos["peso"].fillna(0), total
+
+
+def pareto(filename, columna, filtros=None, columna_valor=None, top_n=None, offset=0, limit=None):
+    """
+    (resultado, total_registros) del Pareto de `columna`, como `statistics.calcular_pareto`.
+    """
+    file_location = ingestion.ruta_dataset(filename)
+    ingestion.version_dataset(filename)  # convierte a columnar si hace falta
+    dtypes = ingestion.perfil_dataset(filename).dtypes() if columna_valor else {}
+    if columna_valor in dtypes:
+        # Antes de la consulta: SUM sobre una columna de texto fallaría en DuckDB
+        statistics.validar_columna_valor(columna_valor, dtypes[columna_valor])
+    conteos, pesos, total = conteo_valores(file_location, columna, filtros, columna_valor)
+    return statistics.pareto_desde_conteos(conteos, pesos, top_n, offset, limit), total
+
+
+def categorias_distintas(file_location, columna, filtros=None):
+    """
+    Cantidad de valores distintos (sin nulos) de `columna` en las filas que cumplen los filtros.
+    """
+    sql = f"SELECT COUNT(DISTINCT {_identificador(columna)}) AS categorias FROM datos"
+    return int(consultar(file_location, [columna], sql, filtros)["categorias"].iloc[0])
+
+
+def pivot(file_location, index, columns, values, aggfunc="sum", filtros=None):
+    """
+    La tabla de `df.pivot_table(index, columns, values, aggfunc)` calculada en DuckDB.
+    """
+    if aggfunc not in AGREGACIONES:
+        raise ValueError(f"Agregación '{aggfunc}' no soportada. Use: {', '.join(AGREGACIONES)}.")
+    i, c, v = _identificador(index), _identificador(columns), _identificador(values)
+    sql = (
+        f"SELECT {i} AS fila, {c} AS columna, {AGREGACIONES[aggfunc]}({v}) AS valor FROM datos "
+        f"WHERE {i} IS NOT NULL AND {c} IS NOT NULL GROUP BY 1, 2"
+    )
+    celdas = consultar(file_location, [index, columns, values], sql, filtros)
+    tabla = celdas.pivot(index="fila", columns="columna", values="valor")
+    return tabla.rename_axis(index=index, columns=columns)
+
+
+def analizar(request):
+    """
+    Resultado de una herramienta de HERRAMIENTAS para el AnalisisRequest.
+    """
+    if len(request.columnas_x) < 2:
+        raise ValueError("Para Pivot Table se requieren 2 columnas en X: [Columnas, Valores]")
+    index, columns, values = request.columna_y, request.columnas_x[0], request.columnas_x[1]
+
+    # Tipos y cardinalidades desde el perfil de columnas: sin leer los datos
+    perfil = ingestion.perfil_dataset(request.filename)
+    file_location = ingestion.ruta_dataset(request.filename)
+    filtros = request.parametros.get("filtros")
+    contar_categorias = perfil.cardinalidad
+    if filtros:
+        # La cardinalidad del perfil es la de todo el archivo: se cuentan las categorías de las filas filtradas
+        contar_categorias = lambda col: categorias_distintas(file_location, col, filtros)
+    error = quantitative.validar_pivot(
+        perfil.dtypes(), contar_categorias, index, columns, values, config.CONSULTAS_PIVOT_MAX_CATEGORIAS
+    )
+    if error:
+        return error
+
+    tabla = pivot(file_location, index, columns, values, request.parametros.get("aggfunc", "sum"), filtros)
+    return quantitative.formatear_pivot(tabla, request.parametros.get("formato", "heatmap"))
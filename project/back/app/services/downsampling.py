@@ -0,0 +1,126 @@
+import numpy as np
+
+from app.core import config
+
+# Reducción de puntos para gráficos.
+# Las respuestas con un punto por fila (dispersión de k-means, series de tiempo)
+# crecen con el dataset; el frontend no puede dibujar millones de puntos y
+# serializarlos domina el tiempo de respuesta. Estas funciones eligen, como
+# máximo, `max_puntos` índices que conservan la forma del gráfico:
+#   - muestreo_estratificado: dispersión por grupo (cada cluster mantiene su proporción)
+#   - lttb: líneas (Largest-Triangle-Three-Buckets, conserva picos y valles)
+#   - min_max: líneas (mínimo y máximo de cada tramo, conserva los extremos)
+# Todas retornan índices ordenados, para aplicarlos a varias series a la vez.
+
+METODOS_SERIE = ("lttb", "minmax")
+MAX_PUNTOS = config.PLOT_MAX_PUNTOS
+
+
+def max_puntos(parametros):
+    """
+    Lee `max_points` de los parámetros del request (por defecto PLOT_MAX_PUNTOS).
+    """
+    try:
+        valor = int(parametros.get("max_points", MAX_PUNTOS))
+    except (TypeError, ValueError):
+        raise ValueError("max_points debe ser un número entero.")
+    if valor < 3:
+        raise ValueError("max_points debe ser al menos 3.")
+    return valor
+
+
+def muestreo_uniforme(n, max_puntos, semilla=42):
+    if n <= max_puntos:
+        return np.arange(n)
+    return np.sort(np.random.default_rng(semilla).choice(n, max_puntos, replace=False))
+
+
+def muestreo_estratificado(etiquetas, max_puntos, semilla=42):
+    """
+    Muestra aleatoria de `max_puntos` filas con la misma proporción de cada
+    grupo; todo grupo conserva al menos un punto (los clusters pequeños no desaparecen).
+    """
+    n = len(etiquetas)
+    if n <= max_puntos:
+        return np.arange(n)
+
+    _, grupo, conteos = np.unique(etiquetas, return_inverse=True, return_counts=True)
+
+    # Cuotas proporcionales (método del mayor resto) con mínimo 1 por grupo
+    exactas = conteos * max_puntos / n
+    cuotas = np.maximum(np.floor(exactas).astype(np.int64), 1)
+    restantes = max_puntos - cuotas.sum()
+    if restantes > 0:
+        disponibles = np.flatnonzero(cuotas < conteos)
+        orden = disponibles[np.argsort(-(exactas - np.floor(exactas))[disponibles], kind="stable")]
+        cuotas[orden[:restantes]] += 1
+    elif restantes < 0:
+        # Más grupos que puntos: se recorta desde los grupos más grandes
+        for g in np.argsort(-cuotas, kind="stable")[:-restantes]:
+            cuotas[g] -= 1
+
+    rng = np.random.default_rng(semilla)
+    miembros = np.split(np.argsort(grupo, kind="stable"), np.cumsum(conteos)[:-1])
+    elegidos = [rng.choice(m, c, replace=False) for m, c in zip(miembros, cuotas) if c > 0]
+    return np.sort(np.concatenate(elegidos))
+
+
+def lttb(y, max_puntos, x=None):
+    """
+    Largest-Triangle-Three-Buckets: conserva el primer y último punto y, en
+    cada tramo intermedio, el que forma el triángulo de mayor área con el
+    punto elegido en el tramo anterior y el promedio del tramo siguiente.
+    """
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if n <= max_puntos:
+        return np.arange(n)
+    x = np.arange(n, dtype=np.float64) if x is None else np.asarray(x, dtype=np.float64)
+
+    bordes = np.linspace(1, n - 1, max_puntos - 1).astype(np.int64)
+    elegidos = np.empty(max_puntos, dtype=np.int64)
+    elegidos[0], elegidos[-1] = 0, n - 1
+    a = 0
+    for i in range(max_puntos - 2):
+        inicio, fin = bordes[i], max(bordes[i + 1], bordes[i] + 1)
+        if i + 2 < len(bordes):
+            siguiente = slice(bordes[i + 1], max(bordes[i + 2], bordes[i + 1] + 1))
+            prom_x, prom_y = x[siguiente].mean(), y[siguiente].mean()
+        else:
+            prom_x, prom_y = x[-1], y[-1]
+        areas = np.abs((x[a] - prom_x) * (y[inicio:fin] - y[a]) - (x[a] - x[inicio:fin]) * (prom_y - y[a]))
+        a = inicio + int(np.argmax(areas))
+        elegidos[i + 1] = a
+    return np.unique(elegidos)
+
+
+def min_max(y, max_puntos):
+    """
+    Divide la serie en max_puntos/2 tramos y conserva el mínimo y el máximo de cada uno.
+    """
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if n <= max_puntos:
+        return np.arange(n)
+
+    bordes = np.linspace(0, n, max_puntos // 2 + 1).astype(np.int64)
+    elegidos = []
+    for inicio, fin in zip(bordes[:-1], bordes[1:]):
+        if fin > inicio:
+            tramo = y[inicio:fin]
+            elegidos.extend((inicio + int(np.nanargmin(tramo)) if not np.isnan(tramo).all() else inicio,
+                             inicio + int(np.nanargmax(tramo)) if not np.isnan(tramo).all() else fin - 1))
+    return np.unique(elegidos)
+
+
+def reducir_serie(y, max_puntos, metodo="lttb"):
+    if metodo not in METODOS_SERIE:
+        raise ValueError(f"Método de muestreo '{metodo}' no soportado. Use: {', '.join(METODOS_SERIE)}.")
+    return lttb(y, max_puntos) if metodo == "lttb" else min_max(y, max_puntos)
+
+
+def resumen_muestreo(originales, indices, metodo):
+    """
+    Bloque informativo que se agrega a la respuesta cuando hubo reducción.
+    """
+    return {"puntos_originales": int(originales), "puntos": int(len(indices)), "metodo": metodo}
@@ -0,0 +1,256 @@
+import asyncio
+import contextvars
+import functools
+import multiprocessing
+import os
+import threading
+import weakref
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin flock, los límites valen solo dentro de cada worker
+    fcntl = None
+
+from app.core import config
+
+# Capa de ejecución de los análisis.
+# - Pool de hilos: carga de datos y cálculos numpy/pandas que liberan el GIL.
+# - Pool de procesos: ajustes de modelos pesados (random forest, k-means...) que
+#   de otro modo bloquearían al resto de peticiones del worker, incluido /health.
+# Cada herramienta tiene un límite de ejecuciones simultáneas; las que exceden
+# el límite esperan en cola sin ocupar hilos ni procesos.
+# Con EJECUTOR_CUPOS_DIR (varios workers, ver app/serve.py) los límites de
+# EJECUTOR_LIMITES valen para todo el servidor: una ejecución toma además uno de
+# los N cupos de su herramienta, un archivo <herramienta>.<i>.lock bloqueado con
+# flock (el sistema lo libera si el worker muere).
+
+# Espera entre intentos de tomar un cupo compartido ocupado
+SONDEO_CUPOS_S = 0.05
+
+
+class TiempoExcedido(TimeoutError):
+    """
+    El análisis no terminó dentro del tiempo permitido y fue abandonado.
+    """
+
+
+_pool_hilos = None
+_pool_procesos = None
+_lock_pool = threading.Lock()
+
+# Un juego de semáforos por event loop (asyncio.Semaphore queda atado al loop donde se usa)
+_semaforos = weakref.WeakKeyDictionary()
+
+_lock_metricas = threading.Lock()
+_metricas = defaultdict(lambda: {
+    "en_cola": 0,
+    "en_ejecucion": 0,
+    "completados": 0,
+    "errores": 0,
+    "tiempo_excedido": 0,
+})
+
+
+def _pool_de_hilos():
+    global _pool_hilos
+    with _lock_pool:
+        if _pool_hilos is None:
+            _pool_hilos = ThreadPoolExecutor(max_workers=config.EJECUTOR_HILOS, thread_name_prefix="analisis")
+        return _pool_hilos
+
+
+def _pool_de_procesos():
+    global _pool_procesos
+    with _lock_pool:
+        if _pool_procesos is None:
+            # spawn: los procesos no heredan hilos ni locks del servidor
+            _pool_procesos = ProcessPoolExecutor(
+                max_workers=config.EJECUTOR_PROCESOS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_inicializar_proceso,
+            )
+        return _pool_procesos
+
+
+def _inicializar_proceso():
+    # Corre en cada proceso nuevo del pool, antes de su primer trabajo
+    if config.ARRANQUE_PRECALENTAR:
+        from app.services import calentamiento
+
+        calentamiento.inicializar_proceso()
+
+
+def _descartar_pool_procesos(pool):
+    global _pool_procesos
+    with _lock_pool:
+        if _pool_procesos is pool:
+            _pool_procesos = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def usa_procesos(herramienta):
+    return herramienta in config.EJECUTOR_HERRAMIENTAS_PROCESO
+
+
+def _semaforo(herramienta):
+    loop = asyncio.get_running_loop()
+    por_herramienta = _semaforos.setdefault(loop, {})
+    if herramienta not in por_herramienta:
+        limite = config.EJECUTOR_LIMITES.get(herramienta, config.EJECUTOR_LIMITE_DEFECTO)
+        por_herramienta[herramienta] = asyncio.Semaphore(limite)
+    return por_herramienta[herramienta]
+
+
+def _tomar_cupo(herramienta, limite):
+    """
+    Descriptor de un cupo compartido libre (bloqueado con flock) o None si están todos ocupados.
+    """
+    os.makedirs(config.EJECUTOR_CUPOS_DIR, exist_ok=True)
+    for i in range(limite):
+        fd = os.open(os.path.join(config.EJECUTOR_CUPOS_DIR, f"{herramienta}.{i}.lock"), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return fd
+        except BlockingIOError:
+            os.close(fd)
+    return None
+
+
+async def _cupo_compartido(herramienta):
+    """
+    Espera un cupo compartido entre workers para las herramientas de EJECUTOR_LIMITES;
+    None si no aplica (un solo worker, herramienta con el límite por defecto o sin flock).
+    """
+    limite = config.EJECUTOR_LIMITES.get(herramienta)
+    if not config.EJECUTOR_CUPOS_DIR or limite is None or fcntl is None:
+        return None
+    while True:
+        fd = _tomar_cupo(herramienta, limite)
+        if fd is not None:
+            return fd
+        await asyncio.sleep(SONDEO_CUPOS_S)
+
+
+def _actualizar(herramienta, **cambios):
+    with _lock_metricas:
+        for clave, delta in cambios.items():
+            _metricas[herramienta][clave] += delta
+
+
+def _liberar(herramienta, semaforo, cupo):
+    _actualizar(herramienta, en_ejecucion=-1)
+    if cupo is not None:
+        fcntl.flock(cupo, fcntl.LOCK_UN)
+        os.close(cupo)
+    semaforo.release()
+
+
+def _liberar_desde_pool(loop, herramienta, semaforo, cupo):
+    try:
+        loop.call_soon_threadsafe(_liberar, herramienta, semaforo, cupo)
+    except RuntimeError:
+        # El loop ya se cerró (apagado del servidor): el cupo compartido no puede quedar tomado
+        if cupo is not None:
+            os.close(cupo)
+
+
+async def ejecutar(herramienta, funcion, *args, timeout=config.EJECUTOR_TIMEOUT_S):
+    """
+    Ejecuta `funcion(*args)` fuera del event loop, en el pool que corresponda a
+    la herramienta, respetando su límite de concurrencia.
+    Si no termina en `timeout` segundos (None = sin límite) se cancela si aún
+    no empezó, o se abandona si ya está corriendo, y se lanza TiempoExcedido.
+    Un cálculo abandonado conserva su cupo hasta que realmente termina: sigue
+    ocupando un hilo o proceso del pool.
+    """
+    en_procesos = usa_procesos(herramienta)
+    pool = _pool_de_procesos() if en_procesos else _pool_de_hilos()
+
+    semaforo = _semaforo(herramienta)
+
+    _actualizar(herramienta, en_cola=1)
+    try:
+        await semaforo.acquire()
+        try:
+            cupo = await _cupo_compartido(herramienta)
+        except BaseException:
+            semaforo.release()
+            raise
+    finally:
+        _actualizar(herramienta, en_cola=-1)
+
+    _actualizar(herramienta, en_ejecucion=1)
+    loop = asyncio.get_running_loop()
+    concurrente = None
+    try:
+        if not en_procesos:
+            # En hilos la función ve el contexto de la petición (ej. las mediciones de services/metrics)
+            funcion = functools.partial(contextvars.copy_context().run, funcion)
+        concurrente = pool.submit(funcion, *args)
+        resultado = await asyncio.wait_for(asyncio.wrap_future(concurrente), timeout)
+        _actualizar(herramienta, completados=1)
+        return resultado
+    except asyncio.TimeoutError:
+        _actualizar(herramienta, tiempo_excedido=1)
+        raise TiempoExcedido(f"El análisis '{herramienta}' superó el límite de {timeout:g} segundos.")
+    except BrokenProcessPool:
+        # Un proceso murió (ej. sin memoria): el pool queda inservible, se recrea en la próxima llamada
+        _descartar_pool_procesos(pool)
+        _actualizar(herramienta, errores=1)
+        raise
+    except Exception:
+        _actualizar(herramienta, errores=1)
+        raise
+    finally:
+        if concurrente is not None and not concurrente.done():
+            # Abandonado (tiempo excedido o petición cancelada) mientras corre:
+            # el cupo se libera en el event loop cuando el hilo/proceso termina
+            concurrente.add_done_callback(lambda _: _liberar_desde_pool(loop, herramienta, semaforo, cupo))
+        else:
+            _liberar(herramienta, semaforo, cupo)
+
+
+def mapear_en_procesos(funcion, lotes):
+    """
+    Ejecuta `funcion(lote)` para cada lote repartiendo los lotes en el pool de
+    procesos; retorna los resultados en orden. Se llama desde una tarea que ya
+    corre en el pool de hilos (no desde el event loop ni desde otro proceso).
+    """
+    pool = _pool_de_procesos()
+    try:
+        return list(pool.map(funcion, lotes))
+    except BrokenProcessPool:
+        _descartar_pool_procesos(pool)
+        raise
+
+
+def estadisticas():
+    """
+    Profundidad de cola y contadores por herramienta.
+    """
+    with _lock_metricas:
+        por_herramienta = {h: dict(m) for h, m in _metricas.items()}
+    return {
+        "hilos": config.EJECUTOR_HILOS,
+        "procesos": config.EJECUTOR_PROCESOS,
+        "timeout_s": config.EJECUTOR_TIMEOUT_S,
+        "en_cola": sum(m["en_cola"] for m in por_herramienta.values()),
+        "en_ejecucion": sum(m["en_ejecucion"] for m in por_herramienta.values()),
+        "herramientas": por_herramienta,
+    }
+
+
+def cerrar():
+    """
+    Detiene los pools (al apagar la aplicación).
+    """
+    global _pool_hilos, _pool_procesos
+    with _lock_pool:
+        for pool in (_pool_hilos, _pool_procesos):
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+        _pool_hilos = None
+        _pool_procesos = None
@@ -0,0 +1,90 @@
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# Filtros de filas (parametros["filtros"] en /analizar/cuantitativo y "filtros" en /analizar/pareto).
+# Lista de condiciones que deben cumplirse todas (AND):
+#   [{"columna": "Pais", "op": "in", "valor": ["Chile", "Perú"]},
+#    {"columna": "Ventas", "op": ">=", "valor": 1000},
+#    {"columna": "Fecha", "op": "<", "valor": "2024-01-01"}]
+# Se traducen a una expresión de Arrow que se evalúa al leer el archivo columnar
+# (predicate pushdown): las filas descartadas nunca llegan a pandas.
+
+OPERADORES = {
+    "==": pc.equal,
+    "!=": pc.not_equal,
+    ">": pc.greater,
+    ">=": pc.greater_equal,
+    "<": pc.less,
+    "<=": pc.less_equal,
+}
+OPERADORES_LISTA = ("in", "not_in")
+OPERADORES_SIN_VALOR = ("es_nulo", "no_nulo")
+OPERADOR_TEXTO = "contiene"
+
+
+def columnas(filtros):
+    return [f["columna"] for f in filtros or ()]
+
+
+def _tipo_valores(tipo):
+    # Las columnas categóricas pueden estar guardadas como diccionario: se compara contra sus valores
+    return tipo.value_type if pa.types.is_dictionary(tipo) else tipo
+
+
+def _escalar(valor, tipo, columna):
+    """
+    `valor` convertido al tipo de la columna (ej. "2024-01-01" para una columna de fechas).
+    """
+    try:
+        return pa.scalar(valor).cast(tipo)
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError, pa.ArrowTypeError):
+        raise ValueError(f"El valor {valor!r} no es comparable con la columna '{columna}' ({tipo}).")
+
+
+def _condicion(filtro, esquema):
+    if not isinstance(filtro, dict) or "columna" not in filtro or "op" not in filtro:
+        raise ValueError('Cada filtro debe tener "columna", "op" y (salvo es_nulo/no_nulo) "valor".')
+    columna, op = filtro["columna"], filtro["op"]
+    if columna not in esquema.names:
+        raise ValueError(f"La columna '{columna}' del filtro no existe en el archivo.")
+    campo = pc.field(columna)
+    tipo = _tipo_valores(esquema.field(columna).type)
+
+    if op == "es_nulo":
+        return campo.is_null()
+    if op == "no_nulo":
+        return campo.is_valid()
+    if "valor" not in filtro:
+        raise ValueError(f"El filtro '{op}' sobre '{columna}' requiere un valor.")
+    valor = filtro["valor"]
+
+    if op in OPERADORES:
+        return OPERADORES[op](campo, _escalar(valor, tipo, columna))
+    if op in OPERADORES_LISTA:
+        if not isinstance(valor, list):
+            raise ValueError(f"El filtro '{op}' sobre '{columna}' requiere una lista de valores.")
+        valores = pa.array([_escalar(v, tipo, columna).as_py() for v in valor], type=tipo)
+        condicion = campo.isin(valores)
+        return ~condicion if op == "not_in" else condicion
+    if op == OPERADOR_TEXTO:
+        if not (pa.types.is_string(tipo) or pa.types.is_large_string(tipo)):
+            raise ValueError(f"El filtro 'contiene' requiere una columna de texto ('{columna}' es {tipo}).")
+        return pc.match_substring(campo, str(valor), ignore_case=True)
+
+    soportados = list(OPERADORES) + list(OPERADORES_LISTA) + [OPERADOR_TEXTO] + list(OPERADORES_SIN_VALOR)
+    raise ValueError(f"Operador de filtro '{op}' no soportado. Use: {', '.join(soportados)}.")
+
+
+def expresion(filtros, esquema):
+    """
+    Expresión de Arrow (AND de todas las condiciones) para el esquema del archivo; None sin filtros.
+    """
+    if not filtros:
+        return None
+    if not isinstance(filtros, list):
+        raise ValueError("Los filtros deben ser una lista de condiciones.")
+    condiciones = [_condicion(f, esquema) for f in filtros]
+    resultado = condiciones[0]
+    for condicion in condiciones[1:]:
+        resultado = resultado & condicion
+    return resultado
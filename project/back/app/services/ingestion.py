@@ -1,10 +1,19 @@
 import pandas as pd
-import shutil
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import hashlib
+import uuid
 import os
 import csv
 import re
+from app.core import config
+from app.services import aggregates, executor, metrics, profiling, storage
+from app.services.cache import dataset_cache
+from app.services.result_cache import result_cache
 
-UPLOAD_DIR = "data/"
+UPLOAD_DIR = config.DATA_DIR
+BLOQUE_COPIA = 1024 * 1024  # 1 MB por lectura al guardar el archivo subido
 
 def extraer_metadata_valor(valor):
     """
@@ -58,13 +67,81 @@ def extraer_metadata_valor(valor):
         return (valor, None, None)
 
 
-def limpiar_dataframe(df):
+# Símbolos de moneda en orden de prioridad (mismo orden que extraer_metadata_valor)
+MONEDAS = {'$': 'USD', '€': 'EUR', '£': 'GBP', '¥': 'JPY'}
+
+# Patrón único para un valor formateado (ya en mayúsculas y sin espacios en los extremos):
+# moneda opcional, número con separador de miles (al menos un dígito: ",." no es un número),
+# porcentaje y sufijo de escala opcionales.
+# Ej: "$4,090.7 B", "€ 12 M", "15.3%", "-0.5"
+PATRON_VALOR = (
+    r'^(?P<moneda>[$€£¥]?) *'
+    r'(?P<numero>[+-]?(?:[\d,]*\.?\d+|[\d,]*\d[\d,]*\.)) *'
+    r'(?P<porcentaje>%?) *'
+    r'(?P<sufijo>[BMK]?)$'
+)
+# En un valor que cumple PATRON_VALOR estos caracteres solo aparecen en los extremos
+EXTREMOS_VALOR = "".join(MONEDAS) + "% BMK"
+
+
+def limpiar_columna(serie):
     """
-    Aplica limpieza automática a columnas que parecen numéricas pero tienen formato.
-    Crea columnas adicionales para moneda y sufijo si se detectan.
+    Versión vectorizada de `extraer_metadata_valor` para una columna completa.
+    Aplica `PATRON_VALOR` con kernels de texto de Arrow sobre toda la columna;
+    los pocos valores que el patrón no reconoce (ej. 'N/D', '1e5', tabulaciones
+    o espacios no ASCII) pasan por `extraer_metadata_valor`, así el resultado
+    es idéntico al de la versión celda por celda.
+    Retorna (valores, monedas, sufijos) como arrays object.
     """
-    columnas_nuevas = {}
-    
+    original = serie.to_numpy(dtype=object)
+    n = len(original)
+    valores = original.copy()
+    monedas = np.full(n, None, dtype=object)
+    sufijos = np.full(n, None, dtype=object)
+
+    # Nulos y números ya nativos se dejan tal cual
+    pendientes = ~pd.isna(original)
+    es_texto = pd.api.types.infer_dtype(original, skipna=True) == "string"
+    if not es_texto:
+        pendientes &= ~np.fromiter((isinstance(v, (int, float)) for v in original), dtype=bool, count=n)
+    idx = np.flatnonzero(pendientes)
+    if len(idx) == 0:
+        return valores, monedas, sufijos
+
+    celdas = original[idx]
+    if not es_texto:
+        celdas = celdas.astype(str)
+    texto = pc.utf8_upper(pc.utf8_trim_whitespace(pa.array(celdas, type=pa.string())))
+    vacios = pc.equal(pc.utf8_length(texto), 0).to_numpy(zero_copy_only=False)
+
+    # Un solo pase de regex decide qué celdas son valores formateados
+    es_valor = pc.match_substring_regex(texto, PATRON_VALOR).to_numpy(zero_copy_only=False)
+    validos = pc.filter(texto, pa.array(es_valor))
+
+    # En un valor válido la moneda solo puede ir al inicio y el sufijo al final,
+    # así que basta con mirar el primer/último carácter y recortar los extremos
+    moneda = pc.fill_null(pc.index_in(pc.utf8_slice_codeunits(validos, 0, 1), pa.array(list(MONEDAS))), -1).to_numpy()
+    sufijo = pc.utf8_slice_codeunits(validos, -1).to_numpy(zero_copy_only=False)
+    numero = pc.replace_substring(pc.utf8_trim(validos, EXTREMOS_VALOR), ",", "")
+
+    ok = idx[es_valor]
+    valores[ok] = pc.cast(numero, pa.float64()).to_numpy().tolist()
+    monedas[ok] = np.where(moneda >= 0, np.array([None, *MONEDAS.values()], dtype=object)[moneda + 1], None)
+    sufijos[ok] = np.where(np.isin(sufijo, ["B", "M", "K"]), sufijo, None)
+    valores[idx[vacios]] = pd.NA
+
+    # Casos raros que el patrón no cubre: misma lógica que la versión celda por celda
+    for i in idx[~es_valor & ~vacios]:
+        valores[i], monedas[i], sufijos[i] = extraer_metadata_valor(original[i])
+
+    return valores, monedas, sufijos
+
+
+def detectar_columnas_formateadas(df):
+    """
+    Columnas de texto que parecen numéricas pero tienen formato ($, B, M, K, %).
+    """
+    columnas = []
     for col in df.columns:
         # Solo procesar columnas tipo object (strings)
         if df[col].dtype == 'object':
@@ -77,30 +154,45 @@ def limpiar_dataframe(df):
             # Si >50% de la muestra coincide, limpiar la columna
             coincidencias = muestra.str.upper().str.match(patron_numerico).sum()
             if len(muestra) > 0 and coincidencias / len(muestra) > 0.5:
-                # Extraer metadata de cada valor
-                resultados = df[col].apply(extraer_metadata_valor)
-                
-                # Separar en columnas
-                valores = [r[0] for r in resultados]
-                monedas = [r[1] for r in resultados]
-                sufijos = [r[2] for r in resultados]
-                
-                # Actualizar columna original con valores numéricos
-                df[col] = valores
-                
-                # Intentar convertir a numérico
-                try:
-                    df[col] = pd.to_numeric(df[col])
-                except (ValueError, TypeError):
-                    pass
-                
-                # Crear columna de moneda si hay al menos una
-                if any(m is not None for m in monedas):
-                    columnas_nuevas[f"{col}_moneda"] = monedas
-                
-                # Crear columna de sufijo si hay al menos uno
-                if any(s is not None for s in sufijos):
-                    columnas_nuevas[f"{col}_escala"] = sufijos
+                columnas.append(col)
+    return columnas
+
+
+def limpiar_dataframe(df, columnas=None):
+    """
+    Aplica limpieza automática a columnas que parecen numéricas pero tienen formato.
+    Crea columnas adicionales para moneda y sufijo si se detectan.
+    Si se indican `columnas` se limpian esas sin volver a detectarlas
+    (ej. porciones de un archivo cuyo esquema se fijó con la primera).
+    """
+    if columnas is None:
+        columnas = detectar_columnas_formateadas(df)
+
+    columnas_nuevas = {}
+    
+    for col in columnas:
+        if df[col].dtype != 'object':
+            continue
+
+        # Extraer valor, moneda y sufijo de toda la columna en bloque
+        valores, monedas, sufijos = limpiar_columna(df[col])
+        
+        # Actualizar columna original con valores numéricos
+        df[col] = valores
+        
+        # Intentar convertir a numérico
+        try:
+            df[col] = pd.to_numeric(df[col])
+        except (ValueError, TypeError):
+            pass
+        
+        # Crear columna de moneda si hay al menos una
+        if pd.notna(monedas).any():
+            columnas_nuevas[f"{col}_moneda"] = monedas
+        
+        # Crear columna de sufijo si hay al menos uno
+        if pd.notna(sufijos).any():
+            columnas_nuevas[f"{col}_escala"] = sufijos
     
     # Agregar las nuevas columnas al DataFrame
     for nombre_col, valores in columnas_nuevas.items():
@@ -111,41 +203,289 @@ def limpiar_dataframe(df):
 # Asegurarse que la carpeta data existe
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
+def detectar_delimitador(file_location):
+    with open(file_location, 'r', encoding='utf-8') as f:
+        sample = f.read(4096)  # Leer primeros 4KB
+        sniffer = csv.Sniffer()
+        try:
+            return sniffer.sniff(sample).delimiter
+        except csv.Error:
+            # Sin un delimitador reconocible (ej. una sola columna): el de CSV por defecto
+            return ','
+
+
+def leer_archivo(file_location):
+    """
+    Lee un CSV (detectando el delimitador) o un Excel y retorna el DataFrame crudo.
+    """
+    if file_location.endswith('.csv'):
+        # Leer con el delimitador detectado automáticamente
+        return pd.read_csv(file_location, sep=detectar_delimitador(file_location), encoding='utf-8')
+    elif file_location.endswith('.xlsx'):
+        return pd.read_excel(file_location)
+    else:
+        raise ValueError("Formato no soportado")
+
+
+def ingestar_por_porciones(file_location, filas_por_porcion=None, version=None):
+    """
+    Ingesta en streaming de un CSV grande: lo lee por porciones, limpia cada una
+    con las columnas formateadas detectadas en la primera y las va agregando al
+    almacenamiento columnar. Nunca tiene el archivo completo en memoria.
+    Retorna (filas, columnas, preview, reporte de memoria del tipado).
+    """
+    porciones = pd.read_csv(
+        file_location,
+        sep=detectar_delimitador(file_location),
+        encoding='utf-8',
+        chunksize=filas_por_porcion or config.INGESTA_CHUNK_FILAS
+    )
+
+    columnas_formateadas = None
+    preview = None
+    perfil = None
+
+    def rehacer_perfil(columnas, escritas):
+        # Columnas ensanchadas (ej. entero -> float64): su perfil se rehace con el tipo nuevo
+        perfil.rehacer(columnas, escritor.esquema.empty_table().to_pandas().dtypes, escritas)
+
+    escritor = storage.EscritorColumnar(file_location, version, al_ensanchar=rehacer_perfil)
+    try:
+        for porcion in porciones:
+            if columnas_formateadas is None:
+                # El esquema (columnas a limpiar y tipos) se fija con la primera porción
+                columnas_formateadas = detectar_columnas_formateadas(porcion)
+            porcion = limpiar_dataframe(porcion, columnas_formateadas)
+            if preview is None:
+                preview = porcion.head(5).fillna("null").to_dict()
+
+            # El perfil se actualiza con la porción tal como quedó guardada (tipos del esquema)
+            porcion = escritor.escribir(porcion)
+            if perfil is None:
+                perfil = profiling.Perfil.vacio(porcion.dtypes, version)
+            perfil.actualizar(porcion)
+        # Con el perfil completo se sabe qué columnas de texto se leerán como `category`
+        escritor.cerrar(perfil.elegir_categoricas() if perfil is not None else ())
+    except Exception:
+        escritor.descartar()
+        raise
+
+    profiling.guardar(file_location, perfil)
+    return escritor.filas, escritor.esquema.names, preview, perfil.reporte_memoria()
+
+
+def _asegurar_columnar(file_location):
+    # Archivos subidos antes del formato columnar (o reemplazados a mano): convertir una vez
+    if not storage.columnar_vigente(file_location):
+        df = limpiar_dataframe(leer_archivo(file_location))
+        version = storage.hash_archivo(file_location)
+        perfil = profiling.Perfil.desde_df(df, version)
+        storage.guardar_columnar(df, file_location, version, perfil.elegir_categoricas())
+        profiling.guardar(file_location, perfil)
+        dataset_cache.invalidar(storage.ruta_manifiesto(file_location))
+        result_cache.invalidar_archivo(os.path.basename(file_location))
+        aggregates.eliminar(file_location)
+
+
+def ruta_dataset(filename):
+    """
+    Ruta del archivo subido; FileNotFoundError si no existe.
+    """
+    file_location = f"{UPLOAD_DIR}/{filename}"
+    if not os.path.exists(file_location):
+        raise FileNotFoundError(file_location)
+    return file_location
+
+
+def version_dataset(filename):
+    """
+    Identificador del contenido actual del dataset (hash del archivo subido).
+    Cambia cada vez que el archivo se vuelve a subir con otro contenido o se le anexan filas.
+    """
+    file_location = ruta_dataset(filename)
+    _asegurar_columnar(file_location)
+    version = storage.leer_manifiesto(file_location).get("version")
+    if version is None:
+        # Manifiesto anterior a las versiones: usar la firma de la versión columnar
+        stat = os.stat(storage.ruta_columnar(file_location))
+        version = f"{stat.st_mtime_ns}-{stat.st_size}"
+    return version
+
+
+def cargar_dataset(filename, columnas=None, filtros=None):
+    """
+    Retorna el DataFrame limpio de un archivo ya subido, leído desde su versión
+    columnar. Si se indican `columnas`, solo se cargan esas.
+    Usa la caché del proceso y cada llamada recibe su propia copia; con
+    DATASET_CACHE_MODO=compartido lee sin copia desde el archivo mapeado.
+    Con `filtros` (ver services/filtros) solo se leen las filas que los cumplen, sin caché.
+    """
+    file_location = ruta_dataset(filename)
+    _asegurar_columnar(file_location)
+
+    if filtros:
+        return storage.leer_columnar(
+            file_location, columnas, sin_copia=config.DATASET_CACHE_MODO == "compartido", filtros=filtros
+        )
+
+    if config.DATASET_CACHE_MODO == "compartido":
+        # Varios workers: el archivo vive una sola vez en la caché de páginas del sistema
+        # en vez de una copia del DataFrame por worker
+        return storage.leer_columnar(file_location, columnas, sin_copia=True)
+
+    # La entrada se valida contra el manifiesto: cambia al reemplazar el archivo y al anexar filas
+    return dataset_cache.obtener(
+        storage.ruta_manifiesto(file_location),
+        lambda: storage.leer_columnar(file_location, columnas),
+        columnas
+    )
+
+
+def perfil_dataset(filename):
+    """
+    Perfil de columnas vigente del dataset (ver profiling); se construye una vez
+    si el archivo se subió antes de que existiera el perfil.
+    """
+    file_location = ruta_dataset(filename)
+    return profiling.obtener(file_location, version_dataset(filename), lambda: cargar_dataset(filename))
+
+
 async def process_upload(file):
+    if not file.filename.endswith(('.csv', '.xlsx')):
+        return {"error": "Formato no soportado"}
+
+    # Guardar, limpiar y convertir es trabajo bloqueante: se hace fuera del event loop
+    metrics.etiquetar("upload")
+    return await executor.ejecutar("upload", procesar_archivo, file, timeout=None)
+
+
+def _guardar_subida(file, destino):
+    """
+    Copia el archivo subido por bloques (sin cargarlo en memoria) y retorna
+    el hash de su contenido.
+    """
+    contenido_hash = hashlib.sha256()
+    with open(destino, "wb") as buffer:
+        for bloque in iter(lambda: file.file.read(BLOQUE_COPIA), b""):
+            contenido_hash.update(bloque)
+            buffer.write(bloque)
+    return contenido_hash.hexdigest()
+
+
+def leer_subida(file, prefijo):
+    """
+    Lee un archivo subido que no se conserva (anexos, archivos a puntuar) a
+    través de un temporal `<prefijo>-<uuid>.<ext>`. Retorna (df crudo, hash del contenido).
+    """
+    # El temporal conserva la extensión para que `leer_archivo` lo reconozca
+    temporal = f"{prefijo}-{uuid.uuid4().hex}{os.path.splitext(file.filename)[1]}"
+    try:
+        contenido_hash = _guardar_subida(file, temporal)
+        return leer_archivo(temporal), contenido_hash
+    finally:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+
+
+def procesar_archivo(file):
     file_location = f"{UPLOAD_DIR}/{file.filename}"
-    
-    # 1. Guardar el archivo físicamente
-    with open(file_location, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-        
+
+    # 1. Guardar el archivo físicamente; el hash del contenido identifica la versión del dataset
+    with metrics.medir("recepcion"):
+        version = _guardar_subida(file, file_location)
+
+    # CSV grandes: limpiar y guardar por porciones para no agotar la memoria
+    if file.filename.endswith('.csv') and os.path.getsize(file_location) >= config.INGESTA_STREAMING_MIN_MB * 1024 * 1024:
+        with metrics.medir("porciones"):
+            filas, columnas, preview, memoria = ingestar_por_porciones(file_location, version=version)
+        dataset_cache.invalidar(storage.ruta_manifiesto(file_location))
+        result_cache.invalidar_archivo(file.filename)
+        aggregates.eliminar(file_location)
+        return {
+            "filename": file.filename,
+            "rows": filas,
+            "columns": columnas,
+            "preview": preview,
+            "memoria": memoria
+        }
+
     # 2. Leer con Pandas según extensión
-    if file.filename.endswith('.csv'):
-        # Detectar el delimitador automáticamente
-        with open(file_location, 'r', encoding='utf-8') as f:
-            sample = f.read(4096)  # Leer primeros 4KB
-            sniffer = csv.Sniffer()
-            delimiter = sniffer.sniff(sample).delimiter
-        
-        # Leer con el delimitador detectado
-        df = pd.read_csv(file_location, sep=delimiter, encoding='utf-8')
-    elif file.filename.endswith('.xlsx'):
-        df = pd.read_excel(file_location)
-    else:
-        return {"error": "Formato no soportado"}
+    with metrics.medir("lectura"):
+        df = leer_archivo(file_location)
 
     # 3. Limpiar valores numéricos con formato ($, B, M, K)
-    df = limpiar_dataframe(df)
+    with metrics.medir("limpieza"):
+        df = limpiar_dataframe(df)
     
-    # 4. Guardar el archivo limpio (sobrescribir)
-    if file.filename.endswith('.csv'):
-        df.to_csv(file_location, index=False)
-    elif file.filename.endswith('.xlsx'):
-        df.to_excel(file_location, index=False)
+    # 4. Perfil de columnas (tipos, cardinalidad, valores frecuentes) para el frontend y las
+    #    validaciones; con él se eligen las columnas de texto que se leerán como `category`
+    with metrics.medir("perfil"):
+        perfil = profiling.Perfil.desde_df(df, version)
+
+    # 5. Guardar la versión limpia y tipada en formato columnar (el original queda intacto)
+    with metrics.medir("columnar"):
+        storage.guardar_columnar(df, file_location, version, perfil.elegir_categoricas())
+        profiling.guardar(file_location, perfil)
+
+    # El dataset cambió: descartar cualquier versión en caché y lo calculado sobre él
+    dataset_cache.invalidar(storage.ruta_manifiesto(file_location))
+    result_cache.invalidar_archivo(file.filename)
+    aggregates.eliminar(file_location)
 
     # 5. Retornar metadatos básicos (Columnas, filas)
     return {
         "filename": file.filename,
         "rows": df.shape[0],
         "columns": list(df.columns),
-        "preview": df.head(5).fillna("null").to_dict()
-    }
\ No newline at end of file
+        "preview": df.head(5).fillna("null").to_dict(),
+        "memoria": perfil.reporte_memoria()
+    }
+
+
+async def process_append(filename, file):
+    if not file.filename.endswith(('.csv', '.xlsx')):
+        return {"error": "Formato no soportado"}
+
+    return await executor.ejecutar("upload", anexar_archivo, filename, file, timeout=None)
+
+
+def anexar_archivo(filename, file):
+    """
+    Agrega las filas de `file` al dataset `filename` ya subido, como un nuevo
+    segmento columnar, y actualiza sus agregados incrementales solo con esas filas.
+    """
+    file_location = ruta_dataset(filename)
+    crudo, contenido_hash = leer_subida(file, f"{file_location}.anexo")
+
+    with aggregates.bloqueo(file_location):
+        _asegurar_columnar(file_location)
+        manifiesto = storage.leer_manifiesto(file_location)
+
+        # Las columnas originales deben coincidir (las de metadata _moneda/_escala se ajustan solas)
+        derivadas = {c for meta in manifiesto["metadatos"].values() for c in meta.values()}
+        esperadas = [c["nombre"] for c in manifiesto["columnas"] if c["nombre"] not in derivadas]
+        recibidas = [str(c) for c in crudo.columns]
+        faltantes = [c for c in esperadas if c not in recibidas]
+        sobrantes = [c for c in recibidas if c not in esperadas]
+        if faltantes or sobrantes:
+            raise ValueError(
+                f"Las columnas no coinciden con el dataset '{filename}'. "
+                f"Faltan: {faltantes}. Sobran: {sobrantes}."
+            )
+
+        df = limpiar_dataframe(crudo)
+        version_anterior = manifiesto.get("version")
+        manifiesto, anexado = storage.anexar_segmento(file_location, df, contenido_hash)
+        aggregates.actualizar(file_location, version_anterior, manifiesto["version"], anexado)
+        profiling.actualizar(file_location, version_anterior, manifiesto["version"], anexado)
+
+    dataset_cache.invalidar(storage.ruta_manifiesto(file_location))
+    result_cache.invalidar_archivo(filename)
+
+    return {
+        "filename": filename,
+        "rows_added": len(anexado),
+        "rows": manifiesto["filas"],
+        "segments": len(manifiesto["segmentos"]),
+        "preview": anexado.head(5).astype(object).fillna("null").to_dict()  # `category` no admite "null"
+    }
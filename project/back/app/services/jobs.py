@@ -0,0 +1,304 @@
+import asyncio
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import uuid
+
+from app.core import config
+from app.services import analysis, executor
+
+# Trabajos de análisis asíncronos.
+# POST /jobs crea el trabajo y responde de inmediato con su id; el análisis corre
+# en segundo plano sobre el ejecutor (misma cola y límites que /analizar) y el
+# cliente consulta el estado o se suscribe a los eventos de progreso (SSE).
+# Los trabajos terminados se conservan JOBS_TTL_S segundos.
+# El trabajo corre en el worker que lo creó. Con JOBS_REGISTRO (varios workers,
+# ver app/serve.py) su estado se publica además en un registro SQLite compartido:
+# cualquier worker responde GET /jobs/{id}, /eventos (consultando el registro
+# cada JOBS_SONDEO_S) y DELETE, que deja una solicitud de cancelación que el
+# worker dueño revisa con la misma frecuencia.
+
+logger = logging.getLogger(__name__)
+
+ESTADOS_FINALES = {"completado", "error", "cancelado"}
+
+
+class Trabajo:
+    def __init__(self, request):
+        self.id = uuid.uuid4().hex
+        self.request = request
+        self.estado = "en_cola"
+        self.etapa = "en_cola"
+        self.progreso = 0
+        self.resultado = None
+        self.error = None
+        self.codigo_error = None
+        self.creado = time.time()
+        self.actualizado = self.creado
+        self.tarea = None
+        self.version = 0  # aumenta en cada cambio (ver esperar_cambio)
+        self._cambio = asyncio.Event()
+
+    @property
+    def terminado(self):
+        return self.estado in ESTADOS_FINALES
+
+    def actualizar(self, **cambios):
+        for campo, valor in cambios.items():
+            setattr(self, campo, valor)
+        self.actualizado = time.time()
+        self.version += 1
+        if registro is not None:
+            registro.guardar(self)
+        # Despertar a los suscriptores y preparar el evento para el próximo cambio
+        self._cambio.set()
+        self._cambio = asyncio.Event()
+
+    async def esperar_cambio(self, version, timeout):
+        """
+        True si el trabajo cambió desde `version` (la que vio el suscriptor, aunque
+        el cambio haya ocurrido antes de llamar), False si pasan `timeout` segundos sin cambios.
+        """
+        if self.version != version:
+            return True
+        try:
+            await asyncio.wait_for(self._cambio.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def a_dict(self, incluir_resultado=True):
+        datos = {
+            "job_id": self.id,
+            "estado": self.estado,
+            "etapa": self.etapa,
+            "progreso": self.progreso,
+            "tipo_analisis": self.request.tipo_analisis,
+            "filename": self.request.filename,
+            "creado": self.creado,
+            "actualizado": self.actualizado,
+        }
+        if self.error is not None:
+            datos["error"] = self.error
+            datos["codigo_error"] = self.codigo_error
+        if incluir_resultado and self.estado == "completado":
+            datos["resultado"] = self.resultado
+        return datos
+
+
+class RegistroTrabajos:
+    """
+    Estado de los trabajos compartido por todos los workers (SQLite en modo WAL;
+    una conexión por hilo). Cada fila guarda el a_dict() completo del trabajo.
+    """
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(ruta)), exist_ok=True)
+        with self._conexion() as conexion:
+            conexion.execute(
+                "CREATE TABLE IF NOT EXISTS trabajos ("
+                "job_id TEXT PRIMARY KEY, datos BLOB, actualizado REAL, terminado INTEGER, cancelar INTEGER DEFAULT 0)"
+            )
+            conexion.execute("CREATE INDEX IF NOT EXISTS trabajos_actualizado ON trabajos (actualizado)")
+
+    def _conexion(self):
+        conexion = getattr(self._local, "conexion", None)
+        if conexion is None:
+            conexion = sqlite3.connect(self.ruta, timeout=30)
+            conexion.execute("PRAGMA journal_mode=WAL")
+            conexion.execute("PRAGMA synchronous=NORMAL")
+            self._local.conexion = conexion
+        return conexion
+
+    def guardar(self, trabajo):
+        datos = pickle.dumps(trabajo.a_dict(), protocol=pickle.HIGHEST_PROTOCOL)
+        with self._conexion() as conexion:
+            # La solicitud de cancelación de otro worker se conserva al actualizar
+            conexion.execute(
+                "INSERT INTO trabajos (job_id, datos, actualizado, terminado) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (job_id) DO UPDATE SET datos = excluded.datos, "
+                "actualizado = excluded.actualizado, terminado = excluded.terminado",
+                (trabajo.id, datos, trabajo.actualizado, int(trabajo.terminado)),
+            )
+
+    def leer(self, job_id):
+        with self._conexion() as conexion:
+            fila = conexion.execute("SELECT datos FROM trabajos WHERE job_id = ?", (job_id,)).fetchone()
+        return pickle.loads(fila[0]) if fila is not None else None
+
+    def listar(self):
+        with self._conexion() as conexion:
+            filas = conexion.execute("SELECT datos FROM trabajos ORDER BY actualizado").fetchall()
+        datos = [pickle.loads(fila[0]) for fila in filas]
+        for trabajo in datos:
+            trabajo.pop("resultado", None)
+        return datos
+
+    def solicitar_cancelacion(self, job_id):
+        with self._conexion() as conexion:
+            conexion.execute("UPDATE trabajos SET cancelar = 1 WHERE job_id = ? AND terminado = 0", (job_id,))
+
+    def cancelacion_solicitada(self, job_id):
+        with self._conexion() as conexion:
+            fila = conexion.execute("SELECT cancelar FROM trabajos WHERE job_id = ?", (job_id,)).fetchone()
+        return bool(fila and fila[0])
+
+    def limpiar(self, ttl_s, max_retenidos):
+        """
+        Borra los trabajos sin cambios hace más de `ttl_s` (terminados, o de un
+        worker que se detuvo) y, sobre `max_retenidos`, los terminados más antiguos.
+        """
+        with self._conexion() as conexion:
+            conexion.execute("DELETE FROM trabajos WHERE actualizado < ?", (time.time() - ttl_s,))
+            total = conexion.execute("SELECT COUNT(*) FROM trabajos").fetchone()[0]
+            if total > max_retenidos:
+                conexion.execute(
+                    "DELETE FROM trabajos WHERE job_id IN ("
+                    "SELECT job_id FROM trabajos WHERE terminado = 1 ORDER BY actualizado LIMIT ?)",
+                    (total - max_retenidos,),
+                )
+
+
+class TrabajoRemoto:
+    """
+    Vista de solo lectura de un trabajo de otro worker (misma interfaz que Trabajo
+    para los endpoints); los cambios se detectan consultando el registro.
+    """
+
+    def __init__(self, datos):
+        self.id = datos["job_id"]
+        self.datos = datos
+
+    @property
+    def terminado(self):
+        return self.datos["estado"] in ESTADOS_FINALES
+
+    @property
+    def version(self):
+        return self.datos["actualizado"], self.datos["estado"]
+
+    async def esperar_cambio(self, version, timeout):
+        if self.version != version:
+            return True
+        limite = time.monotonic() + timeout
+        while time.monotonic() < limite:
+            await asyncio.sleep(config.JOBS_SONDEO_S)
+            datos = registro.leer(self.id)
+            if datos is None:
+                # Expiró mientras se seguía: se informa como cancelado
+                datos = {**self.datos, "estado": "cancelado", "etapa": "cancelado"}
+            if datos["actualizado"] != self.datos["actualizado"] or datos["estado"] != self.datos["estado"]:
+                self.datos = datos
+                return True
+        return False
+
+    def a_dict(self, incluir_resultado=True):
+        if incluir_resultado:
+            return dict(self.datos)
+        return {k: v for k, v in self.datos.items() if k != "resultado"}
+
+
+registro = RegistroTrabajos(config.JOBS_REGISTRO) if config.JOBS_REGISTRO else None
+_trabajos = {}  # los trabajos que corren en este worker
+
+
+def _limpiar_vencidos():
+    """
+    Elimina los trabajos terminados cuyo TTL venció y, si aún se excede el
+    máximo retenido, los terminados más antiguos.
+    """
+    if registro is not None:
+        registro.limpiar(config.JOBS_TTL_S, config.JOBS_MAX_RETENIDOS)
+    ahora = time.time()
+    for job_id in [j.id for j in _trabajos.values() if j.terminado and ahora - j.actualizado > config.JOBS_TTL_S]:
+        del _trabajos[job_id]
+
+    terminados = sorted((j for j in _trabajos.values() if j.terminado), key=lambda j: j.actualizado)
+    exceso = len(_trabajos) - config.JOBS_MAX_RETENIDOS
+    for trabajo in terminados[:max(0, exceso)]:
+        del _trabajos[trabajo.id]
+
+
+async def _correr(trabajo):
+    def al_avanzar(etapa, progreso):
+        trabajo.actualizar(estado="ejecutando", etapa=etapa, progreso=progreso)
+
+    try:
+        resultado, _ = await analysis.analizar_memoizado(trabajo.request, al_avanzar)
+        trabajo.actualizar(estado="completado", etapa="completado", progreso=100, resultado=resultado)
+    except asyncio.CancelledError:
+        if not trabajo.terminado:
+            trabajo.actualizar(estado="cancelado", etapa="cancelado")
+    except FileNotFoundError:
+        trabajo.actualizar(estado="error", codigo_error=404, error="Archivo no encontrado. Sube el archivo primero.")
+    except executor.TiempoExcedido as e:
+        trabajo.actualizar(estado="error", codigo_error=504, error=str(e))
+    except ValueError as e:
+        trabajo.actualizar(estado="error", codigo_error=400, error=str(e))
+    except Exception as e:
+        logger.exception("Error procesando trabajo %s (%s)", trabajo.id, trabajo.request.tipo_analisis)
+        trabajo.actualizar(estado="error", codigo_error=500, error=f"Error interno en el análisis: {str(e)}")
+
+
+async def _vigilar_cancelacion(trabajo):
+    # Solo con registro: DELETE /jobs/{id} pudo llegar a otro worker
+    while not trabajo.terminado:
+        await asyncio.sleep(config.JOBS_SONDEO_S)
+        if not trabajo.terminado and registro.cancelacion_solicitada(trabajo.id):
+            cancelar(trabajo.id)
+
+
+def crear(request):
+    _limpiar_vencidos()
+    trabajo = Trabajo(request)
+    _trabajos[trabajo.id] = trabajo
+    if registro is not None:
+        registro.guardar(trabajo)
+    loop = asyncio.get_running_loop()
+    trabajo.tarea = loop.create_task(_correr(trabajo))
+    if registro is not None:
+        loop.create_task(_vigilar_cancelacion(trabajo))
+    return trabajo
+
+
+def obtener(job_id):
+    """
+    El trabajo (Trabajo si corre en este worker, TrabajoRemoto si corre en otro) o None.
+    """
+    _limpiar_vencidos()
+    trabajo = _trabajos.get(job_id)
+    if trabajo is None and registro is not None:
+        datos = registro.leer(job_id)
+        trabajo = TrabajoRemoto(datos) if datos is not None else None
+    return trabajo
+
+
+def listar():
+    _limpiar_vencidos()
+    if registro is not None:
+        return registro.listar()
+    return [t.a_dict(incluir_resultado=False) for t in _trabajos.values()]
+
+
+def cancelar(job_id):
+    """
+    Cancela un trabajo pendiente o en curso (si ya corre en el pool, se abandona).
+    Debe llamarse desde el event loop.
+    """
+    trabajo = _trabajos.get(job_id)
+    if trabajo is None:
+        if registro is None:
+            return None
+        # Corre en otro worker: se deja la solicitud, su dueño la atiende en JOBS_SONDEO_S
+        registro.solicitar_cancelacion(job_id)
+        return obtener(job_id)
+    if not trabajo.terminado and trabajo.tarea is not None and trabajo.tarea.cancel():
+        # Una tarea cancelada antes de empezar nunca llega al except de _correr:
+        # se marca aquí para que la respuesta y los suscriptores (evento 'fin') lo vean
+        trabajo.actualizar(estado="cancelado", etapa="cancelado")
+    return trabajo
@@ -0,0 +1,246 @@
+import contextvars
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows: sin getrusage
+    resource = None
+
+from app.core import config
+from app.services import executor
+from app.services.cache import dataset_cache
+from app.services.result_cache import result_cache
+
+# Instrumentación de las peticiones.
+# Cada etapa de un análisis (carga, cálculo, serialización; lectura, limpieza,
+# columnar y perfil en la subida) se mide con `medir(etapa)`:
+#   - se acumula en el histograma analitica_etapa_segundos{etapa, herramienta}
+#   - se agrega al Server-Timing de la petición en curso (contextvar; el
+#     ejecutor propaga el contexto a sus hilos, no a los procesos)
+# `exposicion()` arma el texto de GET /metrics (formato Prometheus) con los
+# histogramas, la memoria del proceso y las estadísticas de cachés y ejecutor.
+# `ejecutar_perfilado` corre una función bajo cProfile (modo ?profile=1).
+
+LIMITES_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+def _escapar(valor):
+    return str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _etiquetas(pares):
+    if not pares:
+        return ""
+    return "{" + ",".join(f'{k}="{_escapar(v)}"' for k, v in pares) + "}"
+
+
+class Histograma:
+    """
+    Histograma acumulativo por combinación de etiquetas (como el de Prometheus).
+    """
+
+    def __init__(self, nombre, ayuda, etiquetas, limites=LIMITES_LATENCIA):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self.limites = tuple(limites)
+        self._series = {}  # valores de etiquetas -> [conteos por límite, suma, total]
+        self._lock = threading.Lock()
+
+    def observar(self, valor, **etiquetas):
+        clave = tuple(str(etiquetas.get(e, "")) for e in self.etiquetas)
+        with self._lock:
+            serie = self._series.get(clave)
+            if serie is None:
+                serie = self._series[clave] = [[0] * len(self.limites), 0.0, 0]
+            for i, limite in enumerate(self.limites):
+                if valor <= limite:
+                    serie[0][i] += 1
+            serie[1] += valor
+            serie[2] += 1
+
+    def exposicion(self):
+        with self._lock:
+            series = {clave: (list(c), s, n) for clave, (c, s, n) in self._series.items()}
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} histogram"]
+        for clave, (conteos, suma, total) in sorted(series.items()):
+            pares = list(zip(self.etiquetas, clave))
+            for limite, conteo in zip(self.limites, conteos):
+                lineas.append(f"{self.nombre}_bucket{_etiquetas(pares + [('le', f'{limite:g}')])} {conteo}")
+            lineas.append(f"{self.nombre}_bucket{_etiquetas(pares + [('le', '+Inf')])} {total}")
+            lineas.append(f"{self.nombre}_sum{_etiquetas(pares)} {suma:.6f}")
+            lineas.append(f"{self.nombre}_count{_etiquetas(pares)} {total}")
+        return lineas
+
+
+solicitudes_segundos = Histograma(
+    "analitica_http_solicitud_segundos", "Duración de las peticiones HTTP.", ("metodo", "ruta", "estado")
+)
+etapas_segundos = Histograma(
+    "analitica_etapa_segundos", "Duración de cada etapa de un análisis o una subida.", ("etapa", "herramienta")
+)
+
+
+# --- MEDICIÓN POR PETICIÓN ---
+
+class ContextoPeticion:
+    def __init__(self):
+        self.herramienta = ""
+        self.tiempos = []  # [(etapa, segundos)] en orden
+
+
+_contexto = contextvars.ContextVar("contexto_peticion", default=None)
+
+
+def iniciar_peticion():
+    """
+    Abre el contexto de medición de una petición; retorna el token para `terminar_peticion`.
+    """
+    return _contexto.set(ContextoPeticion())
+
+
+def terminar_peticion(token):
+    _contexto.reset(token)
+
+
+def peticion_actual():
+    return _contexto.get()
+
+
+def etiquetar(herramienta):
+    """
+    Herramienta a la que se atribuyen las etapas que siguen en esta petición.
+    """
+    contexto = _contexto.get()
+    if contexto is not None:
+        contexto.herramienta = herramienta
+
+
+def registrar(etapa, segundos, herramienta=None):
+    contexto = _contexto.get()
+    if herramienta is None:
+        herramienta = contexto.herramienta if contexto is not None else ""
+    etapas_segundos.observar(segundos, etapa=etapa, herramienta=herramienta)
+    if contexto is not None:
+        contexto.tiempos.append((etapa, segundos))
+
+
+@contextmanager
+def medir(etapa, herramienta=None):
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        registrar(etapa, time.perf_counter() - inicio, herramienta)
+
+
+def tiempos_por_etapa(contexto):
+    """
+    Milisegundos por etapa (las repetidas se suman), en el orden en que ocurrieron.
+    """
+    tiempos = {}
+    for etapa, segundos in (contexto.tiempos if contexto is not None else ()):
+        tiempos[etapa] = tiempos.get(etapa, 0.0) + segundos * 1000
+    return tiempos
+
+
+def server_timing(contexto, total_s):
+    """
+    Valor del header Server-Timing: `carga;dur=12.3, calculo;dur=40.1, total;dur=55.0`.
+    """
+    partes = [f"{etapa};dur={ms:.1f}" for etapa, ms in tiempos_por_etapa(contexto).items()]
+    partes.append(f"total;dur={total_s * 1000:.1f}")
+    return ", ".join(partes)
+
+
+# --- PERFILADO (?profile=1) ---
+
+def ejecutar_perfilado(funcion, *args):
+    """
+    Ejecuta `funcion(*args)` bajo cProfile. Retorna (resultado, resumen en texto
+    con las PERFILADO_MAX_FUNCIONES funciones de mayor tiempo acumulado).
+    Es de módulo para poder correr también en el pool de procesos.
+    """
+    perfil = cProfile.Profile()
+    resultado = perfil.runcall(funcion, *args)
+    salida = io.StringIO()
+    estadisticas = pstats.Stats(perfil, stream=salida).strip_dirs().sort_stats("cumulative")
+    estadisticas.print_stats(config.PERFILADO_MAX_FUNCIONES)
+    return resultado, salida.getvalue()
+
+
+# --- EXPOSICIÓN (GET /metrics) ---
+
+def memoria_rss():
+    """
+    (RSS actual, pico de RSS) del proceso en bytes; None si la plataforma no lo informa.
+    """
+    actual = pico = None
+    try:
+        with open("/proc/self/statm") as f:
+            actual = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    if resource is not None:
+        # ru_maxrss: KB en Linux, bytes en macOS
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        pico *= 1 if sys.platform == "darwin" else 1024
+    return actual, pico
+
+
+def _metrica(lineas, nombre, tipo, ayuda, muestras):
+    """
+    `muestras`: [(pares de etiquetas, valor)]; se omiten los valores None.
+    """
+    muestras = [(pares, valor) for pares, valor in muestras if valor is not None]
+    if not muestras:
+        return
+    lineas.append(f"# HELP {nombre} {ayuda}")
+    lineas.append(f"# TYPE {nombre} {tipo}")
+    for pares, valor in muestras:
+        lineas.append(f"{nombre}{_etiquetas(pares)} {valor}")
+
+
+def exposicion():
+    """
+    Todas las métricas en el formato de texto de Prometheus (version 0.0.4).
+    """
+    lineas = solicitudes_segundos.exposicion() + etapas_segundos.exposicion()
+
+    actual, pico = memoria_rss()
+    _metrica(lineas, "analitica_memoria_rss_bytes", "gauge", "Memoria residente del proceso.", [((), actual)])
+    _metrica(lineas, "analitica_memoria_rss_pico_bytes", "gauge", "Pico de memoria residente del proceso.", [((), pico)])
+
+    for prefijo, estadisticas, descripcion in (
+        ("analitica_cache_datasets", dataset_cache.estadisticas(), "caché de datasets"),
+        ("analitica_cache_resultados", result_cache.estadisticas(), "caché de resultados"),
+    ):
+        for clave in ("hits", "misses", "expulsiones"):
+            _metrica(lineas, f"{prefijo}_{clave}_total", "counter", f"{clave} de la {descripcion}.",
+                     [((), estadisticas[clave])])
+        _metrica(lineas, f"{prefijo}_entradas", "gauge", f"Entradas de la {descripcion}.",
+                 [((), estadisticas["entradas"])])
+        if "bytes_usados" in estadisticas:
+            _metrica(lineas, f"{prefijo}_bytes", "gauge", f"Memoria usada por la {descripcion}.",
+                     [((), estadisticas["bytes_usados"])])
+        if "disco" in estadisticas:
+            _metrica(lineas, f"{prefijo}_disco_entradas", "gauge", f"Entradas en disco de la {descripcion}.",
+                     [((), estadisticas["disco"]["entradas"])])
+            _metrica(lineas, f"{prefijo}_disco_bytes", "gauge", f"Bytes en disco de la {descripcion}.",
+                     [((), estadisticas["disco"]["bytes"])])
+
+    herramientas = sorted(executor.estadisticas()["herramientas"].items())
+    for clave, tipo in (("en_cola", "gauge"), ("en_ejecucion", "gauge"), ("completados", "counter"),
+                        ("errores", "counter"), ("tiempo_excedido", "counter")):
+        nombre = f"analitica_ejecutor_{clave}" + ("_total" if tipo == "counter" else "")
+        _metrica(lineas, nombre, tipo, f"Ejecutor de análisis: {clave.replace('_', ' ')} por herramienta.",
+                 [((("herramienta", h),), m[clave]) for h, m in herramientas])
+
+    return "\n".join(lineas) + "\n"
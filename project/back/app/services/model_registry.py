@@ -0,0 +1,164 @@
+import datetime
+import json
+import os
+import re
+import uuid
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from app.core import config
+
+# Registro de modelos entrenados.
+# Los modelos predictivos (regresión lineal/logística, árbol, random forest)
+# pueden guardarse al entrenarse (parametros["guardar_modelo"]) para puntuar
+# archivos nuevos sin volver a entrenar. Por modelo se guardan dos archivos en
+# MODELOS_DIR:
+#   <id>.joblib  estimador ajustado + LabelEncoder del target (si lo hay)
+#   <id>.json    metadatos: variables, layout one-hot, clases y huella del dataset
+# Las predicciones se calculan por lotes de FILAS_POR_LOTE filas.
+
+FILAS_POR_LOTE = 100_000
+PATRON_ID = re.compile(r"[0-9a-f]{32}")
+
+
+def _ruta(modelo_id, extension):
+    if not PATRON_ID.fullmatch(modelo_id):
+        raise FileNotFoundError(modelo_id)
+    return os.path.join(config.MODELOS_DIR, f"{modelo_id}.{extension}")
+
+
+def categorias_codificadas(X):
+    """
+    Categorías de cada columna de texto, en el orden en que `pd.get_dummies` crea sus columnas.
+    """
+    columnas = X.select_dtypes(include=['object', 'category', 'string']).columns
+    return {col: sorted(X[col].dropna().unique().tolist(), key=str) for col in columnas}
+
+
+def codificar(X, categorias):
+    """
+    One-hot de las columnas de `categorias` con esas categorías, en ese orden
+    (las columnas `category` traen las suyas en orden de aparición).
+    """
+    if not categorias:
+        return X
+    X = X.copy()
+    for col, valores in categorias.items():
+        X[col] = pd.Categorical(X[col], categories=valores)
+    return pd.get_dummies(X, columns=list(categorias), drop_first=True)
+
+
+def preparar(df, metadatos):
+    """
+    Arma la matriz de entrada con el mismo layout que se usó al entrenar:
+    las categorías desconocidas quedan con todas sus columnas one-hot en 0.
+    """
+    X = codificar(df[metadatos["variables"]], metadatos["categorias"])
+    return X.reindex(columns=metadatos["columnas_modelo"], fill_value=False)
+
+
+def registrar(modelo, herramienta, tipo, target, variables, columnas_modelo, categorias=None,
+              etiquetas=None, huella=None, metricas=None):
+    """
+    Persiste el modelo ajustado y retorna su id.
+    `huella`: dataset de entrenamiento ({filename, version, filas}).
+    """
+    os.makedirs(config.MODELOS_DIR, exist_ok=True)
+    modelo_id = uuid.uuid4().hex
+
+    # Escribir en temporales y renombrar: un lector concurrente nunca ve un archivo a medias
+    ruta_modelo = _ruta(modelo_id, "joblib")
+    joblib.dump({"modelo": modelo, "etiquetas": etiquetas}, f"{ruta_modelo}.tmp")
+    os.replace(f"{ruta_modelo}.tmp", ruta_modelo)
+
+    metadatos = {
+        "modelo_id": modelo_id,
+        "herramienta": herramienta,
+        "tipo": tipo,
+        "target": target,
+        "variables": list(variables),
+        "columnas_modelo": list(columnas_modelo),
+        "categorias": categorias or {},
+        "clases": etiquetas.classes_.tolist() if etiquetas is not None else None,
+        "dataset": huella,
+        "metricas": metricas,
+        "creado": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "tamano_bytes": os.path.getsize(ruta_modelo),
+    }
+    ruta_metadatos = _ruta(modelo_id, "json")
+    with open(f"{ruta_metadatos}.tmp", "w", encoding="utf-8") as f:
+        json.dump(metadatos, f, ensure_ascii=False, default=str)
+    os.replace(f"{ruta_metadatos}.tmp", ruta_metadatos)
+    return modelo_id
+
+
+def obtener_metadatos(modelo_id):
+    with open(_ruta(modelo_id, "json"), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def listar():
+    if not os.path.isdir(config.MODELOS_DIR):
+        return []
+    modelos = []
+    for nombre in os.listdir(config.MODELOS_DIR):
+        modelo_id, extension = os.path.splitext(nombre)
+        if extension == ".json" and PATRON_ID.fullmatch(modelo_id):
+            try:
+                modelos.append(obtener_metadatos(modelo_id))
+            except (OSError, ValueError):
+                # Borrado o escrito a medias por otra petición
+                continue
+    return sorted(modelos, key=lambda m: m["creado"], reverse=True)
+
+
+def eliminar(modelo_id):
+    rutas = [_ruta(modelo_id, "json"), _ruta(modelo_id, "joblib")]
+    if not os.path.exists(rutas[0]):
+        raise FileNotFoundError(modelo_id)
+    for ruta in rutas:
+        if os.path.exists(ruta):
+            os.remove(ruta)
+
+
+def predecir(modelo_id, df, filas_por_lote=FILAS_POR_LOTE):
+    """
+    Puntúa `df` con el modelo guardado. Las filas con variables vacías quedan sin predicción (None).
+    """
+    metadatos = obtener_metadatos(modelo_id)
+    faltantes = [c for c in metadatos["variables"] if c not in df.columns]
+    if faltantes:
+        raise ValueError(f"Al archivo le faltan las columnas del modelo: {faltantes}.")
+    guardado = joblib.load(_ruta(modelo_id, "joblib"))
+    modelo, etiquetas = guardado["modelo"], guardado["etiquetas"]
+
+    completas = np.flatnonzero(df[metadatos["variables"]].notna().all(axis=1).to_numpy())
+    predicciones = np.full(len(df), None, dtype=object)
+    for inicio in range(0, len(completas), filas_por_lote):
+        lote = completas[inicio:inicio + filas_por_lote]
+        valores = modelo.predict(preparar(df.iloc[lote], metadatos))
+        if etiquetas is not None:
+            valores = etiquetas.inverse_transform(valores.astype(np.int64))
+        predicciones[lote] = valores
+
+    validas = predicciones[completas]
+    if metadatos["tipo"] == "clasificacion":
+        resumen = pd.Series(validas).value_counts().to_dict()
+    else:
+        validas = validas.astype(np.float64)
+        resumen = {
+            "media": float(validas.mean()) if len(validas) else None,
+            "min": float(validas.min()) if len(validas) else None,
+            "max": float(validas.max()) if len(validas) else None,
+        }
+
+    return {
+        "modelo_id": modelo_id,
+        "target": metadatos["target"],
+        "filas": len(df),
+        "filas_sin_prediccion": len(df) - len(completas),
+        "resumen": resumen,
+        "predicciones": predicciones.tolist(),
+    }
@@ -0,0 +1,362 @@
+import numpy as np
+
+# Motor de estadísticas descriptivas por columnas.
+# Trabaja sobre una matriz 2-D float64 (filas x columnas, NaN = faltante) y
+# calcula todas las métricas de todas las columnas de una vez, en lugar de una
+# pasada de pandas por métrica y por columna.
+#   - resumen_matriz: exacto; ordena cada columna una sola vez y de ahí salen
+#     mínimo, máximo, cuantiles y moda.
+#   - MomentosParciales: resultados parciales combinables (por porción o por
+#     partición) con cuantiles aproximados (t-digest) y moda por heavy hitters
+#     (o, si ningún valor se repite lo suficiente, la zona más densa del t-digest).
+# Las fórmulas de varianza, asimetría y curtosis son las de pandas (insesgadas).
+
+CUANTILES = (0.25, 0.5, 0.75)
+
+# Compresión del t-digest: más centroides = cuantiles más precisos
+COMPRESION_DIGESTO = 200
+# Valores distintos que se siguen por columna para la moda aproximada (exacta si hay menos)
+MAX_FRECUENTES = 1024
+# Filas por porción en el modo aproximado
+FILAS_POR_PORCION = 100_000
+
+
+def a_matriz(df):
+    """
+    Matriz float64 ordenada por columnas (cada columna contigua en memoria).
+    """
+    return np.asfortranarray(df.to_numpy(dtype=np.float64, na_value=np.nan))
+
+
+def _anular_error(x):
+    # Igual que pandas: valores < 1e-14 se consideran error de punto flotante
+    return np.where(np.abs(x) < 1e-14, 0, x)
+
+
+def _interpolar(a, b, t):
+    # Interpolación lineal con la misma forma numérica que np.quantile
+    diferencia = b - a
+    resultado = a + diferencia * t
+    return np.where(t >= 0.5, b - diferencia * (1 - t), resultado)
+
+
+def _momentos_de_orden_superior(n, m2, m3, m4):
+    """
+    Varianza, asimetría y curtosis a partir de las sumas de potencias centradas.
+    """
+    with np.errstate(invalid="ignore", divide="ignore"):
+        varianza = np.where(n > 1, m2 / (n - 1), np.nan)
+
+        m2 = _anular_error(m2)
+        m3 = _anular_error(m3)
+        asimetria = (n * (n - 1) ** 0.5 / (n - 2)) * (m3 / m2 ** 1.5)
+        asimetria = np.where(m2 == 0, 0.0, asimetria)
+        asimetria = np.where(n < 3, np.nan, asimetria)
+
+        ajuste = 3 * (n - 1) ** 2 / ((n - 2) * (n - 3))
+        numerador = _anular_error(n * (n + 1) * (n - 1) * m4)
+        denominador = _anular_error((n - 2) * (n - 3) * m2 ** 2)
+        curtosis = numerador / denominador - ajuste
+        curtosis = np.where(denominador == 0, 0.0, curtosis)
+        curtosis = np.where(n < 4, np.nan, curtosis)
+
+    return varianza, asimetria, curtosis
+
+
+def resumen_matriz(matriz, cuantiles=CUANTILES):
+    """
+    Estadísticas exactas de cada columna de `matriz` en una sola pasada por lotes.
+    Retorna un dict de arrays (uno por métrica, un valor por columna) y la lista
+    de arrays de `cuantiles`.
+    """
+    matriz = np.asfortranarray(matriz, dtype=np.float64)
+    faltantes = np.isnan(matriz)
+    n = (~faltantes).sum(axis=0).astype(np.float64)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        media = np.where(faltantes, 0.0, matriz).sum(axis=0) / n
+        centrado = np.where(faltantes, 0.0, matriz - media)
+    cuadrado = centrado ** 2
+    m2 = cuadrado.sum(axis=0)
+    m3 = (cuadrado * centrado).sum(axis=0)
+    m4 = (cuadrado ** 2).sum(axis=0)
+    varianza, asimetria, curtosis = _momentos_de_orden_superior(n, m2, m3, m4)
+
+    # Un solo ordenamiento por columna (los NaN quedan al final)
+    ordenada = np.sort(matriz, axis=0)
+    validos = n.astype(np.int64)
+    ultimo = np.maximum(validos - 1, 0)
+    columnas = np.arange(matriz.shape[1])
+    vacias = validos == 0
+
+    def _en(posiciones):
+        if not len(ordenada):
+            return np.full(len(columnas), np.nan)
+        return ordenada[posiciones, columnas]
+
+    minimo = np.where(vacias, np.nan, _en(np.zeros_like(validos)))
+    maximo = np.where(vacias, np.nan, _en(ultimo))
+
+    valores_cuantiles = []
+    for q in cuantiles:
+        posicion = ultimo * q
+        abajo = np.floor(posicion).astype(np.int64)
+        arriba = np.minimum(abajo + 1, ultimo)
+        valor = _interpolar(_en(abajo), _en(arriba), posicion - abajo)
+        valores_cuantiles.append(np.where(vacias, np.nan, valor))
+
+    # Moda: la corrida más larga de valores iguales; ante empate, el menor valor
+    moda = np.full(len(columnas), np.nan)
+    for j in columnas:
+        valores = ordenada[:validos[j], j]
+        if not len(valores):
+            continue
+        inicios = np.flatnonzero(np.r_[True, valores[1:] != valores[:-1]])
+        largos = np.diff(np.r_[inicios, len(valores)])
+        moda[j] = valores[inicios[np.argmax(largos)]]
+
+    return {
+        "count": n,
+        "mean": media,
+        "std": np.sqrt(varianza),
+        "min": minimo,
+        "cuantiles": valores_cuantiles,
+        "max": maximo,
+        "varianza": varianza,
+        "moda": moda,
+        "asimetria": asimetria,
+        "curtosis": curtosis,
+    }
+
+
+class Digesto:
+    """
+    t-digest simplificado para cuantiles aproximados de una columna.
+
+    Guarda centroides (media, peso) más finos en las colas que en el centro;
+    dos digestos se combinan juntando sus centroides y volviendo a comprimir.
+    """
+
+    def __init__(self, medias=None, pesos=None, compresion=COMPRESION_DIGESTO):
+        self.compresion = compresion
+        self.medias = np.empty(0) if medias is None else medias
+        self.pesos = np.empty(0) if pesos is None else pesos
+
+    @classmethod
+    def desde_ordenados(cls, valores, compresion=COMPRESION_DIGESTO):
+        """
+        Digesto de valores ya ordenados y sin NaN.
+        """
+        return cls(valores, np.ones(len(valores)), compresion)._comprimir()
+
+    def combinar(self, otro):
+        orden = np.argsort(np.r_[self.medias, otro.medias], kind="stable")
+        medias = np.r_[self.medias, otro.medias][orden]
+        pesos = np.r_[self.pesos, otro.pesos][orden]
+        return Digesto(medias, pesos, self.compresion)._comprimir()
+
+    def _comprimir(self):
+        total = self.pesos.sum()
+        if len(self.medias) <= self.compresion or total == 0:
+            return self
+        # Escala k1: cada grupo abarca como máximo una unidad de k(q)
+        q = (np.cumsum(self.pesos) - self.pesos / 2) / total
+        k = self.compresion / (2 * np.pi) * np.arcsin(2 * q - 1)
+        grupo = np.floor(k - k[0]).astype(np.int64)
+        inicios = np.flatnonzero(np.r_[True, grupo[1:] != grupo[:-1]])
+        pesos = np.add.reduceat(self.pesos, inicios)
+        medias = np.add.reduceat(self.medias * self.pesos, inicios) / pesos
+        return Digesto(medias, pesos, self.compresion)
+
+    def moda(self):
+        """
+        Media del centroide de mayor densidad (peso / ancho del tramo que cubre):
+        aproxima la moda de columnas continuas, donde casi ningún valor se repite.
+        """
+        if not len(self.medias):
+            return np.nan
+        if len(self.medias) < 3:
+            return float(self.medias[np.argmax(self.pesos)])
+        bordes = np.r_[self.medias[0], (self.medias[1:] + self.medias[:-1]) / 2, self.medias[-1]]
+        anchos = np.diff(bordes)
+        with np.errstate(divide="ignore"):
+            densidad = np.where(anchos > 0, self.pesos / np.where(anchos > 0, anchos, 1), np.inf)
+        return float(self.medias[np.argmax(densidad)])
+
+    def cuantil(self, q, minimo, maximo):
+        total = self.pesos.sum()
+        if total == 0:
+            return np.nan
+        # Cada centroide representa el punto medio de su peso acumulado
+        centros = np.cumsum(self.pesos) - self.pesos / 2
+        objetivo = q * total
+        if objetivo <= centros[0]:
+            return float(np.interp(objetivo, [0, centros[0]], [minimo, self.medias[0]]))
+        if objetivo >= centros[-1]:
+            return float(np.interp(objetivo, [centros[-1], total], [self.medias[-1], maximo]))
+        return float(np.interp(objetivo, centros, self.medias))
+
+
+def _frecuentes(valores, conteos, capacidad=MAX_FRECUENTES):
+    """
+    Agrupa (valor, conteo) y, si hay más de `capacidad` valores, aplica la
+    reducción de Misra-Gries: resta el conteo del primer excedente y descarta
+    los que quedan en cero. Es exacta mientras haya pocos valores distintos.
+    """
+    unicos, inverso = np.unique(valores, return_inverse=True)
+    sumados = np.bincount(inverso, weights=conteos, minlength=len(unicos))
+    if len(unicos) > capacidad:
+        umbral = np.partition(sumados, len(sumados) - capacidad - 1)[len(sumados) - capacidad - 1]
+        sumados = sumados - umbral
+        conservar = sumados > 0
+        unicos, sumados = unicos[conservar], sumados[conservar]
+    return unicos, sumados
+
+
+def _cuantil_de_frecuencias(valores, conteos, q):
+    acumulado = np.cumsum(conteos)
+    posicion = (acumulado[-1] - 1) * q
+    abajo = np.floor(posicion)
+    a = valores[np.searchsorted(acumulado, abajo, side="right")]
+    b = valores[np.searchsorted(acumulado, min(abajo + 1, acumulado[-1] - 1), side="right")]
+    return float(_interpolar(a, b, posicion - abajo))
+
+
+class MomentosParciales:
+    """
+    Resultado parcial combinable del resumen descriptivo de varias columnas.
+
+    Guarda conteo, media y sumas de potencias centradas (M2, M3, M4) que se
+    combinan con las fórmulas de Pébay, más mínimo/máximo, un t-digest y los
+    valores más frecuentes por columna. `finalizar()` produce el mismo formato
+    que `resumen_matriz`, con cuantiles y moda aproximados.
+    """
+
+    def __init__(self, n, media, m2, m3, m4, minimo, maximo, digestos, frecuentes):
+        self.n = n
+        self.media = media
+        self.m2 = m2
+        self.m3 = m3
+        self.m4 = m4
+        self.minimo = minimo
+        self.maximo = maximo
+        self.digestos = digestos
+        self.frecuentes = frecuentes
+
+    @classmethod
+    def desde_matriz(cls, matriz):
+        matriz = np.asfortranarray(matriz, dtype=np.float64)
+        faltantes = np.isnan(matriz)
+        n = (~faltantes).sum(axis=0).astype(np.float64)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            media = np.where(n > 0, np.where(faltantes, 0.0, matriz).sum(axis=0) / n, 0.0)
+            centrado = np.where(faltantes, 0.0, matriz - media)
+            minimo = np.where(n > 0, np.fmin.reduce(matriz, axis=0), np.nan) if len(matriz) else np.full(len(n), np.nan)
+            maximo = np.where(n > 0, np.fmax.reduce(matriz, axis=0), np.nan) if len(matriz) else np.full(len(n), np.nan)
+        cuadrado = centrado ** 2
+
+        # Un ordenamiento por columna alimenta al digesto y al conteo de frecuentes
+        digestos = []
+        frecuentes = []
+        for j in range(matriz.shape[1]):
+            valores = np.sort(matriz[~faltantes[:, j], j])
+            digestos.append(Digesto.desde_ordenados(valores))
+            inicios = np.flatnonzero(np.r_[True, valores[1:] != valores[:-1]]) if len(valores) else np.empty(0, np.int64)
+            conteos = np.diff(np.r_[inicios, len(valores)]).astype(np.float64)
+            frecuentes.append(_frecuentes(valores[inicios], conteos))
+
+        return cls(
+            n, media,
+            cuadrado.sum(axis=0), (cuadrado * centrado).sum(axis=0), (cuadrado ** 2).sum(axis=0),
+            minimo, maximo, digestos, frecuentes,
+        )
+
+    def combinar(self, otro):
+        na, nb = self.n, otro.n
+        n = na + nb
+        with np.errstate(invalid="ignore", divide="ignore"):
+            delta = np.where(n > 0, otro.media - self.media, 0.0)
+            media = np.where(n > 0, self.media + delta * nb / n, 0.0)
+            n_seguro = np.where(n > 0, n, 1.0)
+            m2 = self.m2 + otro.m2 + delta ** 2 * na * nb / n_seguro
+            m3 = (
+                self.m3 + otro.m3
+                + delta ** 3 * na * nb * (na - nb) / n_seguro ** 2
+                + 3 * delta * (na * otro.m2 - nb * self.m2) / n_seguro
+            )
+            m4 = (
+                self.m4 + otro.m4
+                + delta ** 4 * na * nb * (na ** 2 - na * nb + nb ** 2) / n_seguro ** 3
+                + 6 * delta ** 2 * (na ** 2 * otro.m2 + nb ** 2 * self.m2) / n_seguro ** 2
+                + 4 * delta * (na * otro.m3 - nb * self.m3) / n_seguro
+            )
+
+        frecuentes = [
+            _frecuentes(np.r_[va, vb], np.r_[ca, cb])
+            for (va, ca), (vb, cb) in zip(self.frecuentes, otro.frecuentes)
+        ]
+        return MomentosParciales(
+            n, media, m2, m3, m4,
+            np.fmin(self.minimo, otro.minimo), np.fmax(self.maximo, otro.maximo),
+            [a.combinar(b) for a, b in zip(self.digestos, otro.digestos)],
+            frecuentes,
+        )
+
+    def cuantiles_exactos(self):
+        """
+        True si las tablas de frecuencias de todas las columnas están completas:
+        cuantiles y moda salen exactos, no del t-digest.
+        """
+        return all(conteos.sum() == n for (_, conteos), n in zip(self.frecuentes, self.n))
+
+    def finalizar(self, cuantiles=CUANTILES):
+        n = self.n
+        varianza, asimetria, curtosis = _momentos_de_orden_superior(n, self.m2, self.m3, self.m4)
+
+        valores_cuantiles = [np.full(len(n), np.nan) for _ in cuantiles]
+        for j, (valores, conteos) in enumerate(self.frecuentes):
+            # Si la tabla de frecuencias está completa (pocos valores distintos) el cuantil es exacto
+            exacta = n[j] > 0 and conteos.sum() == n[j]
+            for i, q in enumerate(cuantiles):
+                if exacta:
+                    valores_cuantiles[i][j] = _cuantil_de_frecuencias(valores, conteos, q)
+                else:
+                    valores_cuantiles[i][j] = self.digestos[j].cuantil(q, self.minimo[j], self.maximo[j])
+
+        moda = np.full(len(n), np.nan)
+        for j, (valores, conteos) in enumerate(self.frecuentes):
+            if len(valores):
+                # argmax devuelve el primero: ante empate, el menor valor (están ordenados)
+                moda[j] = valores[np.argmax(conteos)]
+            elif n[j] > 0:
+                # Misra-Gries descartó todo (valores casi sin repetir): moda del digesto
+                moda[j] = self.digestos[j].moda()
+
+        return {
+            "count": n,
+            "mean": np.where(n > 0, self.media, np.nan),
+            "std": np.sqrt(varianza),
+            "min": self.minimo,
+            "cuantiles": valores_cuantiles,
+            "max": self.maximo,
+            "varianza": varianza,
+            "moda": moda,
+            "asimetria": asimetria,
+            "curtosis": curtosis,
+        }
+
+
+def resumen_por_porciones(matriz, filas_por_porcion, cuantiles=CUANTILES):
+    """
+    Resumen aproximado de una matriz grande: una pasada por porciones de filas
+    combinando los resultados parciales. La matriz completa es la entrada; lo
+    que queda acotado es el trabajo extra: cada porción se ordena por separado
+    (nunca la columna entera) y de cada una solo se guardan su t-digest y sus
+    valores frecuentes. Cuantiles y moda son aproximados; la moda siempre tiene
+    valor en columnas con datos (ver MomentosParciales.finalizar).
+    """
+    parcial = None
+    for inicio in range(0, max(len(matriz), 1), filas_por_porcion):
+        porcion = MomentosParciales.desde_matriz(matriz[inicio:inicio + filas_por_porcion])
+        parcial = porcion if parcial is None else parcial.combinar(porcion)
+    return parcial.finalizar(cuantiles)
@@ -0,0 +1,412 @@
+import base64
+import json
+import os
+import re
+import threading
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from app.core import config
+
+# Perfil de columnas de cada dataset.
+# Se calcula en la misma pasada de la ingesta (también por porciones y al
+# anexar filas) y se guarda en data/<archivo>.perfil.json. El frontend lo usa
+# para saber qué columnas son numéricas, categóricas, de fecha o de alta
+# cardinalidad, y los análisis para validar sin recorrer los datos.
+# Por columna: dtype, nulos, cardinalidad, mínimo/máximo, valores más
+# frecuentes y proporción de valores de texto que se pueden leer como fecha.
+# La cardinalidad es exacta mientras la columna tenga a lo sumo MAX_FRECUENCIAS
+# valores distintos; por encima se estima con HyperLogLog (error ~1%), acotada
+# a la cantidad de filas no nulas (una columna de identificadores no puede tener
+# más valores distintos que filas).
+# Con el perfil se decide también qué columnas de texto se leen como `category`
+# (ver storage) y se estima la memoria del DataFrame antes y después de ese tipado.
+
+EXTENSION_PERFIL = ".perfil.json"
+MAX_FRECUENCIAS = 1000
+TOP_K = 10
+MUESTRA_FECHAS = 200
+HLL_P = 14
+HLL_REGISTROS = 1 << HLL_P
+# Texto con forma de fecha (evita contar como fecha números sueltos como "12")
+PATRON_FECHA = re.compile(r"\d.*[-/:]|[-/:].*\d|[A-Za-z]{3,}\.? \d|\d \w{3,}")
+
+_bloqueos = {}
+_lock_bloqueos = threading.Lock()
+_memoria = {}  # file_location -> Perfil
+
+
+def _bloqueo(file_location):
+    with _lock_bloqueos:
+        return _bloqueos.setdefault(file_location, threading.Lock())
+
+
+def _estimar_cardinalidad(registros):
+    m = len(registros)
+    alpha = 0.7213 / (1 + 1.079 / m)
+    estimado = alpha * m * m / np.sum(np.exp2(-registros.astype(np.float64)))
+    ceros = int(np.count_nonzero(registros == 0))
+    if estimado <= 2.5 * m and ceros:
+        # Rango bajo: conteo lineal
+        estimado = m * np.log(m / ceros)
+    return int(round(estimado))
+
+
+def _a_json(valor):
+    if isinstance(valor, np.generic):
+        return valor.item()
+    if isinstance(valor, (pd.Timestamp, pd.Timedelta)):
+        return str(valor)
+    if isinstance(valor, (str, int, float, bool)) or valor is None:
+        return valor
+    return str(valor)
+
+
+class PerfilColumna:
+    """
+    Estado acumulable del perfil de una columna (se actualiza por porciones).
+    """
+
+    def __init__(self, nombre, dtype):
+        self.nombre = nombre
+        self.dtype = str(dtype)
+        self.filas = 0
+        self.nulos = 0
+        self.registros = np.zeros(HLL_REGISTROS, dtype=np.uint8)
+        self.frecuencias = pd.Series(dtype=np.int64)  # valor -> conteo, en orden de primera aparición
+        self.frecuencias_completas = True
+        self.minimo = None
+        self.maximo = None
+        self.fechas_validas = 0
+        self.fechas_probadas = 0
+        self.memoria = 0  # bytes en pandas con el dtype de la ingesta (incluye los objetos str)
+        self.bytes_texto = 0
+
+    @property
+    def es_texto(self):
+        return self.dtype in ("object", "string")
+
+    @property
+    def es_fecha_nativa(self):
+        return self.dtype.startswith("datetime64")
+
+    @property
+    def es_numerica(self):
+        return pd.api.types.is_numeric_dtype(pd.api.types.pandas_dtype(self.dtype)) and self.dtype != "bool"
+
+    def actualizar(self, serie):
+        validos = serie.dropna()
+        self.filas += len(serie)
+        self.nulos += len(serie) - len(validos)
+        self.memoria += int(serie.memory_usage(index=False, deep=True))
+        if validos.empty:
+            return
+        if self.es_texto:
+            self.bytes_texto += int(validos.astype(str).str.len().sum())
+
+        # Una sola pasada de hash: valores distintos (en orden de aparición) y sus conteos
+        codigos, unicos = pd.factorize(validos.to_numpy())
+        conteos = pd.Series(np.bincount(codigos, minlength=len(unicos)), index=pd.Index(unicos))
+
+        # HyperLogLog (ignora repetidos: basta con los valores distintos): registro =
+        # primeros HLL_P bits del hash, rango = ceros a la izquierda del resto + 1
+        hashes = pd.util.hash_array(np.asarray(unicos))
+        indices = (hashes >> np.uint64(64 - HLL_P)).astype(np.intp)
+        resto = (hashes & np.uint64((1 << (64 - HLL_P)) - 1)).astype(np.float64)  # < 2^50: exacto en float64
+        _, bits = np.frexp(resto)
+        np.maximum.at(self.registros, indices, (64 - HLL_P - bits + 1).astype(np.uint8))
+
+        # Frecuencias: exactas hasta MAX_FRECUENCIAS valores distintos, luego solo los más frecuentes
+        if self.es_fecha_nativa:
+            conteos.index = conteos.index.astype(str)
+        if self.frecuencias.empty:
+            combinadas = conteos
+        else:
+            combinadas = pd.concat([self.frecuencias, conteos]).groupby(level=0, sort=False).sum()
+        if len(combinadas) > MAX_FRECUENCIAS:
+            self.frecuencias_completas = False
+            combinadas = combinadas.nlargest(MAX_FRECUENCIAS, keep="first")
+        self.frecuencias = combinadas
+
+        if self.es_numerica and validos.dtype == object:
+            # Valores que no son números en una columna numérica (ej. "N/D" junto a montos
+            # limpios): cuentan en frecuencias y cardinalidad, no en mínimo/máximo
+            validos = pd.to_numeric(validos, errors="coerce").dropna()
+        if (self.es_numerica or self.es_fecha_nativa) and not validos.empty:
+            minimo, maximo = validos.min(), validos.max()
+            self.minimo = minimo if self.minimo is None else min(self.minimo, minimo)
+            self.maximo = maximo if self.maximo is None else max(self.maximo, maximo)
+        elif self.es_texto or self.dtype == "category":
+            muestra = validos.iloc[:MUESTRA_FECHAS].astype(str)
+            con_forma = muestra[muestra.str.contains(PATRON_FECHA)]
+            self.fechas_probadas += len(muestra)
+            if len(con_forma):
+                self.fechas_validas += int(pd.to_datetime(con_forma, errors="coerce", format="mixed").notna().sum())
+
+    @property
+    def cardinalidad(self):
+        if self.frecuencias_completas:
+            return len(self.frecuencias)
+        estimada = max(_estimar_cardinalidad(self.registros), len(self.frecuencias))
+        return min(estimada, self.filas - self.nulos)
+
+    @property
+    def categorizable(self):
+        """
+        Texto de baja cardinalidad (exacta): leerlo como `category` guarda un
+        código entero por fila en lugar de un objeto str.
+        """
+        return self.dtype == "category" or (
+            self.es_texto and self.frecuencias_completas and 0 < self.cardinalidad <= config.CATEGORIA_MAX_VALORES
+            and self.cardinalidad <= config.CATEGORIA_MAX_PROPORCION * (self.filas - self.nulos)
+        )
+
+    def memoria_estimada(self, categorica):
+        """
+        Bytes estimados de la columna con el tipado de lectura: códigos + categorías
+        si es categórica, buffers de Arrow si el texto se lee como string[pyarrow].
+        """
+        if categorica:
+            n = len(self.frecuencias)
+            codigos = np.dtype(np.int8 if n < 127 else np.int16 if n < 32767 else np.int32).itemsize
+            return self.filas * codigos + int(pd.Index(self.frecuencias.index).memory_usage(deep=True))
+        if self.es_texto and config.INGESTA_TEXTO_ARROW:
+            # large_string: datos + offsets de 8 bytes + bitmap de validez
+            return self.bytes_texto + 8 * (self.filas + 1) + (self.filas + 7) // 8
+        return self.memoria
+
+    def tipo(self):
+        if self.dtype == "bool":
+            return "booleana"
+        if self.es_numerica:
+            return "numerica"
+        if self.es_fecha_nativa:
+            return "fecha"
+        if self.fechas_probadas and self.fechas_validas / self.fechas_probadas >= 0.9:
+            return "fecha"
+        if self.cardinalidad > config.PERFIL_ALTA_CARDINALIDAD:
+            return "texto"
+        return "categorica"
+
+    def a_dict(self):
+        top = self.frecuencias.sort_values(ascending=False, kind="stable").head(TOP_K)
+        return {
+            "nombre": self.nombre,
+            "dtype": self.dtype,
+            "tipo": self.tipo(),
+            "filas": self.filas,
+            "nulos": self.nulos,
+            "cardinalidad": self.cardinalidad,
+            "cardinalidad_exacta": self.frecuencias_completas,
+            "alta_cardinalidad": self.cardinalidad > config.PERFIL_ALTA_CARDINALIDAD,
+            "min": _a_json(self.minimo),
+            "max": _a_json(self.maximo),
+            "top": [{"valor": _a_json(v), "conteo": int(c)} for v, c in top.items()],
+            "fecha_parseable": (
+                1.0 if self.es_fecha_nativa
+                else round(self.fechas_validas / self.fechas_probadas, 4) if self.fechas_probadas else None
+            ),
+        }
+
+    def estado(self):
+        return {
+            "filas": self.filas,
+            "nulos": self.nulos,
+            "registros": base64.b64encode(zlib.compress(self.registros.tobytes())).decode("ascii"),
+            "frecuencias": [[_a_json(v), int(c)] for v, c in self.frecuencias.items()],
+            "frecuencias_completas": self.frecuencias_completas,
+            "minimo": _a_json(self.minimo),
+            "maximo": _a_json(self.maximo),
+            "fechas_validas": self.fechas_validas,
+            "fechas_probadas": self.fechas_probadas,
+            "memoria": self.memoria,
+            "bytes_texto": self.bytes_texto,
+        }
+
+    @classmethod
+    def desde_estado(cls, nombre, dtype, estado):
+        columna = cls(nombre, dtype)
+        columna.filas = estado["filas"]
+        columna.nulos = estado["nulos"]
+        columna.registros = np.frombuffer(
+            zlib.decompress(base64.b64decode(estado["registros"])), dtype=np.uint8
+        ).copy()
+        valores = [v for v, _ in estado["frecuencias"]]
+        columna.frecuencias = pd.Series(
+            [c for _, c in estado["frecuencias"]], index=pd.Index(valores, dtype=object), dtype=np.int64
+        )
+        columna.frecuencias_completas = estado["frecuencias_completas"]
+        columna.minimo = estado["minimo"]
+        columna.maximo = estado["maximo"]
+        if columna.es_fecha_nativa and columna.minimo is not None:
+            columna.minimo, columna.maximo = pd.Timestamp(columna.minimo), pd.Timestamp(columna.maximo)
+        columna.fechas_validas = estado["fechas_validas"]
+        columna.fechas_probadas = estado["fechas_probadas"]
+        columna.memoria = estado.get("memoria", 0)
+        columna.bytes_texto = estado.get("bytes_texto", 0)
+        return columna
+
+
+class Perfil:
+    """
+    Perfil de todas las columnas de una versión del dataset.
+    """
+
+    def __init__(self, version, columnas, categoricas=None):
+        self.version = version
+        self.columnas = columnas  # nombre -> PerfilColumna
+        # Columnas que se leen como `category`: se fijan al subir el archivo (las
+        # filas anexadas no cambian el tipado del dataset)
+        self.categoricas = categoricas
+
+    @classmethod
+    def vacio(cls, dtypes, version):
+        return cls(version, {str(c): PerfilColumna(str(c), t) for c, t in dtypes.items()})
+
+    @classmethod
+    def desde_df(cls, df, version):
+        perfil = cls.vacio(df.dtypes, version)
+        perfil.actualizar(df)
+        return perfil
+
+    def actualizar(self, df):
+        for nombre, columna in self.columnas.items():
+            if nombre in df.columns:
+                columna.actualizar(df[nombre])
+
+    def rehacer(self, nombres, dtypes, porciones):
+        """
+        Vuelve a perfilar las columnas `nombres` con su nuevo dtype a partir de las
+        porciones ya vistas (ej. una columna entera que pasó a float64 en la ingesta).
+        """
+        for nombre in nombres:
+            self.columnas[nombre] = PerfilColumna(nombre, dtypes[nombre])
+        for porcion in porciones:
+            for nombre in nombres:
+                self.columnas[nombre].actualizar(porcion[nombre])
+
+    @property
+    def filas(self):
+        return next(iter(self.columnas.values())).filas if self.columnas else 0
+
+    def dtypes(self):
+        return pd.Series({n: pd.api.types.pandas_dtype(c.dtype) for n, c in self.columnas.items()}, dtype=object)
+
+    def cardinalidad(self, nombre):
+        return self.columnas[nombre].cardinalidad
+
+    def elegir_categoricas(self):
+        if self.categoricas is None:
+            self.categoricas = [n for n, c in self.columnas.items() if c.categorizable]
+        return self.categoricas
+
+    def reporte_memoria(self):
+        """
+        Memoria del DataFrame (sin índice) con los dtypes de la ingesta y con el
+        tipado de lectura, total y de cada columna que cambia.
+        """
+        categoricas = set(self.elegir_categoricas())
+        antes = despues = 0
+        columnas = []
+        for nombre, columna in self.columnas.items():
+            estimada = columna.memoria_estimada(nombre in categoricas)
+            antes += columna.memoria
+            despues += estimada
+            if nombre in categoricas or estimada != columna.memoria:
+                columnas.append({
+                    "nombre": nombre,
+                    "dtype": "category" if nombre in categoricas else "string[pyarrow]",
+                    "antes_bytes": columna.memoria,
+                    "despues_bytes": estimada,
+                })
+        return {
+            "antes_bytes": antes,
+            "despues_bytes": despues,
+            "reduccion": round(1 - despues / antes, 4) if antes else 0.0,
+            "columnas": columnas,
+        }
+
+    def a_dict(self):
+        return {
+            "version": self.version,
+            "filas": self.filas,
+            "columnas": [c.a_dict() for c in self.columnas.values()],
+            "categoricas": self.elegir_categoricas(),
+            "memoria": self.reporte_memoria(),
+        }
+
+
+# --- PERSISTENCIA ---
+
+def ruta_perfil(file_location):
+    return f"{file_location}{EXTENSION_PERFIL}"
+
+
+def guardar(file_location, perfil):
+    contenido = perfil.a_dict()
+    contenido["estado"] = {
+        nombre: {"dtype": c.dtype, **c.estado()} for nombre, c in perfil.columnas.items()
+    }
+    temporal = f"{ruta_perfil(file_location)}.tmp"
+    with open(temporal, "w", encoding="utf-8") as f:
+        json.dump(contenido, f, ensure_ascii=False, default=str)
+    os.replace(temporal, ruta_perfil(file_location))
+    _memoria[file_location] = perfil
+
+
+def cargar(file_location, version):
+    """
+    Perfil guardado de `version`; None si no existe o es de otra versión.
+    """
+    en_memoria = _memoria.get(file_location)
+    if en_memoria is not None and en_memoria.version == version:
+        return en_memoria
+    try:
+        with open(ruta_perfil(file_location), encoding="utf-8") as f:
+            contenido = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if contenido.get("version") != version or "estado" not in contenido:
+        return None
+    perfil = Perfil(version, {
+        nombre: PerfilColumna.desde_estado(nombre, estado["dtype"], estado)
+        for nombre, estado in contenido["estado"].items()
+    }, contenido.get("categoricas"))
+    _memoria[file_location] = perfil
+    return perfil
+
+
+def eliminar(file_location):
+    _memoria.pop(file_location, None)
+    if os.path.exists(ruta_perfil(file_location)):
+        os.remove(ruta_perfil(file_location))
+
+
+def obtener(file_location, version, cargar_df):
+    """
+    Perfil vigente del dataset; si no hay (archivos subidos antes del perfil o
+    perfil descartado) se construye una vez con `cargar_df()`.
+    """
+    with _bloqueo(file_location):
+        perfil = cargar(file_location, version)
+        if perfil is None:
+            perfil = Perfil.desde_df(cargar_df(), version)
+            guardar(file_location, perfil)
+        return perfil
+
+
+def actualizar(file_location, version_anterior, version_nueva, df_nuevo):
+    """
+    Incorpora filas anexadas al perfil guardado (trabajo proporcional a las filas
+    nuevas); si no había perfil vigente se descarta y se reconstruye al pedirlo.
+    """
+    with _bloqueo(file_location):
+        perfil = cargar(file_location, version_anterior)
+        if perfil is None:
+            eliminar(file_location)
+            return
+        perfil.actualizar(df_nuevo)
+        perfil.version = version_nueva
+        guardar(file_location, perfil)
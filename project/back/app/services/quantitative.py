@@ -1,118 +1,181 @@
 import pandas as pd
 import numpy as np
-from scipy import stats
-from sklearn.linear_model import LinearRegression, LogisticRegression
-from sklearn.tree import DecisionTreeClassifier, DecisionTreeRegressor, export_text
-from sklearn.cluster import KMeans
-from sklearn.decomposition import PCA
-from sklearn.preprocessing import StandardScaler, LabelEncoder
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import mean_squared_error, r2_score, accuracy_score, confusion_matrix
-from sklearn import metrics
-from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
-from statsmodels.tsa.seasonal import seasonal_decompose
-from textblob import TextBlob
-import re
-from collections import Counter
-
-
-def descriptivo_resumen(df, columnas):
+import time
+import base64
+from app.core import config
+from app.services import clustering, downsampling, model_registry, moments, sentiment, word_frequency
+
+# scikit-learn, scipy.stats y statsmodels se importan dentro de cada herramienta:
+# un worker que solo sirve Pareto o descriptivos no los carga (ver services/calentamiento).
+
+
+# Las columnas de texto pueden llegar como object, category o string[pyarrow]
+# (ver storage): np.issubdtype no acepta los dtypes de pandas.
+def es_numerica(dtype):
+    return pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype)
+
+
+def es_categorica(dtype):
+    return isinstance(dtype, pd.CategoricalDtype) or pd.api.types.is_string_dtype(dtype)
+
+
+def descriptivo_resumen(df, columnas, aproximado=False):
     # Seleccionar solo columnas numéricas
-    datos = df[columnas].select_dtypes(include=[np.number])
+    datos = df[list(dict.fromkeys(columnas))].select_dtypes(include=[np.number])
     
     if datos.empty:
         return {"error": "Las columnas seleccionadas no son numéricas."}
     
-    # Pandas describe() base
-    resumen = datos.describe().to_dict()
-    
-    # Agregar métricas adicionales (Varianza, Asimetría, Curtosis)
-    extra_stats = {}
-    for col in datos.columns:
-        series = datos[col].dropna()
-        extra_stats[col] = {
-            "varianza": series.var(),
-            "moda": series.mode()[0] if not series.mode().empty else None,
-            "asimetria": series.skew(),  # >0 cola derecha, <0 cola izquierda
-            "curtosis": series.kurt()    # Que tan "picuda" es la curva
-        }
-    
-    # Fusionar resultados
-    for col in resumen:
-        if col in extra_stats:
-            resumen[col].update(extra_stats[col])
-
-    # Convertir todos los valores NumPy a tipos nativos de Python
-    def _to_native(v):
-        if isinstance(v, (np.integer,)):
-            return int(v)
-        if isinstance(v, (np.floating,)):
-            return float(v)
-        return v
+    # Todas las métricas de todas las columnas en una pasada sobre una matriz 2-D.
+    # aproximado=True: por porciones, con cuantiles t-digest (columnas muy grandes)
+    matriz = moments.a_matriz(datos)
+    if aproximado:
+        stats = moments.resumen_por_porciones(matriz, moments.FILAS_POR_PORCION)
+    else:
+        stats = moments.resumen_matriz(matriz)
 
-    resumen_nativo = {}
-    for col, stats_dict in resumen.items():
-        resumen_nativo[col] = {k: _to_native(v) for k, v in stats_dict.items()}
+    return resumen_desde_estadisticas(stats, datos.dtypes)
 
-    # También convertir extra_stats (por si se usa separado en el futuro)
-    for col, stats_dict in extra_stats.items():
-        extra_stats[col] = {k: _to_native(v) for k, v in stats_dict.items()}
 
-    # Mezclar nuevamente extra_stats ya convertido
-    for col in resumen_nativo:
-        if col in extra_stats:
-            resumen_nativo[col].update(extra_stats[col])
+def resumen_desde_estadisticas(stats, dtypes):
+    """
+    Da formato de respuesta a las estadísticas del motor de momentos
+    (`dtypes`: tipos de las columnas, en el orden de las estadísticas).
+    Los valores quedan como escalares numpy; la capa de respuesta los serializa.
+    """
+    resumen = {}
+    for j, col in enumerate(dtypes.index):
+        moda = stats["moda"][j]
+        if np.isnan(moda):
+            moda = None
+        elif pd.api.types.is_integer_dtype(dtypes[col]):
+            moda = int(moda)
+        else:
+            moda = float(moda)
+
+        resumen[col] = {
+            "count": stats["count"][j],
+            "mean": stats["mean"][j],
+            "std": stats["std"][j],
+            "min": stats["min"][j],
+            **{f"{q:.0%}": valores[j] for q, valores in zip(moments.CUANTILES, stats["cuantiles"])},
+            "max": stats["max"][j],
+            "varianza": stats["varianza"][j],
+            "moda": moda,
+            "asimetria": stats["asimetria"][j],  # >0 cola derecha, <0 cola izquierda
+            "curtosis": stats["curtosis"][j],    # Que tan "picuda" es la curva
+        }
 
-    return resumen_nativo
+    return resumen
 
 
 def descriptivo_frecuencias(df, columna, bins=10):
     series = df[columna].dropna()
     
     # Si es numérica, hacemos un histograma (bins)
-    if np.issubdtype(series.dtype, np.number):
+    if es_numerica(series.dtype):
         hist, bin_edges = np.histogram(series, bins=bins)
-        # Formatear para gráficas: "10-20", "20-30"
-        etiquetas = [f"{int(bin_edges[i])}-{int(bin_edges[i+1])}" for i in range(len(bin_edges)-1)]
-        valores = hist.tolist()
-        tipo = "numerico"
+        return _frecuencias_numericas(hist, bin_edges)
         
     # Si es categórica, contamos valores únicos
     else:
-        conteo = series.value_counts().head(20) # Limitamos a top 20
-        etiquetas = conteo.index.astype(str).tolist()
-        valores = conteo.values.tolist()
-        tipo = "categorico"
-        
+        return _frecuencias_categoricas(series.value_counts())
+
+
+def frecuencias_desde_conteos(conteos, bins=10):
+    """
+    Mismo resultado que `descriptivo_frecuencias` a partir del conteo de cada
+    valor (sin ordenar), ej. un agregado incremental.
+    """
+    if es_numerica(conteos.index.dtype):
+        hist, bin_edges = np.histogram(conteos.index.to_numpy(), bins=bins, weights=conteos.to_numpy())
+        return _frecuencias_numericas(hist.astype(np.int64), bin_edges)
+    return _frecuencias_categoricas(conteos.sort_values(ascending=False))
+
+
+def _frecuencias_numericas(hist, bin_edges):
+    # Formatear para gráficas: "10-20", "20-30"
+    etiquetas = [f"{int(bin_edges[i])}-{int(bin_edges[i+1])}" for i in range(len(bin_edges)-1)]
     return {
-        "tipo": tipo,
+        "tipo": "numerico",
         "etiquetas": etiquetas,
-        "valores": valores
+        "valores": hist.tolist()
+    }
+
+
+def _frecuencias_categoricas(conteo):
+    conteo = conteo[conteo > 0].head(20) # Limitamos a top 20 (sin las categorías vacías de un `category`)
+    return {
+        "tipo": "categorico",
+        "etiquetas": conteo.index.astype(str).tolist(),
+        "valores": conteo.values.tolist()
     }
 
-def descriptivo_correlacion(df):
+# Formatos de respuesta de las matrices (correlación y tabla dinámica):
+# - heatmap: lista [{x, y, value}] (por defecto)
+# - compacto: etiquetas + lista plana de valores por filas
+# - binario: como compacto, con los valores float64 little-endian en base64
+FORMATOS_MATRIZ = ("heatmap", "compacto", "binario")
+
+
+def _validar_formato(formato):
+    if formato not in FORMATOS_MATRIZ:
+        raise ValueError(f"Formato '{formato}' no soportado. Use: {', '.join(FORMATOS_MATRIZ)}.")
+
+
+def _celdas_heatmap(x, y, valores):
+    # Las columnas de la lista se arman con arrays completos, sin indexar celda por celda
+    return [{"x": a, "y": b, "value": v} for a, b, v in zip(x, y, valores)]
+
+
+def _valores_compactos(valores, formato):
+    valores = np.ascontiguousarray(valores, dtype="<f8")
+    if formato == "binario":
+        return {"dtype": "float64-le", "valores_b64": base64.b64encode(valores.tobytes()).decode("ascii")}
+    return {"valores": valores.tolist()}
+
+
+def descriptivo_correlacion(df, formato="heatmap", triangular=False):
     # Solo numéricas
     df_num = df.select_dtypes(include=[np.number])
     
     # Matriz de Pearson (-1 a 1)
-    matriz = df_num.corr(method='pearson').fillna(0)
-    
-    # Formato 'heatmap' para el frontend: [{x: col1, y: col2, value: 0.8}, ...]
-    heatmap_data = []
-    for x in matriz.columns:
-        for y in matriz.columns:
-            heatmap_data.append({
-                "x": x, 
-                "y": y, 
-                "value": float(matriz.loc[x, y])
-            })
-            
+    return correlacion_desde_matriz(df_num.corr(method='pearson'), formato, triangular)
+
+
+def correlacion_desde_matriz(matriz, formato="heatmap", triangular=False):
+    """
+    Da formato a la matriz de correlación. Con `triangular` solo se envía el
+    triángulo superior (diagonal incluida): la matriz es simétrica.
+    """
+    _validar_formato(formato)
+    matriz = matriz.fillna(0)
+    variables = list(matriz.columns)
+    valores = matriz.to_numpy(dtype=np.float64)
+
+    if triangular:
+        filas, columnas = np.triu_indices(len(variables))
+    else:
+        filas, columnas = np.indices(valores.shape).reshape(2, -1)
+
+    if formato == "heatmap":
+        # Formato 'heatmap' para el frontend: [{x: col1, y: col2, value: 0.8}, ...]
+        etiquetas = np.array(variables, dtype=object)
+        return {
+            "variables": variables,
+            "matriz": _celdas_heatmap(etiquetas[filas].tolist(), etiquetas[columnas].tolist(), valores[filas, columnas].tolist())
+        }
+
     return {
-        "variables": list(matriz.columns),
-        "matriz": heatmap_data
+        "variables": variables,
+        "forma": [len(variables), len(variables)],
+        "triangular": bool(triangular),
+        **_valores_compactos(valores[filas, columnas], formato)
     }
 
 def inferencial_ttest(df, col_grupo, col_valor):
+    from scipy import stats
+
     # Limpiar nulos
     data = df[[col_grupo, col_valor]].dropna()
     
@@ -137,10 +200,12 @@ def inferencial_ttest(df, col_grupo, col_valor):
     }
 
 def inferencial_anova(df, col_grupo, col_valor):
+    from scipy import stats
+
     data = df[[col_grupo, col_valor]].dropna()
     
     # Crear lista de arrays para cada grupo
-    grupos_data = [frame[col_valor].values for label, frame in data.groupby(col_grupo)]
+    grupos_data = [frame[col_valor].values for label, frame in data.groupby(col_grupo, observed=True)]
     
     if len(grupos_data) < 3:
          return {"error": "ANOVA requiere al menos 3 grupos. Use T-Test para 2."}
@@ -155,19 +220,23 @@ def inferencial_anova(df, col_grupo, col_valor):
         "conclusion": "Al menos un grupo es estadísticamente diferente a los demás." if p_val < 0.05 else "Todos los grupos tienen comportamientos similares."
     }
 
-def predictivo_regresion_lineal(df, target, features):
+def predictivo_regresion_lineal(df, target, features, max_puntos=None, registro=None):
+    from sklearn.linear_model import LinearRegression
+    from sklearn.metrics import mean_squared_error, r2_score
+    from sklearn.model_selection import train_test_split
+
     # Preparar datos
     data = df[[target] + features].dropna()
     X = data[features].copy()
     y = data[target]
     
     # Codificar variables categóricas (One-Hot Encoding)
-    columnas_categoricas = X.select_dtypes(include=['object', 'category']).columns.tolist()
-    columnas_numericas = X.select_dtypes(include=[np.number]).columns.tolist()
+    columnas_categoricas = X.select_dtypes(include=['object', 'category', 'string']).columns.tolist()
     
+    categorias = model_registry.categorias_codificadas(X)
     if columnas_categoricas:
-        # Aplicar One-Hot Encoding a categóricas
-        X = pd.get_dummies(X, columns=columnas_categoricas, drop_first=True)
+        # Aplicar One-Hot Encoding a categóricas (mismo layout que al puntuar con el modelo guardado)
+        X = model_registry.codificar(X, categorias)
     
     # Obtener nombres de features después del encoding
     feature_names = X.columns.tolist()
@@ -179,20 +248,37 @@ def predictivo_regresion_lineal(df, target, features):
     model.fit(X_train, y_train)
     y_pred = model.predict(X_test)
     
+    # Puntos del gráfico real vs predicho: los 20 primeros, o una muestra de hasta max_puntos
+    if max_puntos is None:
+        muestra = np.arange(min(20, len(y_test)))
+    else:
+        muestra = downsampling.muestreo_uniforme(len(y_test), max_puntos)
+
     # Resultados
-    return {
+    resultado = {
         "metrica_r2": r2_score(y_test, y_pred), # Calidad del modelo (0 a 1)
         "error_mse": mean_squared_error(y_test, y_pred),
         "coeficientes": {feat: float(coef) for feat, coef in zip(feature_names, model.coef_)},
         "intercepto": float(model.intercept_),
         "variables_codificadas": columnas_categoricas if columnas_categoricas else None,
         "grafico_prediccion": {
-            "real": y_test.head(20).values.tolist(),
-            "predicho": y_pred[:20].tolist()
+            "real": y_test.to_numpy()[muestra].tolist(),
+            "predicho": y_pred[muestra].tolist()
         }
     }
+    if registro is not None:
+        resultado["modelo_id"] = model_registry.registrar(
+            model, "regresion_lineal", "regresion", target, features, feature_names, categorias,
+            huella=registro, metricas={"r2": resultado["metrica_r2"]}
+        )
+    return resultado
+
+def predictivo_regresion_logistica(df, target, features, registro=None):
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.metrics import accuracy_score, confusion_matrix
+    from sklearn.model_selection import train_test_split
+    from sklearn.preprocessing import LabelEncoder
 
-def predictivo_regresion_logistica(df, target, features):
     data = df[[target] + features].dropna()
     
     # Codificar Y si es texto (ej. "Compra", "No Compra" -> 1, 0)
@@ -206,20 +292,30 @@ def predictivo_regresion_logistica(df, target, features):
     model.fit(X_train, y_train)
     y_pred = model.predict(X_test)
     
-    return {
+    resultado = {
         "accuracy": accuracy_score(y_test, y_pred), # % de aciertos
         "matriz_confusion": confusion_matrix(y_test, y_pred).tolist(),
         "clases_mapeo": {i: label for i, label in enumerate(le.classes_)}
     }
+    if registro is not None:
+        resultado["modelo_id"] = model_registry.registrar(
+            model, "regresion_logistica", "clasificacion", target, features, features, etiquetas=le,
+            huella=registro, metricas={"accuracy": resultado["accuracy"]}
+        )
+    return resultado
+
 
+def predictivo_arbol_decision(df, target, features, registro=None):
+    from sklearn.preprocessing import LabelEncoder
+    from sklearn.tree import DecisionTreeClassifier, DecisionTreeRegressor, export_text
 
-def predictivo_arbol_decision(df, target, features):
     data = df[[target] + features].dropna()
     X = data[features]
     y = data[target]
     
     # Detectar si es Regresión (Numérico) o Clasificación (Texto/Categoría)
-    es_numerico = np.issubdtype(y.dtype, np.number)
+    es_numerico = es_numerica(y.dtype)
+    le = None
     
     if es_numerico:
         # Arbol de Regresión
@@ -239,60 +335,80 @@ def predictivo_arbol_decision(df, target, features):
     reglas = export_text(model, feature_names=features)
     importancias = dict(zip(features, model.feature_importances_))
     
-    return {
+    resultado = {
         "tipo_modelo": tipo,
         "importancia_variables": importancias, # Qué variable pesó más
         "reglas_texto": reglas # String largo con las reglas if/else
     }
+    if registro is not None:
+        resultado["modelo_id"] = model_registry.registrar(
+            model, "arbol_decision", "regresion" if es_numerico else "clasificacion", target, features, features,
+            etiquetas=le, huella=registro
+        )
+    return resultado
 
 
-def unsupervised_kmeans(df, features, n_clusters=3):
+def unsupervised_kmeans(df, features, n_clusters=3, max_puntos=downsampling.MAX_PUNTOS, modo="completo",
+                        k_min=2, k_max=10):
+    """
+    n_clusters="auto" elige k por silueta (ver clustering.elegir_k); modo:
+    auto, completo, minibatch o muestra (ver clustering).
+    """
+    from sklearn.preprocessing import StandardScaler
+
     data = df[features].dropna()
+    modo = clustering.resolver_modo(modo, len(data))
     
-    if len(data) < n_clusters:
+    if len(data) < (k_min if n_clusters == "auto" else n_clusters):
         return {"error": "No hay suficientes datos para crear clusters."}
 
     # Estandarizar (Obligatorio para K-Means)
     scaler = StandardScaler()
     data_scaled = scaler.fit_transform(data)
+
+    seleccion_k = None
+    if n_clusters == "auto":
+        n_clusters, seleccion_k = clustering.elegir_k(data_scaled, k_min, k_max)
     
-    kmeans = KMeans(n_clusters=n_clusters, random_state=42, n_init=10)
-    kmeans.fit(data_scaled)
+    _, etiquetas = clustering.ajustar(data_scaled, n_clusters, modo)
     
     # Asignar etiquetas
-    data['cluster'] = kmeans.labels_
+    data['cluster'] = etiquetas
     
     # Calcular promedios por cluster para interpretar
     # "El Grupo 0 tiene altos ingresos y baja edad"
     perfil_clusters = data.groupby('cluster').mean().to_dict()
     
-    return {
+    # Coordenadas para graficar (solo las 2 primeras variables), con a lo sumo
+    # max_puntos puntos muestreados por cluster
+    muestra = downsampling.muestreo_estratificado(etiquetas, max_puntos)
+    xs = data[features[0]].to_numpy()[muestra].tolist()
+    ys = data[features[1]].to_numpy()[muestra].tolist()
+    cs = etiquetas[muestra].tolist()
+
+    resultado = {
         "num_clusters": n_clusters,
         "distribucion": data['cluster'].value_counts().to_dict(),
         "perfil_promedio": perfil_clusters,
-        # Enviamos coordenadas para graficar (solo las 2 primeras variables)
-        "plot_data": [
-            {"x": row[features[0]], "y": row[features[1]], "c": int(cluster)}
-            for row, cluster in zip(data.to_dict('records'), kmeans.labels_)
-        ]
+        "plot_data": [{"x": x, "y": y, "c": c} for x, y, c in zip(xs, ys, cs)]
     }
+    if len(muestra) < len(data):
+        resultado["muestreo"] = downsampling.resumen_muestreo(len(data), muestra, "estratificado")
+    if modo != "completo":
+        resultado["modo"] = modo
+    if seleccion_k:
+        resultado["seleccion_k"] = seleccion_k
+    return resultado
 
 
-def nlp_frecuencia_palabras(df, columna, top_n=50):
-    # Unir todo el texto
-    texto_series = df[columna].dropna().astype(str)
-    texto_completo = " ".join(texto_series.tolist()).lower()
-    
-    # Limpiar signos de puntuación simple
-    texto_limpio = re.sub(r'[^\w\s]', '', texto_completo)
-    palabras = texto_limpio.split()
-    
-    # Stopwords básicas en español (puedes ampliar esta lista)
-    stopwords = {'de', 'la', 'que', 'el', 'en', 'y', 'a', 'los', 'se', 'del', 'las', 'un', 'por', 'con', 'no', 'una', 'su', 'para', 'es', 'al', 'lo', 'como', 'mas', 'pero', 'sus', 'le', 'ya', 'o'}
-    
-    palabras_utiles = [p for p in palabras if p not in stopwords and len(p) > 2]
-    
-    conteo = Counter(palabras_utiles).most_common(top_n)
+def nlp_frecuencia_palabras(df, columna, top_n=50, ngramas=1, stopwords_extra=()):
+    """
+    Palabras (o bigramas/trigramas con ngramas=2/3) más frecuentes de la columna,
+    sin stopwords en español (ver word_frequency).
+    """
+    conteo = word_frequency.frecuencias(
+        df[columna].dropna(), top_n, ngramas, word_frequency.lista_stopwords(stopwords_extra)
+    )
     
     # Formato para nube de palabras: [{text: "palabra", value: 20}, ...]
     return [
@@ -300,64 +416,86 @@ def nlp_frecuencia_palabras(df, columna, top_n=50):
         for palabra, frecuencia in conteo
     ]
 
-def nlp_sentimiento(df, columna):
+def nlp_sentimiento(df, columna, max_muestras=100):
     # Nota: TextBlob por defecto funciona mejor en Inglés.
     # Para español requiere descargar corpora extra, pero usaremos la base estándar.
     # Si tus datos son en español, la precisión puede variar sin el corpus adecuado.
     
-    data = df[[columna]].dropna()
+    textos = df[columna].dropna()
     
-    resultados = []
-    positivos = 0
-    negativos = 0
-    neutros = 0
+    # Polaridad (-1 a 1) de todos los textos: cada texto distinto se puntúa una sola vez
+    polaridad, conteo = sentiment.polaridades(textos)
+    clasificacion = sentiment.clasificar(polaridad)
+    categorias, cantidades = np.unique(clasificacion, return_counts=True)
+    totales = dict(zip(categorias.tolist(), cantidades.tolist()))
     
-    for texto in data[columna].head(100): # Limitamos a 100 para no saturar la respuesta rápida
-        blob = TextBlob(str(texto))
-        # Si usas datos en español y quieres traducir autom.: blob.translate(to='en')
-        # Pero eso es lento. Usaremos polaridad directa asumiendo estructura universal o inglés.
-        
-        polarity = blob.sentiment.polarity # -1 a 1
-        
-        if polarity > 0.1: 
-            cat = "Positivo"
-            positivos += 1
-        elif polarity < -0.1: 
-            cat = "Negativo"
-            negativos += 1
-        else: 
-            cat = "Neutro"
-            neutros += 1
-            
-        resultados.append({"texto": str(texto)[:50] + "...", "polaridad": polarity, "clasificacion": cat})
+    # Ejemplos para mostrar (las primeras filas, recortadas)
+    muestras = [
+        {"texto": str(texto)[:50] + "...", "polaridad": p, "clasificacion": cat}
+        for texto, p, cat in zip(
+            textos.iloc[:max_muestras], polaridad[:max_muestras].tolist(), clasificacion[:max_muestras].tolist()
+        )
+    ]
         
     return {
         "resumen": {
-            "positivos": positivos,
-            "negativos": negativos,
-            "neutros": neutros
+            "positivos": totales.get("Positivo", 0),
+            "negativos": totales.get("Negativo", 0),
+            "neutros": totales.get("Neutro", 0)
         },
-        "muestras": resultados
+        "polaridad_promedio": float(polaridad.mean()) if len(polaridad) else None,
+        "textos_analizados": conteo["textos"],
+        "textos_unicos": conteo["textos_unicos"],
+        "muestras": muestras
     }
 
 
 
 # --- 6. APRENDIZAJE DE ENSAMBLE (GÉRON) ---
 
-def predictivo_random_forest(df, target, features, tipo="regresion"):
+ALGORITMOS_BOSQUE = ("random_forest", "gradient_boosting", "auto")
+VALIDACIONES_BOSQUE = ("holdout", "oob")
+
+
+def predictivo_random_forest(df, target, features, tipo="regresion", n_estimators=100, max_depth=None,
+                             max_samples=None, n_jobs=None, validacion="holdout", algoritmo="random_forest",
+                             filas_gradiente=200_000, registro=None):
     """
     Random Forest: Mucho más potente que un árbol simple.
+    validacion="oob" evalúa con las filas fuera de bolsa (sin separar un 20% de prueba);
+    algoritmo="gradient_boosting" (o "auto" con más de filas_gradiente filas) usa
+    HistGradientBoosting, que escala mejor en número de filas.
     """
+    from sklearn.ensemble import (
+        HistGradientBoostingClassifier, HistGradientBoostingRegressor, RandomForestClassifier, RandomForestRegressor
+    )
+    from sklearn.inspection import permutation_importance
+    from sklearn.model_selection import train_test_split
+    from sklearn.preprocessing import LabelEncoder
+
+    if algoritmo not in ALGORITMOS_BOSQUE:
+        raise ValueError(f"Algoritmo '{algoritmo}' no soportado. Use: {', '.join(ALGORITMOS_BOSQUE)}.")
+    if validacion not in VALIDACIONES_BOSQUE:
+        raise ValueError(f"Validación '{validacion}' no soportada. Use: {', '.join(VALIDACIONES_BOSQUE)}.")
+
     data = df[[target] + features].dropna()
     X = data[features]
     y = data[target]
+
+    if algoritmo == "auto":
+        algoritmo = "gradient_boosting" if len(data) > filas_gradiente else "random_forest"
+    if algoritmo == "gradient_boosting":
+        # Sin bootstrap no hay filas fuera de bolsa
+        validacion = "holdout"
     
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    if validacion == "holdout":
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    else:
+        X_train, X_test, y_train, y_test = X, None, y, None
     
+    le = None
     if tipo == "regresion":
-        model = RandomForestRegressor(n_estimators=100, random_state=42)
         metric_name = "R2 Score"
-        metric_val = 0
     else:
         # Si es clasificación, necesitamos codificar el target
         # Validar número de clases para evitar errores con categorías muy raras
@@ -371,34 +509,73 @@ def predictivo_random_forest(df, target, features, tipo="regresion"):
 
         le = LabelEncoder()
         y_train = le.fit_transform(y_train)
-        y_test = le.transform(y_test)
-        model = RandomForestClassifier(n_estimators=100, random_state=42)
+        if y_test is not None:
+            y_test = le.transform(y_test)
         metric_name = "Accuracy"
+
+    if algoritmo == "random_forest":
+        clase = RandomForestRegressor if tipo == "regresion" else RandomForestClassifier
+        model = clase(
+            n_estimators=n_estimators, max_depth=max_depth, max_samples=max_samples,
+            oob_score=validacion == "oob", n_jobs=n_jobs, random_state=42
+        )
+    else:
+        clase = HistGradientBoostingRegressor if tipo == "regresion" else HistGradientBoostingClassifier
+        model = clase(max_iter=n_estimators, max_depth=max_depth, random_state=42)
     
+    inicio = time.perf_counter()
     model.fit(X_train, y_train)
+    tiempo_ajuste = time.perf_counter() - inicio
     
-    score = model.score(X_test, y_test)
+    score = model.oob_score_ if validacion == "oob" else model.score(X_test, y_test)
     
-    # Importancia de características
-    importancias = dict(zip(features, model.feature_importances_))
+    # Importancia de características (gradient boosting no la trae: se estima por
+    # permutación sobre una muestra del conjunto de prueba)
+    if algoritmo == "random_forest":
+        importancias = model.feature_importances_
+    else:
+        muestra = downsampling.muestreo_uniforme(len(X_test), 2000)
+        importancias = permutation_importance(
+            model, X_test.iloc[muestra], np.asarray(y_test)[muestra], n_repeats=3, random_state=42
+        ).importances_mean
+    importancias = dict(zip(features, importancias))
     # Ordenar por importancia
     importancias = dict(sorted(importancias.items(), key=lambda item: item[1], reverse=True))
     
-    return {
-        "tipo_modelo": f"Random Forest ({tipo})",
+    if algoritmo == "random_forest":
+        tipo_modelo = f"Random Forest ({tipo})"
+        mensaje = f"Este modelo usa {n_estimators} árboles de decisión para promediar resultados y reducir errores."
+    else:
+        tipo_modelo = f"Gradient Boosting por histogramas ({tipo})"
+        mensaje = f"Este modelo encadena hasta {n_estimators} árboles, cada uno corrigiendo los errores del anterior."
+    
+    resultado = {
+        "tipo_modelo": tipo_modelo,
         "metrica_nombre": metric_name,
         "metrica_valor": score,
         "importancia_variables": importancias,
-        "mensaje": "Este modelo usa 100 árboles de decisión para promediar resultados y reducir errores."
+        "mensaje": mensaje,
+        "validacion": validacion,
+        "tiempo_ajuste_s": round(tiempo_ajuste, 3),
     }
+    if algoritmo == "random_forest":
+        resultado["n_jobs"] = n_jobs
+    if registro is not None:
+        resultado["modelo_id"] = model_registry.registrar(
+            model, "random_forest", tipo, target, features, features, etiquetas=le,
+            huella=registro, metricas={metric_name: score}
+        )
+    return resultado
 
 # --- 7. SERIES DE TIEMPO AVANZADAS (MCKINNEY) ---
 
-def series_tiempo_descomposicion(df, col_fecha, col_valor, periodo=12):
+def series_tiempo_descomposicion(df, col_fecha, col_valor, periodo=12, max_puntos=downsampling.MAX_PUNTOS, metodo="lttb"):
     """
     Separa: Tendencia, Estacionalidad y Residuo.
     Requiere que los datos sean secuenciales.
     """
+    from statsmodels.tsa.seasonal import seasonal_decompose
+
     try:
         df[col_fecha] = pd.to_datetime(df[col_fecha])
     except:
@@ -417,75 +594,117 @@ def series_tiempo_descomposicion(df, col_fecha, col_valor, periodo=12):
     # Descomposición aditiva (Valor = Tendencia + Estacionalidad + Ruido)
     decomposition = seasonal_decompose(ts, model='additive', period=periodo)
     
-    # Prepara datos para graficar 4 líneas
-    fechas = ts.index.strftime('%Y-%m-%d').tolist()
+    # Prepara datos para graficar 4 líneas; los puntos se eligen sobre la serie
+    # observada y se aplican a las cuatro para que compartan el eje de fechas
+    observado = decomposition.observed.fillna(0).to_numpy()
+    muestra = downsampling.reducir_serie(observado, max_puntos, metodo)
+    fechas = ts.index[muestra].strftime('%Y-%m-%d').tolist()
     
-    return {
+    resultado = {
         "fechas": fechas,
-        "observado": decomposition.observed.fillna(0).tolist(), # El dato real
-        "tendencia": decomposition.trend.fillna(0).tolist(),    # Hacia dónde va el negocio
-        "estacionalidad": decomposition.seasonal.fillna(0).tolist(), # Patrón repetitivo
-        "residuo": decomposition.resid.fillna(0).tolist()       # Lo inexplicable/ruido
+        "observado": observado[muestra].tolist(), # El dato real
+        "tendencia": decomposition.trend.fillna(0).to_numpy()[muestra].tolist(),    # Hacia dónde va el negocio
+        "estacionalidad": decomposition.seasonal.fillna(0).to_numpy()[muestra].tolist(), # Patrón repetitivo
+        "residuo": decomposition.resid.fillna(0).to_numpy()[muestra].tolist()       # Lo inexplicable/ruido
     }
+    if len(muestra) < len(observado):
+        resultado["muestreo"] = downsampling.resumen_muestreo(len(observado), muestra, metodo)
+    return resultado
 
 # --- 8. WRANGLING: TABLAS DINÁMICAS (MCKINNEY) ---
 
-def wrangling_pivot_table(df, index, columns, values, aggfunc="sum"):
+def wrangling_pivot_table(df, index, columns, values, aggfunc="sum", formato="heatmap", contar_categorias=None, validar=True):
     """
     Genera una tabla cruzada como en Excel.
+    `validar=False` cuando las columnas ya se validaron (ej. con el perfil del dataset).
+    """
+    if validar:
+        if contar_categorias is None:
+            contar_categorias = lambda col: df[col].nunique(dropna=True)
+        error = validar_pivot(df.dtypes, contar_categorias, index, columns, values)
+        if error:
+            return error
+            
+    # Crear pivot (observed: con ejes `category` solo las combinaciones presentes, como con texto)
+    pivot = df.pivot_table(index=index, columns=columns, values=values, aggfunc=aggfunc, observed=True)
+    
+    return formatear_pivot(pivot, formato)
+
+
+def validar_pivot(dtypes, contar_categorias, index, columns, values, max_categorias=None):
+    """
+    Retorna el dict de error si las columnas no sirven para una tabla dinámica, o None.
+    `contar_categorias(col)` da el número de categorías distintas de la columna
+    (None: no se valida la cardinalidad, ej. antes de aplicar filtros).
+    `max_categorias`: por defecto PIVOT_MAX_CATEGORIAS.
     """
+    if max_categorias is None:
+        max_categorias = config.PIVOT_MAX_CATEGORIAS
     # Validar que existan columnas
     for col in [index, columns, values]:
-        if col not in df.columns:
+        if col not in dtypes.index:
             return {"error": f"Columna {col} no encontrada."}
 
     # Validar que index y columns sean columnas categóricas razonables
     for cat_col in [index, columns]:
-        serie = df[cat_col]
-        # Deben ser de tipo object o category
-        if serie.dtype not in ["object", "category"]:
+        # Deben ser de texto (object, string) o category
+        if not es_categorica(dtypes[cat_col]):
             return {
                 "error": "La columna utilizada como categoría no es de tipo categórico (texto).",
                 "columna": str(cat_col),
-                "dtype": str(serie.dtype)
+                "dtype": str(dtypes[cat_col])
             }
 
         # Evitar columnas tipo ID/nombre con demasiadas categorías únicas
-        num_categorias = serie.nunique(dropna=True)
-        if num_categorias > 100:
+        if contar_categorias is None:
+            continue
+        num_categorias = contar_categorias(cat_col)
+        if num_categorias > max_categorias:
             return {
                 "error": "La columna tiene demasiadas categorías distintas para usarla como dimensión de tabla dinámica (posible ID o identificador único).",
                 "columna": str(cat_col),
-                "num_categorias": int(num_categorias)
+                "num_categorias": int(num_categorias),
+                "max_categorias": int(max_categorias)
             }
 
     # Validar que la columna de valores sea numérica
-    if not pd.api.types.is_numeric_dtype(df[values]):
+    if not pd.api.types.is_numeric_dtype(dtypes[values]):
         return {
             "error": "La columna de valores debe ser numérica para poder agregarse.",
             "columna": str(values),
-            "dtype": str(df[values].dtype)
+            "dtype": str(dtypes[values])
         }
-            
-    # Crear pivot
-    pivot = df.pivot_table(index=index, columns=columns, values=values, aggfunc=aggfunc)
-    
+
+    return None
+
+
+def formatear_pivot(pivot, formato="heatmap"):
+    _validar_formato(formato)
+    # Ejes `category`: ordenar por etiqueta (como con texto), no por orden de las categorías
+    for eje in ("index", "columns"):
+        if isinstance(getattr(pivot, eje), pd.CategoricalIndex):
+            pivot = pivot.set_axis(getattr(pivot, eje).astype(object), axis=eje).sort_index(axis=eje)
     # Reemplazar NaN con 0
     pivot = pivot.fillna(0)
     
     # Formatear para el frontend (Heatmap o Tabla)
-    # Eje X: Columnas, Eje Y: Índices, Z: Valores
-    heatmap_data = []
-    for r_idx, row in pivot.iterrows():
-        for c_idx, val in row.items():
-            heatmap_data.append({
-                "x": str(c_idx), # Columna (ej. Mes)
-                "y": str(r_idx), # Indice (ej. Departamento)
-                "value": val
-            })
-            
+    # Eje X: Columnas (ej. Mes), Eje Y: Índices (ej. Departamento), Z: Valores (por filas)
+    eje_x = list(map(str, pivot.columns.tolist()))
+    eje_y = list(map(str, pivot.index.tolist()))
+    valores = pivot.to_numpy().ravel()
+
+    if formato == "heatmap":
+        x = np.tile(np.array(eje_x, dtype=object), len(eje_y)).tolist()
+        y = np.repeat(np.array(eje_y, dtype=object), len(eje_x)).tolist()
+        return {
+            "eje_x": eje_x,
+            "eje_y": eje_y,
+            "datos": _celdas_heatmap(x, y, valores.tolist())
+        }
+
     return {
-        "eje_x": list(map(str, pivot.columns.tolist())),
-        "eje_y": list(map(str, pivot.index.tolist())),
-        "datos": heatmap_data
+        "eje_x": eje_x,
+        "eje_y": eje_y,
+        "forma": [len(eje_y), len(eje_x)],
+        **_valores_compactos(valores, formato)
     }
\ No newline at end of file
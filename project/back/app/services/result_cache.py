@@ -0,0 +1,280 @@
+import glob
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from app.core import config
+
+# Caché de resultados de análisis.
+# Un mismo AnalisisRequest (archivo, herramienta, columnas y parámetros) sobre la
+# misma versión del dataset produce siempre el mismo resultado: se guarda y se
+# reutiliza en vez de volver a ajustar el modelo.
+# La clave empieza con un prefijo derivado del nombre del archivo, así al volver
+# a subirlo se descartan todos sus resultados (en memoria y en disco).
+# Con RESULTADOS_CACHE_DIR los resultados en disco se comparten entre workers y
+# un índice SQLite en ese directorio (indice.sqlite) lleva su vencimiento, el
+# último acceso y el tamaño, para acotar el directorio a RESULTADOS_CACHE_DIR_MAX_MB.
+
+ARCHIVO_INDICE = "indice.sqlite"
+
+
+def _prefijo_archivo(filename):
+    return hashlib.sha256(filename.encode("utf-8")).hexdigest()[:16]
+
+
+def clave_resultado(request, version):
+    """
+    Clave canónica: el orden de las claves de `parametros` no importa, el de
+    `columnas_x` sí (cambia el resultado).
+    """
+    contenido = json.dumps(
+        {
+            "tipo_analisis": request.tipo_analisis,
+            "columnas_x": list(request.columnas_x),
+            "columna_y": request.columna_y,
+            "parametros": request.parametros,
+            "version": version,
+        },
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str,
+    )
+    return f"{_prefijo_archivo(request.filename)}-{hashlib.sha256(contenido.encode('utf-8')).hexdigest()}"
+
+
+class IndiceResultados:
+    """
+    Índice de los resultados guardados en disco, compartido por todos los
+    workers (SQLite en modo WAL; una conexión por hilo).
+    """
+
+    def __init__(self, ruta, max_bytes):
+        self.ruta = ruta
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        with self._conexion() as conexion:
+            conexion.execute(
+                "CREATE TABLE IF NOT EXISTS resultados ("
+                "clave TEXT PRIMARY KEY, prefijo TEXT, guardado REAL, acceso REAL, bytes INTEGER)"
+            )
+            conexion.execute("CREATE INDEX IF NOT EXISTS resultados_prefijo ON resultados (prefijo)")
+            conexion.execute("CREATE INDEX IF NOT EXISTS resultados_acceso ON resultados (acceso)")
+
+    def _conexion(self):
+        conexion = getattr(self._local, "conexion", None)
+        if conexion is None:
+            conexion = sqlite3.connect(self.ruta, timeout=30)
+            conexion.execute("PRAGMA journal_mode=WAL")
+            conexion.execute("PRAGMA synchronous=NORMAL")
+            self._local.conexion = conexion
+        return conexion
+
+    def guardado(self, clave, ahora):
+        """
+        Momento en que se guardó `clave` (None si no está) y registra el acceso.
+        """
+        with self._conexion() as conexion:
+            fila = conexion.execute("SELECT guardado FROM resultados WHERE clave = ?", (clave,)).fetchone()
+            if fila is not None:
+                conexion.execute("UPDATE resultados SET acceso = ? WHERE clave = ?", (ahora, clave))
+        return fila[0] if fila is not None else None
+
+    def registrar(self, clave, guardado, tamano):
+        """
+        Agrega `clave` y expulsa las de acceso más antiguo mientras el total
+        supere max_bytes. Retorna las claves expulsadas (sus archivos se borran aparte).
+        """
+        with self._conexion() as conexion:
+            conexion.execute(
+                "INSERT OR REPLACE INTO resultados VALUES (?, ?, ?, ?, ?)",
+                (clave, clave.split("-", 1)[0], guardado, guardado, tamano),
+            )
+            total = conexion.execute("SELECT COALESCE(SUM(bytes), 0) FROM resultados").fetchone()[0]
+            expulsadas = []
+            if total > self.max_bytes:
+                for otra, bytes_otra in conexion.execute(
+                    "SELECT clave, bytes FROM resultados WHERE clave != ? ORDER BY acceso", (clave,)
+                ).fetchall():
+                    if total <= self.max_bytes:
+                        break
+                    expulsadas.append(otra)
+                    total -= bytes_otra
+                conexion.executemany("DELETE FROM resultados WHERE clave = ?", [(c,) for c in expulsadas])
+        return expulsadas
+
+    def eliminar(self, clave):
+        with self._conexion() as conexion:
+            conexion.execute("DELETE FROM resultados WHERE clave = ?", (clave,))
+
+    def eliminar_prefijo(self, prefijo):
+        with self._conexion() as conexion:
+            conexion.execute("DELETE FROM resultados WHERE prefijo = ?", (prefijo,))
+
+    def estadisticas(self):
+        with self._conexion() as conexion:
+            entradas, tamano = conexion.execute("SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM resultados").fetchone()
+        return {"entradas": entradas, "bytes": tamano, "bytes_maximos": self.max_bytes}
+
+
+class ResultCache:
+    """
+    Caché LRU con vencimiento (TTL) de resultados de análisis.
+
+    Si se indica `directorio`, cada resultado también se guarda en disco
+    (pickle), sobrevive a reinicios y lo ven los demás workers; las entradas en
+    disco respetan el mismo TTL y, en total, a lo sumo `max_bytes_disco`.
+    """
+
+    def __init__(self, max_entradas, ttl_s, directorio=None, max_bytes_disco=None):
+        self.max_entradas = max_entradas
+        self.ttl_s = ttl_s
+        self.directorio = directorio
+        self._entradas = OrderedDict()  # clave -> (guardado, resultado)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expulsiones = 0
+        self.indice = None
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+            self.indice = IndiceResultados(
+                os.path.join(directorio, ARCHIVO_INDICE), max_bytes_disco or float("inf")
+            )
+
+    def obtener(self, clave):
+        """
+        Retorna el resultado guardado para `clave` o None si no existe o venció.
+        """
+        ahora = time.time()
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is not None:
+                if ahora - entrada[0] <= self.ttl_s:
+                    self._entradas.move_to_end(clave)
+                    self.hits += 1
+                    return entrada[1]
+                del self._entradas[clave]
+
+        entrada = self._leer_disco(clave, ahora)
+        with self._lock:
+            if entrada is None:
+                self.misses += 1
+                return None
+            self._insertar(clave, entrada)
+            self.hits += 1
+            return entrada[1]
+
+    def guardar(self, clave, resultado):
+        entrada = (time.time(), resultado)
+        with self._lock:
+            self._insertar(clave, entrada)
+        self._escribir_disco(clave, entrada)
+
+    def invalidar_archivo(self, filename):
+        """
+        Descarta todos los resultados calculados sobre `filename`.
+        """
+        prefijo = f"{_prefijo_archivo(filename)}-"
+        with self._lock:
+            for clave in [c for c in self._entradas if c.startswith(prefijo)]:
+                del self._entradas[clave]
+        if self.directorio:
+            self.indice.eliminar_prefijo(prefijo[:-1])
+            for ruta in glob.glob(os.path.join(self.directorio, f"{prefijo}*.pkl")):
+                self._eliminar_archivo(ruta)
+
+    def limpiar(self):
+        with self._lock:
+            self._entradas.clear()
+
+    def estadisticas(self):
+        with self._lock:
+            total = self.hits + self.misses
+            estadisticas = {
+                "entradas": len(self._entradas),
+                "max_entradas": self.max_entradas,
+                "ttl_s": self.ttl_s,
+                "persistente": bool(self.directorio),
+                "hits": self.hits,
+                "misses": self.misses,
+                "expulsiones": self.expulsiones,
+                "tasa_aciertos": (self.hits / total) if total else 0.0,
+            }
+        if self.indice is not None:
+            # Compartido por todos los workers
+            estadisticas["disco"] = self.indice.estadisticas()
+        return estadisticas
+
+    def _insertar(self, clave, entrada):
+        """
+        Debe llamarse con el lock tomado.
+        """
+        self._entradas[clave] = entrada
+        self._entradas.move_to_end(clave)
+        while len(self._entradas) > self.max_entradas:
+            self._entradas.popitem(last=False)
+            self.expulsiones += 1
+
+    def _ruta(self, clave):
+        return os.path.join(self.directorio, f"{clave}.pkl")
+
+    @staticmethod
+    def _eliminar_archivo(ruta):
+        try:
+            os.remove(ruta)
+        except FileNotFoundError:
+            pass
+
+    def _leer_disco(self, clave, ahora):
+        if not self.directorio:
+            return None
+        # El índice responde los misses y los vencidos sin tocar el directorio
+        guardado = self.indice.guardado(clave, ahora)
+        if guardado is None:
+            return None
+        ruta = self._ruta(clave)
+        if ahora - guardado > self.ttl_s:
+            self.indice.eliminar(clave)
+            self._eliminar_archivo(ruta)
+            return None
+        try:
+            with open(ruta, "rb") as f:
+                return pickle.load(f)
+        except FileNotFoundError:
+            # Expulsado por otro worker entre la consulta al índice y la lectura
+            return None
+        except Exception:
+            # Archivo corrupto o de una versión incompatible: se recalcula
+            return None
+
+    def _escribir_disco(self, clave, entrada):
+        if not self.directorio:
+            return
+        ruta = self._ruta(clave)
+        # pid + hilo: otros workers pueden estar escribiendo la misma clave
+        temporal = f"{ruta}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(temporal, "wb") as f:
+                pickle.dump(entrada, f, protocol=pickle.HIGHEST_PROTOCOL)
+            tamano = os.path.getsize(temporal)
+            os.replace(temporal, ruta)
+            for expulsada in self.indice.registrar(clave, entrada[0], tamano):
+                self._eliminar_archivo(self._ruta(expulsada))
+        except Exception:
+            # La persistencia es opcional: si falla, el resultado sigue en memoria
+            if os.path.exists(temporal):
+                os.remove(temporal)
+
+
+# Instancia única compartida por todo el proceso
+result_cache = ResultCache(
+    config.RESULTADOS_CACHE_MAX,
+    config.RESULTADOS_CACHE_TTL_S,
+    config.RESULTADOS_CACHE_DIR or None,
+    config.RESULTADOS_CACHE_DIR_MAX_MB * 1024 * 1024,
+)
@@ -0,0 +1,110 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from app.core import config
+from app.services import executor
+
+# Polaridad de sentimiento para columnas completas.
+# TextBlob es Python puro (~1 ms por texto). Para no pagarlo por fila:
+#   1. Se normaliza el texto (espacios y mayúsculas no cambian la polaridad de
+#      TextBlob) y se puntúa una sola vez cada texto distinto.
+#   2. Las polaridades se recuerdan entre análisis, por hash del texto normalizado.
+#   3. Los textos nuevos se reparten en lotes en el pool de procesos.
+
+UMBRAL_POSITIVO = 0.1
+UMBRAL_NEGATIVO = -0.1
+# Por debajo de este número de textos nuevos no compensa enviarlos a otros procesos
+MIN_TEXTOS_PROCESOS = 500
+
+
+def normalizar(textos):
+    return textos.astype(str).str.split().str.join(" ").str.lower()
+
+
+def _clave(texto):
+    return hashlib.blake2b(texto.encode("utf-8"), digest_size=16).digest()
+
+
+def puntuar_lote(textos):
+    # TextBlob (y NLTK) se cargan al puntuar el primer lote, no al importar el módulo
+    from textblob import TextBlob
+
+    return [TextBlob(texto).sentiment.polarity for texto in textos]
+
+
+class CachePolaridad:
+    """
+    LRU acotada de polaridades por texto normalizado.
+    """
+
+    def __init__(self, max_entradas):
+        self.max_entradas = max_entradas
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obtener_varias(self, claves):
+        with self._lock:
+            encontradas = {}
+            for clave in claves:
+                if clave in self._entradas:
+                    self._entradas.move_to_end(clave)
+                    encontradas[clave] = self._entradas[clave]
+            return encontradas
+
+    def guardar_varias(self, pares):
+        with self._lock:
+            for clave, polaridad in pares:
+                self._entradas[clave] = polaridad
+                self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+
+    def limpiar(self):
+        with self._lock:
+            self._entradas.clear()
+
+    def __len__(self):
+        return len(self._entradas)
+
+
+cache_polaridad = CachePolaridad(config.SENTIMIENTO_CACHE_MAX)
+
+
+def polaridades(textos):
+    """
+    Polaridad (-1 a 1) de cada elemento de la Series `textos` (sin nulos), como array.
+    Retorna (polaridades, estadísticas de deduplicación y caché).
+    """
+    codigos, unicos = pd.factorize(normalizar(textos))
+    claves = [_clave(texto) for texto in unicos]
+
+    conocidas = cache_polaridad.obtener_varias(claves)
+    pendientes = [i for i, clave in enumerate(claves) if clave not in conocidas]
+    nuevas = []
+    if pendientes:
+        textos_nuevos = [unicos[i] for i in pendientes]
+        if len(textos_nuevos) < MIN_TEXTOS_PROCESOS:
+            nuevas = puntuar_lote(textos_nuevos)
+        else:
+            lote = config.SENTIMIENTO_LOTE
+            lotes = [textos_nuevos[i:i + lote] for i in range(0, len(textos_nuevos), lote)]
+            nuevas = [p for resultado in executor.mapear_en_procesos(puntuar_lote, lotes) for p in resultado]
+        cache_polaridad.guardar_varias((claves[i], p) for i, p in zip(pendientes, nuevas))
+
+    por_unico = np.fromiter((conocidas.get(clave, 0.0) for clave in claves), dtype=np.float64, count=len(claves))
+    por_unico[pendientes] = nuevas
+    return por_unico[codigos], {
+        "textos": len(textos),
+        "textos_unicos": len(unicos),
+        "puntuados": len(pendientes),
+    }
+
+
+def clasificar(polaridad):
+    return np.select(
+        [polaridad > UMBRAL_POSITIVO, polaridad < UMBRAL_NEGATIVO], ["Positivo", "Negativo"], default="Neutro"
+    )
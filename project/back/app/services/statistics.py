@@ -1,42 +1,186 @@
 import pandas as pd
 import numpy as np
 
-def calcular_pareto(df: pd.DataFrame, columna: str):
+# Clasificación ABC (Regla de negocio estándar), por % acumulado:
+# A: Vitales (0 - 80%)
+# B: Importantes (80% - 95%)
+# C: Triviales (95% - 100%)
+CLASES = np.array(['A', 'B', 'C'])
+LIMITES_CLASES = (80, 95)
+
+
+def calcular_pareto(df: pd.DataFrame, columna: str, columna_valor=None, top_n=None, offset=0, limit=None):
     """
     Realiza el análisis de Pareto sobre una columna categórica.
-    Retorna una lista de diccionarios con la clasificación ABC.
+    Con `columna_valor` el peso de cada categoría es la suma de esa columna
+    numérica (ej. Ventas) en vez de su cantidad de filas.
+    Retorna {"items", "total_categorias", "otros"} (ver `pareto_desde_conteos`).
     """
     # 1. Validar que la columna existe
     if columna not in df.columns:
         raise ValueError(f"La columna '{columna}' no existe en el archivo.")
 
-    # 2. Calcular Frecuencias (Value Counts)
-    # Esto agrupa y cuenta las ocurrencias (Ej. "Fallo Motor": 500 veces)
-    pareto_df = df[columna].value_counts().reset_index()
-    pareto_df.columns = ['etiqueta', 'frecuencia']
-
-    # 3. Calcular Porcentajes
-    total = pareto_df['frecuencia'].sum()
-    pareto_df['porcentaje'] = (pareto_df['frecuencia'] / total) * 100
-
-    # 4. Calcular Acumulado (La clave del Pareto)
-    pareto_df['acumulado'] = pareto_df['porcentaje'].cumsum()
-
-    # 5. Clasificación ABC (Regla de negocio estándar)
-    # A: Vitales (0 - 80%)
-    # B: Importantes (80% - 95%)
-    # C: Triviales (95% - 100%)
-    def clasificar(valor_acumulado):
-        if valor_acumulado <= 80:
-            return 'A'
-        elif valor_acumulado <= 95:
-            return 'B'
-        else:
-            return 'C'
-
-    pareto_df['clase'] = pareto_df['acumulado'].apply(clasificar)
-
-    # 6. Convertir a diccionario para la API
-    resultados = pareto_df.to_dict(orient='records')
-    
-    return resultados
\ No newline at end of file
+    if columna_valor is None:
+        # 2. Calcular Frecuencias (Value Counts)
+        # Esto agrupa y cuenta las ocurrencias (Ej. "Fallo Motor": 500 veces)
+        # En columnas `category` value_counts incluye las categorías sin filas: se descartan
+        conteos = df[columna].value_counts()
+        return pareto_desde_conteos(conteos[conteos > 0], None, top_n, offset, limit)
+
+    # 2. Pareto ponderado: filas y suma de la columna de valor por categoría
+    if columna_valor not in df.columns:
+        raise ValueError(f"La columna '{columna_valor}' no existe en el archivo.")
+    valores = df[columna_valor]
+    validar_columna_valor(columna_valor, valores.dtype, valores.min())
+    agrupado = valores.groupby(df[columna], observed=True, sort=False).agg(['size', 'sum'])
+    return pareto_desde_conteos(agrupado['size'], agrupado['sum'], top_n, offset, limit)
+
+
+def validar_columna_valor(columna_valor, dtype=None, minimo=None):
+    """
+    La columna de valor del Pareto ponderado debe ser numérica y sin valores negativos.
+    """
+    if dtype is not None and (not pd.api.types.is_numeric_dtype(dtype) or pd.api.types.is_bool_dtype(dtype)):
+        raise ValueError(f"La columna de valor '{columna_valor}' debe ser numérica.")
+    if minimo is not None and minimo < 0:
+        raise ValueError(f"La columna de valor '{columna_valor}' tiene valores negativos: el Pareto ponderado requiere valores >= 0.")
+
+
+def _por_etiqueta(indices, etiquetas):
+    """
+    `indices` en orden de etiqueta: el desempate del ranking. No depende del orden
+    en que llegan los conteos, así pandas, DuckDB y los agregados incrementales coinciden.
+    """
+    return indices[np.argsort(np.asarray(etiquetas[indices]), kind='stable')]
+
+
+def _seleccion(pesos, k, etiquetas):
+    """
+    Índices (en orden de posición) de las `k` categorías de mayor peso, con una
+    selección parcial (argpartition, O(n)) en vez de ordenar todo. Los empates
+    en el límite se resuelven por etiqueta, igual que en `_ordenar`.
+    """
+    n = len(pesos)
+    if k >= n:
+        return np.arange(n)
+    if k <= 0:
+        return np.arange(0)
+    umbral = pesos[np.argpartition(pesos, n - k)[n - k]]  # k-ésimo mayor peso
+    mayores = np.flatnonzero(pesos > umbral)
+    empatados = _por_etiqueta(np.flatnonzero(pesos == umbral), etiquetas)[:k - len(mayores)]
+    return np.sort(np.concatenate([mayores, empatados]))
+
+
+def _ordenar(pesos, indices, etiquetas):
+    """
+    `indices` en orden de peso descendente; los empates, en orden de etiqueta.
+    """
+    indices = _por_etiqueta(indices, etiquetas)
+    return indices[np.argsort(-pesos[indices], kind='stable')]
+
+
+def _posiciones_limite(pesos, total):
+    """
+    Cantidad de categorías del ranking completo con % acumulado <= cada límite
+    de LIMITES_CLASES, sin ordenar las categorías: se agrupan por peso (hay pocos
+    pesos distintos cuando son conteos) y se busca cada límite con searchsorted.
+    """
+    distintos, repeticiones = np.unique(pesos, return_counts=True)
+    distintos, repeticiones = distintos[::-1], repeticiones[::-1]
+    acumulado_grupos = np.cumsum(distintos * repeticiones) * 100
+    posiciones = []
+    for limite in LIMITES_CLASES:
+        # Grupos que caen completos bajo el límite y cuántos del siguiente grupo aún entran
+        g = np.searchsorted(acumulado_grupos, limite * total, side='right')
+        posicion = repeticiones[:g].sum()
+        if g < len(distintos) and distintos[g] > 0:
+            previo = acumulado_grupos[g - 1] if g else 0
+            posicion += min(int((limite * total - previo) // (distintos[g] * 100)), repeticiones[g])
+        posiciones.append(int(posicion))
+    return posiciones
+
+
+def pareto_desde_conteos(conteos, pesos=None, top_n=None, offset=0, limit=None):
+    """
+    Pareto a partir del conteo de cada categoría (ej. un agregado incremental).
+    `pesos` (alineado con `conteos`) es la suma de la columna de valor en el Pareto ponderado.
+
+    Retorna {"items", "total_categorias", "otros"}:
+      - items: las categorías del ranking en [offset, offset + limit) (todas por
+        defecto), limitado a las `top_n` primeras
+      - otros: con `top_n`, las categorías restantes agregadas por clase ABC
+        ({"clase", "categorias", "frecuencia", "porcentaje"}); None si no hay resto
+    Las categorías con el mismo peso se ordenan por etiqueta. Solo se ordenan
+    las categorías hasta la última de la página.
+    """
+    if top_n is not None and top_n < 1:
+        raise ValueError("top_n debe ser mayor o igual a 1.")
+    if offset < 0:
+        raise ValueError("offset debe ser mayor o igual a 0.")
+    if limit is not None and limit < 1:
+        raise ValueError("limit debe ser mayor o igual a 1.")
+
+    etiquetas = conteos.index
+    frecuencias = conteos.to_numpy()
+    valores = frecuencias if pesos is None else pesos.to_numpy(dtype=float)
+    n = len(valores)
+
+    # 3. Categorías a ordenar: las primeras top_n, hasta el final de la página
+    visibles = n if top_n is None else min(top_n, n)
+    hasta = visibles if limit is None else min(visibles, offset + limit)
+    orden = _ordenar(valores, _seleccion(valores, hasta, etiquetas), etiquetas)
+
+    # 4. Calcular Porcentajes y Acumulado (La clave del Pareto)
+    total = valores.sum()
+    if n and total <= 0:
+        raise ValueError("La suma de la columna de valor es 0: no hay un Pareto que calcular.")
+    porcentaje = (valores[orden] / total) * 100
+    acumulado = np.cumsum(porcentaje)
+
+    # 5. Clasificación ABC vectorizada, sobre el peso acumulado (exacta con conteos enteros)
+    acumulado_pesos = np.cumsum(valores[orden]) * 100
+    clase = np.select([acumulado_pesos <= limite * total for limite in LIMITES_CLASES], CLASES[:2], CLASES[2])
+
+    # 6. Página pedida, convertida a diccionario para la API
+    pagina = slice(offset, hasta)
+    pareto_df = pd.DataFrame({'etiqueta': etiquetas[orden[pagina]], 'frecuencia': frecuencias[orden[pagina]]})
+    if pesos is not None:
+        pareto_df['valor'] = valores[orden[pagina]]
+    pareto_df['porcentaje'] = porcentaje[pagina]
+    pareto_df['acumulado'] = acumulado[pagina]
+    pareto_df['clase'] = clase[pagina]
+
+    return {
+        'items': pareto_df.to_dict(orient='records'),
+        'total_categorias': n,
+        'otros': _otros(etiquetas, frecuencias, valores, pesos is not None, total, visibles) if visibles < n else None,
+    }
+
+
+def _otros(etiquetas, frecuencias, valores, ponderado, total, visibles):
+    """
+    Categorías fuera de las `visibles` primeras del ranking, agregadas por clase ABC.
+    """
+    # Las primeras `visibles` y, del ranking completo, cuántas quedan en A y en A + B
+    restantes = np.ones(len(valores), dtype=bool)
+    restantes[_seleccion(valores, visibles, etiquetas)] = False
+    fin_a, fin_b = _posiciones_limite(valores, total)
+    codigos = np.full(len(valores), 2)
+    codigos[_seleccion(valores, fin_b, etiquetas)] = 1
+    codigos[_seleccion(valores, fin_a, etiquetas)] = 0
+    codigos = codigos[restantes]
+
+    categorias = np.bincount(codigos, minlength=3)
+    suma_frecuencias = np.bincount(codigos, weights=frecuencias[restantes], minlength=3)
+    suma_valores = np.bincount(codigos, weights=valores[restantes], minlength=3)
+
+    otros = []
+    for codigo, clase in enumerate(CLASES):
+        if not categorias[codigo]:
+            continue
+        grupo = {'clase': str(clase), 'categorias': int(categorias[codigo]), 'frecuencia': int(suma_frecuencias[codigo])}
+        if ponderado:
+            grupo['valor'] = float(suma_valores[codigo])
+        grupo['porcentaje'] = float(suma_valores[codigo] / total * 100)
+        otros.append(grupo)
+    return otros
@@ -0,0 +1,435 @@
+import hashlib
+import json
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin flock, el bloqueo solo protege dentro del proceso
+    fcntl = None
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.feather as feather
+import pyarrow.fs as pafs
+
+from app.core import config
+from app.services import filtros as filtros_filas
+
+# Almacenamiento columnar de los datasets limpios.
+# Junto a cada archivo subido (ej. data/ventas.csv) se guardan:
+#   data/ventas.csv.feather      -> datos limpios y tipados (Arrow IPC sin compresión, apto para mmap)
+#   data/ventas.csv.schema.json  -> manifiesto con dtypes, columnas de metadata y filas
+#   data/ventas.csv.parte1.feather, parte2... -> filas anexadas después (POST /datasets/{filename}/append),
+#                                   con el mismo esquema; el manifiesto lista los segmentos vigentes
+# En disco el texto siempre es string de Arrow (los segmentos y porciones no
+# necesitan compartir diccionario). Las columnas de baja cardinalidad que el
+# manifiesto lista en "categoricas" se codifican como diccionario al leer y
+# llegan a pandas como `category`: sin un objeto Python por fila.
+
+EXTENSION_COLUMNAR = ".feather"
+EXTENSION_MANIFIESTO = ".schema.json"
+EXTENSION_BLOQUEO = ".lock"
+
+_bloqueos = {}
+_lock_bloqueos = threading.Lock()
+
+
+def ruta_columnar(file_location):
+    return f"{file_location}{EXTENSION_COLUMNAR}"
+
+
+def ruta_manifiesto(file_location):
+    return f"{file_location}{EXTENSION_MANIFIESTO}"
+
+
+@contextmanager
+def bloqueo_dataset(file_location):
+    """
+    Bloqueo exclusivo del dataset entre los hilos del proceso y entre workers
+    (flock sobre data/<archivo>.lock): los anexos y las escrituras de sus
+    derivados no se pisan aunque lleguen a workers distintos.
+    """
+    with _lock_bloqueos:
+        lock = _bloqueos.setdefault(file_location, threading.Lock())
+    with lock:
+        if fcntl is None:
+            yield
+            return
+        with open(f"{file_location}{EXTENSION_BLOQUEO}", "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def columnar_vigente(file_location):
+    """
+    True si existe la versión columnar y no es más antigua que el archivo original.
+    """
+    destino = ruta_columnar(file_location)
+    if not os.path.exists(destino) or not os.path.exists(ruta_manifiesto(file_location)):
+        return False
+    return os.stat(destino).st_mtime_ns >= os.stat(file_location).st_mtime_ns
+
+
+def _preparar_para_arrow(df):
+    """
+    Arrow exige nombres de columna texto y columnas de un solo tipo.
+    Las columnas object con tipos mezclados (ej. números que no se pudieron
+    limpiar junto a textos) se guardan como texto, igual que al reescribir un CSV.
+    """
+    df = df.copy()
+    df.columns = [str(c) for c in df.columns]
+    for col in df.columns:
+        if df[col].dtype == 'object':
+            tipo = pd.api.types.infer_dtype(df[col], skipna=True)
+            if tipo not in ("string", "empty"):
+                df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+    return df
+
+
+def hash_archivo(ruta, bloque=1024 * 1024):
+    """
+    Calcula el hash SHA-256 del contenido del archivo leyendo por bloques.
+    """
+    h = hashlib.sha256()
+    with open(ruta, "rb") as f:
+        for trozo in iter(lambda: f.read(bloque), b""):
+            h.update(trozo)
+    return h.hexdigest()
+
+
+def construir_manifiesto(dtypes, filas, filename, version=None, categoricas=()):
+    """
+    Describe el dataset limpio: dtypes inferidos y columnas de metadata (_moneda/_escala).
+    `version` es el hash del archivo original; identifica el contenido del dataset.
+    `categoricas`: columnas de texto que se leen como `category`.
+    """
+    columnas = [str(c) for c in dtypes.index]
+    categoricas = [c for c in columnas if c in set(categoricas)]
+    metadatos = {}
+    for col in columnas:
+        for sufijo in ("moneda", "escala"):
+            if f"{col}_{sufijo}" in columnas:
+                metadatos.setdefault(col, {})[sufijo] = f"{col}_{sufijo}"
+
+    return {
+        "filename": filename,
+        "version": version,
+        "formato": "feather",
+        "filas": int(filas),
+        "columnas": [
+            {"nombre": str(c), "dtype": "category" if str(c) in categoricas else str(t)} for c, t in dtypes.items()
+        ],
+        "categoricas": categoricas,
+        "metadatos": metadatos,
+        "segmentos": [],
+    }
+
+
+def ruta_segmento(file_location, numero):
+    return f"{file_location}.parte{numero}{EXTENSION_COLUMNAR}"
+
+
+def _segmentos(file_location):
+    """
+    Rutas de los segmentos anexados que lista el manifiesto actual.
+    """
+    if not os.path.exists(ruta_manifiesto(file_location)):
+        return []
+    directorio = os.path.dirname(file_location)
+    return [os.path.join(directorio, s["archivo"]) for s in leer_manifiesto(file_location).get("segmentos", [])]
+
+
+def _eliminar_archivos(rutas):
+    for ruta in rutas:
+        if os.path.exists(ruta):
+            os.remove(ruta)
+
+
+def _escribir_manifiesto(manifiesto, file_location):
+    temporal = f"{ruta_manifiesto(file_location)}.tmp"
+    with open(temporal, "w", encoding="utf-8") as f:
+        json.dump(manifiesto, f, ensure_ascii=False, indent=2)
+    os.replace(temporal, ruta_manifiesto(file_location))
+
+
+def guardar_columnar(df, file_location, version=None, categoricas=()):
+    """
+    Guarda el DataFrame limpio en formato columnar y escribe su manifiesto.
+    """
+    df = _preparar_para_arrow(df)
+    manifiesto = construir_manifiesto(df.dtypes, len(df), os.path.basename(file_location), version, categoricas)
+
+    # Escribir en temporales y renombrar: un lector concurrente nunca ve un archivo a medias
+    destino = ruta_columnar(file_location)
+    anteriores = _segmentos(file_location)
+    # Sin compresión: permite leer con memory mapping y proyectar columnas sin descomprimir
+    feather.write_feather(df, f"{destino}.tmp", compression="uncompressed")
+    _escribir_manifiesto(manifiesto, file_location)
+    os.replace(f"{destino}.tmp", destino)
+    # El dataset se reemplazó: las filas anexadas a la versión anterior ya no aplican
+    _eliminar_archivos(anteriores)
+    return manifiesto
+
+
+def _ajustar_a_esquema(df, esquema):
+    """
+    Adapta una porción al esquema fijado por la primera: mismas columnas y tipos.
+    Las columnas de metadata que falten se agregan vacías y las que sobren se
+    descartan; los valores que no encajan en un tipo numérico quedan como nulos.
+    """
+    df = df.reindex(columns=esquema.names)
+    for campo in esquema:
+        serie = df[campo.name]
+        if pa.types.is_integer(campo.type) or pa.types.is_floating(campo.type):
+            if not pd.api.types.is_numeric_dtype(serie) or pd.api.types.is_bool_dtype(serie):
+                df[campo.name] = pd.to_numeric(serie, errors="coerce")
+        elif pa.types.is_boolean(campo.type):
+            if not pd.api.types.is_bool_dtype(serie):
+                df[campo.name] = serie.where(serie.isin([True, False]), None).astype(object)
+        elif pa.types.is_string(campo.type) or pa.types.is_large_string(campo.type):
+            df[campo.name] = serie.where(serie.isna(), serie.astype(str)).astype(object)
+    return df
+
+
+def _tipo_ensanchado(campo, serie):
+    """
+    Tipo al que hay que ensanchar `campo` para guardar `serie` sin perder valores
+    (entero -> float64, número o booleano con texto -> string), o None si ya entra.
+    """
+    validos = serie.dropna()
+    if validos.empty:
+        return None
+    tipo = pd.api.types.infer_dtype(validos, skipna=True)
+    if pa.types.is_boolean(campo.type):
+        return None if tipo == "boolean" else pa.string()
+    if pa.types.is_integer(campo.type) or pa.types.is_floating(campo.type):
+        if tipo == "boolean":
+            return pa.string()
+        numeros = pd.to_numeric(validos, errors="coerce")
+        if numeros.isna().any():
+            return pa.string()
+        if pa.types.is_integer(campo.type) and not pd.api.types.is_integer_dtype(numeros):
+            return pa.float64()
+    return None
+
+
+class EscritorColumnar:
+    """
+    Escribe un dataset columnar por porciones (ingesta en streaming).
+
+    El esquema se fija con la primera porción y las siguientes se adaptan a él,
+    así el archivo final es un único Arrow IPC legible con `leer_columnar`.
+    Si una porción trae valores que el esquema no admite (ej. 0.5 en una columna
+    entera o texto en una numérica) la columna se ensancha como lo habría tipado
+    la lectura completa del CSV y lo ya escrito se reescribe con el esquema nuevo.
+    `al_ensanchar(columnas, porciones)` recibe las columnas ensanchadas y las
+    porciones ya escritas con su tipo nuevo (ej. para rehacer su perfil).
+    Al cerrar se escribe el manifiesto y se publica el archivo de forma atómica.
+    """
+
+    def __init__(self, file_location, version=None, al_ensanchar=None):
+        self.file_location = file_location
+        self.version = version
+        self.al_ensanchar = al_ensanchar
+        self.temporal = f"{ruta_columnar(file_location)}.tmp"
+        self.esquema = None
+        self.filas = 0
+        self._sink = None
+        self._writer = None
+
+    def escribir(self, df):
+        """
+        Agrega la porción y retorna el DataFrame tal como quedó guardado.
+        """
+        df = _preparar_para_arrow(df)
+        if self._writer is None:
+            # Columnas totalmente vacías en la primera porción: texto, para no perder datos posteriores
+            for col in df.columns:
+                if df[col].isna().all():
+                    df[col] = df[col].astype(object)
+            esquema = pa.Schema.from_pandas(df, preserve_index=False)
+            for i, campo in enumerate(esquema):
+                if pa.types.is_null(campo.type):
+                    esquema = esquema.set(i, pa.field(campo.name, pa.string()))
+            self.esquema = esquema
+            self._abrir()
+        else:
+            self._ensanchar(df)
+            df = _ajustar_a_esquema(df, self.esquema)
+
+        tabla = pa.Table.from_pandas(df, schema=self.esquema, preserve_index=False)
+        self._writer.write_table(tabla)
+        self.filas += len(df)
+        return df
+
+    def _abrir(self):
+        self._sink = pa.OSFile(self.temporal, "wb")
+        self._writer = pa.ipc.new_file(self._sink, self.esquema)
+
+    def _cerrar_escritura(self):
+        self._writer.close()
+        self._sink.close()
+
+    def _ensanchar(self, df):
+        esquema = self.esquema
+        for i, campo in enumerate(self.esquema):
+            if campo.name in df.columns:
+                tipo = _tipo_ensanchado(campo, df[campo.name])
+                if tipo is not None:
+                    esquema = esquema.set(i, pa.field(campo.name, tipo))
+        if esquema.equals(self.esquema):
+            return
+        ensanchadas = [c.name for c, anterior in zip(esquema, self.esquema) if not c.type.equals(anterior.type)]
+
+        # Reescribir lo ya escrito con el esquema nuevo (en Arrow IPC no se puede cambiar en el lugar)
+        self._cerrar_escritura()
+        anterior = f"{self.temporal}.anterior"
+        os.replace(self.temporal, anterior)
+        self.esquema = esquema
+        try:
+            self._abrir()
+            for porcion in self._porciones(anterior):
+                self._writer.write_table(pa.Table.from_pandas(porcion, schema=esquema, preserve_index=False))
+            if self.al_ensanchar is not None:
+                self.al_ensanchar(ensanchadas, (porcion[ensanchadas] for porcion in self._porciones(anterior)))
+        finally:
+            os.remove(anterior)
+
+    def _porciones(self, ruta):
+        with pa.memory_map(ruta) as fuente:
+            lector = pa.ipc.open_file(fuente)
+            for i in range(lector.num_record_batches):
+                yield _ajustar_a_esquema(lector.get_batch(i).to_pandas(), self.esquema)
+
+    def cerrar(self, categoricas=()):
+        if self._writer is None:
+            raise ValueError("El archivo no contiene filas.")
+        self._cerrar_escritura()
+
+        dtypes = self.esquema.empty_table().to_pandas().dtypes
+        manifiesto = construir_manifiesto(
+            dtypes, self.filas, os.path.basename(self.file_location), self.version, categoricas
+        )
+        anteriores = _segmentos(self.file_location)
+        _escribir_manifiesto(manifiesto, self.file_location)
+        os.replace(self.temporal, ruta_columnar(self.file_location))
+        _eliminar_archivos(anteriores)
+        return manifiesto
+
+    def descartar(self):
+        if self._writer is not None:
+            self._cerrar_escritura()
+        if os.path.exists(self.temporal):
+            os.remove(self.temporal)
+
+
+def leer_manifiesto(file_location):
+    with open(ruta_manifiesto(file_location), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def esquema_columnar(file_location):
+    with pa.memory_map(ruta_columnar(file_location)) as fuente:
+        return pa.ipc.open_file(fuente).schema
+
+
+def anexar_segmento(file_location, df, contenido_hash):
+    """
+    Agrega filas al dataset como un nuevo segmento con el esquema del archivo base.
+    La versión del dataset pasa a ser el hash de la versión anterior más el
+    contenido anexado. Retorna (manifiesto, DataFrame tal como quedó guardado).
+    El llamador debe evitar anexos concurrentes al mismo archivo.
+    """
+    manifiesto = leer_manifiesto(file_location)
+    esquema = esquema_columnar(file_location)
+
+    df = _ajustar_a_esquema(_preparar_para_arrow(df), esquema)
+    tabla = pa.Table.from_pandas(df, schema=esquema, preserve_index=False)
+
+    segmentos = manifiesto.setdefault("segmentos", [])
+    numero = max((s["numero"] for s in segmentos), default=0) + 1
+    destino = ruta_segmento(file_location, numero)
+    feather.write_feather(tabla, f"{destino}.tmp", compression="uncompressed")
+    os.replace(f"{destino}.tmp", destino)
+
+    version_anterior = manifiesto.get("version") or ""
+    manifiesto["version"] = hashlib.sha256(f"{version_anterior}:{contenido_hash}".encode("utf-8")).hexdigest()
+    manifiesto["filas"] += len(df)
+    segmentos.append({"numero": numero, "archivo": os.path.basename(destino), "filas": len(df)})
+    # El segmento ya está completo en disco: publicarlo es reescribir el manifiesto
+    _escribir_manifiesto(manifiesto, file_location)
+    return manifiesto, a_pandas(tabla, manifiesto)
+
+
+def _tipo_texto_arrow(tipo):
+    if pa.types.is_string(tipo) or pa.types.is_large_string(tipo):
+        return pd.StringDtype("pyarrow")
+    return None
+
+
+def a_pandas(tabla, manifiesto, sin_copia=False):
+    """
+    Convierte la tabla leída a DataFrame con el tipado del manifiesto: las
+    columnas categóricas se codifican como diccionario en Arrow (cada porción o
+    segmento con el suyo; pandas los unifica) y llegan como `category`.
+    `sin_copia`: una columna por bloque, así las numéricas sin nulos de un solo
+    segmento quedan como vistas (de solo lectura) del archivo mapeado en memoria.
+    """
+    categoricas = set(manifiesto.get("categoricas", []))
+    for i, campo in enumerate(tabla.schema):
+        if campo.name in categoricas and _tipo_texto_arrow(campo.type) is not None:
+            tabla = tabla.set_column(i, campo.name, tabla.column(i).dictionary_encode())
+    return tabla.to_pandas(
+        types_mapper=_tipo_texto_arrow if config.INGESTA_TEXTO_ARROW else None, split_blocks=sin_copia
+    )
+
+
+def dataset_arrow(file_location, manifiesto=None):
+    """
+    Dataset de Arrow sobre la base y los segmentos anexados (memory mapping):
+    permite proyectar columnas y filtrar filas al leer (ver services/filtros).
+    """
+    manifiesto = manifiesto or leer_manifiesto(file_location)
+    directorio = os.path.dirname(file_location)
+    rutas = [ruta_columnar(file_location)] + [
+        os.path.join(directorio, s["archivo"]) for s in manifiesto.get("segmentos", [])
+    ]
+    return ds.dataset(rutas, format="ipc", filesystem=pafs.LocalFileSystem(use_mmap=True))
+
+
+def leer_columnar(file_location, columnas=None, sin_copia=False, filtros=None):
+    """
+    Lee el dataset columnar (base y segmentos anexados) con memory mapping.
+    Si se indican `columnas`, solo se leen esas (las que no existan en el archivo se ignoran).
+    `sin_copia`: ver `a_pandas`. `filtros`: condiciones de services/filtros, evaluadas
+    en Arrow antes de pasar a pandas.
+    """
+    manifiesto = leer_manifiesto(file_location)
+    if columnas is not None:
+        disponibles = {c["nombre"] for c in manifiesto["columnas"]}
+        columnas = [c for c in dict.fromkeys(columnas) if c in disponibles]
+
+    if filtros:
+        datos = dataset_arrow(file_location, manifiesto)
+        tabla = datos.to_table(columns=columnas, filter=filtros_filas.expresion(filtros, datos.schema))
+        return a_pandas(tabla, manifiesto, sin_copia)
+
+    tabla = feather.read_table(ruta_columnar(file_location), columns=columnas, memory_map=True)
+    if manifiesto.get("segmentos"):
+        directorio = os.path.dirname(file_location)
+        tablas = [tabla] + [
+            feather.read_table(os.path.join(directorio, s["archivo"]), columns=columnas, memory_map=True)
+            for s in manifiesto["segmentos"]
+        ]
+        tabla = pa.concat_tables(tablas)
+    return a_pandas(tabla, manifiesto, sin_copia)
+
+
+def eliminar_columnar(file_location):
+    _eliminar_archivos(_segmentos(file_location) + [ruta_columnar(file_location), ruta_manifiesto(file_location)])
@@ -0,0 +1,73 @@
+import functools
+import re
+from collections import Counter
+
+from app.core import config
+from app.services import executor
+
+# Frecuencia de palabras y n-gramas para la nube de palabras.
+# En vez de unir toda la columna en un solo string, los textos se cuentan por
+# porciones (memoria acotada) y las porciones se reparten en el pool de
+# procesos; al final se suman los conteos en orden de porción.
+# Tokenización igual a la original: minúsculas, sin signos de puntuación,
+# palabras de al menos `min_longitud` letras y sin stopwords (que se quitan
+# antes de formar los n-gramas). Los empates se ordenan por primera aparición,
+# como en Counter.most_common.
+# (CountVectorizer resultó ~2.5x más lento que regex + Counter para este conteo.)
+
+# Stopwords básicas en español
+STOPWORDS_ES = frozenset({
+    'de', 'la', 'que', 'el', 'en', 'y', 'a', 'los', 'se', 'del', 'las', 'un', 'por', 'con', 'no', 'una', 'su',
+    'para', 'es', 'al', 'lo', 'como', 'mas', 'pero', 'sus', 'le', 'ya', 'o',
+})
+PATRON_PUNTUACION = re.compile(r"[^\w\s]")
+
+
+def lista_stopwords(extra=()):
+    """
+    Stopwords básicas + las del servidor (NLP_STOPWORDS_EXTRA) + las del request.
+    """
+    return STOPWORDS_ES | config.NLP_STOPWORDS_EXTRA | {str(p).strip().lower() for p in extra}
+
+
+def _preprocesar(texto):
+    return PATRON_PUNTUACION.sub("", texto.lower())
+
+
+def contar_porcion(textos, ngramas=1, stopwords=STOPWORDS_ES, min_longitud=3):
+    """
+    Conteo de términos de una porción de textos (Counter en orden de primera aparición).
+    """
+    if ngramas == 1:
+        # Un solo pase de regex sobre la porción; el espacio entre textos evita unir palabras
+        palabras = _preprocesar(" ".join(textos)).split()
+        return Counter([p for p in palabras if len(p) >= min_longitud and p not in stopwords])
+
+    conteo = Counter()
+    for texto in textos:
+        palabras = [p for p in _preprocesar(texto).split() if len(p) >= min_longitud and p not in stopwords]
+        conteo.update(" ".join(grupo) for grupo in zip(*(palabras[k:] for k in range(ngramas))))
+    return conteo
+
+
+def frecuencias(textos, top_n=50, ngramas=1, stopwords=STOPWORDS_ES, min_longitud=3):
+    """
+    Los `top_n` términos más frecuentes de la Series `textos`, como lista de (término, frecuencia).
+    """
+    if ngramas not in (1, 2, 3):
+        raise ValueError("ngramas debe ser 1, 2 o 3.")
+    textos = textos.astype(str).tolist()
+    filas = config.NLP_FILAS_POR_PORCION
+    porciones = [textos[i:i + filas] for i in range(0, len(textos), filas)]
+    contar = functools.partial(contar_porcion, ngramas=ngramas, stopwords=frozenset(stopwords), min_longitud=min_longitud)
+
+    if len(porciones) <= 1 or config.EJECUTOR_PROCESOS <= 1:
+        # Con un solo proceso de trabajo repartir solo suma el costo de enviar los textos
+        parciales = [contar(p) for p in porciones]
+    else:
+        parciales = executor.mapear_en_procesos(contar, porciones)
+
+    total = Counter()
+    for parcial in parciales:
+        total.update(parcial)
+    return total.most_common(top_n)
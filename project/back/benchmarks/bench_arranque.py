@@ -0,0 +1,127 @@
+"""
+Benchmark del arranque de la API.
+
+En un proceso nuevo por repetición mide:
+
+    import_s            import app.main (lo que paga cada worker de uvicorn al iniciar)
+    primera_respuesta_s inicio de la aplicación (lifespan) + primer GET /api/v1/health
+    rss_mb              memoria residente después de la primera respuesta
+    modulos_pesados     cuáles de scikit-learn, scipy, statsmodels, TextBlob y DuckDB quedaron cargados
+
+Con --precalentar se arranca con ARRANQUE_PRECALENTAR=1 y además se mide cuánto
+tarda el precalentamiento en segundo plano y la memoria al terminar.
+
+El proceso termina con código 1 si la mediana supera el presupuesto
+(--max-import-s, --max-rss-mb) o si alguna librería pesada se carga al importar
+la aplicación (deben cargarse solo en la herramienta que las usa).
+
+El mismo presupuesto lo verifica tests/test_arranque.py (python -m pytest).
+
+Uso (desde project/back):
+    python -m benchmarks.bench_arranque
+    python -m benchmarks.bench_arranque --repeticiones 5 --max-import-s 1.5 --max-rss-mb 200
+    python -m benchmarks.bench_arranque --precalentar --salida arranque.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+MODULOS_PESADOS = ("sklearn", "scipy", "statsmodels", "textblob", "nltk", "duckdb")
+# Presupuesto por defecto (mediana)
+MAX_IMPORT_S = 1.5
+MAX_RSS_MB = 175
+
+# Corre en el proceso hijo; imprime un JSON con las mediciones
+MEDICION = """
+import json, sys, time
+inicio = time.perf_counter()
+import app.main
+import_s = time.perf_counter() - inicio
+modulos = [m for m in {modulos!r} if m in sys.modules]
+
+from fastapi.testclient import TestClient
+from app.services import calentamiento, metrics
+with TestClient(app.main.app) as cliente:
+    inicio = time.perf_counter()
+    cliente.get("/api/v1/health").raise_for_status()
+    primera_respuesta_s = import_s + time.perf_counter() - inicio
+    rss = metrics.memoria_rss()[0]
+    resultado = {{
+        "import_s": import_s,
+        "primera_respuesta_s": primera_respuesta_s,
+        "rss_mb": rss / 1024 / 1024 if rss else None,
+        "modulos_pesados": modulos,
+    }}
+    if {precalentar!r}:
+        while calentamiento.estado()["estado"] not in ("completado", "error"):
+            time.sleep(0.05)
+        rss = metrics.memoria_rss()[0]
+        resultado["precalentamiento"] = calentamiento.estado()
+        resultado["rss_precalentado_mb"] = rss / 1024 / 1024 if rss else None
+print(json.dumps(resultado))
+"""
+
+
+def medir(precalentar):
+    entorno = dict(os.environ, ARRANQUE_PRECALENTAR="1" if precalentar else "0")
+    proceso = subprocess.run(
+        [sys.executable, "-c", MEDICION.format(modulos=MODULOS_PESADOS, precalentar=precalentar)],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        env=entorno, capture_output=True, text=True, check=True,
+    )
+    return json.loads(proceso.stdout.strip().splitlines()[-1])
+
+
+def resumir(corridas, clave):
+    valores = [c[clave] for c in corridas if c.get(clave) is not None]
+    if not valores:
+        return None
+    return {"p50": statistics.median(valores), "min": min(valores), "max": max(valores)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--precalentar", action="store_true", help="arrancar con ARRANQUE_PRECALENTAR=1")
+    parser.add_argument("--max-import-s", type=float, default=MAX_IMPORT_S, help="presupuesto de la mediana de import_s")
+    parser.add_argument("--max-rss-mb", type=float, default=MAX_RSS_MB, help="presupuesto de la mediana de rss_mb")
+    parser.add_argument("--salida", help="JSON con las corridas y el resumen")
+    args = parser.parse_args()
+
+    corridas = [medir(args.precalentar) for _ in range(args.repeticiones)]
+    resumen = {
+        clave: resumir(corridas, clave)
+        for clave in ("import_s", "primera_respuesta_s", "rss_mb", "rss_precalentado_mb")
+    }
+    if args.precalentar:
+        resumen["precalentamiento_s"] = resumir([c["precalentamiento"] for c in corridas], "segundos")
+
+    for clave, valores in resumen.items():
+        if valores is not None:
+            print(f"{clave:<22} p50 {valores['p50']:9.3f}   min {valores['min']:9.3f}   max {valores['max']:9.3f}")
+
+    fallas = []
+    if resumen["import_s"]["p50"] > args.max_import_s:
+        fallas.append(f"import_s {resumen['import_s']['p50']:.3f} > {args.max_import_s}")
+    if resumen["rss_mb"] is not None and resumen["rss_mb"]["p50"] > args.max_rss_mb:
+        fallas.append(f"rss_mb {resumen['rss_mb']['p50']:.1f} > {args.max_rss_mb}")
+    pesados = sorted({m for c in corridas for m in c["modulos_pesados"]})
+    if pesados:
+        fallas.append(f"librerías pesadas cargadas al importar la aplicación: {', '.join(pesados)}")
+
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump({"corridas": corridas, "resumen": resumen, "fallas": fallas}, f, ensure_ascii=False, indent=2)
+        print(f"\nResultados en {args.salida}")
+
+    for falla in fallas:
+        print(f"FUERA DE PRESUPUESTO: {falla}")
+    if fallas:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Benchmark de limpieza de valores formateados ("$1,234.5 B").
+
+Compara la limpieza celda por celda (implementación original con
+`apply(extraer_metadata_valor)`) contra la versión vectorizada de
+`ingestion.limpiar_dataframe`, verificando que ambas den el mismo resultado.
+
+Uso (desde project/back):
+    python -m benchmarks.bench_limpieza --filas 100000 1000000
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from app.services import ingestion
+
+RAIZ_REPO = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".."))
+ARCHIVOS_MUESTRA = [
+    os.path.join(RAIZ_REPO, "Top_2000_Companies_Financial_Data_2024.csv"),
+    os.path.join(RAIZ_REPO, "GRAN_EMPRESA_2024_MANUFACTURA.csv"),
+]
+
+
+def limpiar_dataframe_por_celda(df):
+    """
+    Implementación original (una llamada a extraer_metadata_valor por celda),
+    conservada como referencia para el benchmark.
+    """
+    columnas_nuevas = {}
+    for col in df.columns:
+        if df[col].dtype == 'object':
+            muestra = df[col].dropna().head(10).astype(str)
+            patron_numerico = r'^[\$€£¥]?\s*[\d,]+\.?\d*\s*[BMK%]?$'
+            coincidencias = muestra.str.upper().str.match(patron_numerico).sum()
+            if len(muestra) > 0 and coincidencias / len(muestra) > 0.5:
+                resultados = df[col].apply(ingestion.extraer_metadata_valor)
+                valores = [r[0] for r in resultados]
+                monedas = [r[1] for r in resultados]
+                sufijos = [r[2] for r in resultados]
+                df[col] = valores
+                try:
+                    df[col] = pd.to_numeric(df[col])
+                except (ValueError, TypeError):
+                    pass
+                if any(m is not None for m in monedas):
+                    columnas_nuevas[f"{col}_moneda"] = monedas
+                if any(s is not None for s in sufijos):
+                    columnas_nuevas[f"{col}_escala"] = sufijos
+    for nombre_col, valores in columnas_nuevas.items():
+        df[nombre_col] = valores
+    return df
+
+
+def generar_formateados(filas, semilla=42):
+    """
+    DataFrame sintético con columnas tipo "$252.9 B", "€1,070 M", "12.5%" y texto.
+    """
+    rng = np.random.default_rng(semilla)
+    numeros = rng.gamma(2.0, 150.0, filas).round(1)
+    simbolos = rng.choice(["$", "€", "£", "¥", ""], filas)
+    escalas = rng.choice(["B", "M", "K", ""], filas)
+    montos = [f"{s}{n:,} {e}".strip() for s, n, e in zip(simbolos, numeros, escalas)]
+    montos = np.array(montos, dtype=object)
+    montos[rng.random(filas) < 0.01] = np.nan
+    montos[rng.random(filas) < 0.005] = "N/D"
+    return pd.DataFrame({
+        "Monto": montos,
+        "Margen": [f"{p}%" for p in rng.uniform(-5, 40, filas).round(2)],
+        "Pais": rng.choice(["Peru", "Chile", "Mexico", "Colombia"], filas),
+    })
+
+
+def cronometrar(funcion, df, repeticiones):
+    tiempos = []
+    resultado = None
+    for _ in range(repeticiones):
+        copia = df.copy()
+        inicio = time.perf_counter()
+        resultado = funcion(copia)
+        tiempos.append(time.perf_counter() - inicio)
+    return min(tiempos), resultado
+
+
+def comparar(nombre, df, repeticiones):
+    t_celda, esperado = cronometrar(limpiar_dataframe_por_celda, df, repeticiones)
+    t_vector, obtenido = cronometrar(ingestion.limpiar_dataframe, df, repeticiones)
+    pd.testing.assert_frame_equal(obtenido, esperado)
+    print(f"{nombre:<45} filas={len(df):>9,}  por_celda={t_celda:8.3f}s  "
+          f"vectorizado={t_vector:8.3f}s  aceleracion={t_celda / t_vector:6.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filas", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeticiones", type=int, default=3)
+    args = parser.parse_args()
+
+    for ruta in ARCHIVOS_MUESTRA:
+        if os.path.exists(ruta):
+            comparar(os.path.basename(ruta), ingestion.leer_archivo(ruta), args.repeticiones)
+
+    for filas in args.filas:
+        comparar("sintético", generar_formateados(filas), args.repeticiones)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Benchmark de serialización de respuestas de análisis.
+
+Compara el camino por defecto de FastAPI (`jsonable_encoder` + `json.dumps`
+de JSONResponse) contra `app.api.responses.serializar` (orjson con soporte
+numpy) sobre respuestas grandes: `plot_data` de k-means y heatmaps de
+correlación, en formato heatmap y compacto. Verifica que ambos JSON sean
+equivalentes.
+
+Uso (desde project/back):
+    python -m benchmarks.bench_serializacion --puntos 10000 100000 --variables 100 300
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+import pandas as pd
+from fastapi.encoders import jsonable_encoder
+
+from app.api.responses import serializar
+from app.services import quantitative
+
+
+def respuesta_kmeans(puntos, semilla=42):
+    """
+    Respuesta con la forma de `unsupervised_kmeans`: plot_data con escalares numpy.
+    """
+    rng = np.random.default_rng(semilla)
+    x = rng.normal(size=puntos)
+    y = rng.normal(size=puntos)
+    clusters = rng.integers(0, 5, puntos)
+    return {
+        "centroides": rng.normal(size=(5, 2)).tolist(),
+        "perfil_promedio": {"x": {i: float(x[clusters == i].mean()) for i in range(5)}},
+        "plot_data": [
+            {"x": xi, "y": yi, "c": int(ci)}
+            for xi, yi, ci in zip(x.astype(np.float64), y.astype(np.float64), clusters)
+        ],
+    }
+
+
+def respuesta_correlacion(variables, formato, semilla=42):
+    rng = np.random.default_rng(semilla)
+    df = pd.DataFrame(rng.normal(size=(500, variables)), columns=[f"v{i}" for i in range(variables)])
+    return quantitative.descriptivo_correlacion(df, formato)
+
+
+def por_defecto(contenido):
+    # Lo que hace FastAPI con un dict retornado por el endpoint
+    return json.dumps(
+        jsonable_encoder(contenido), ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def cronometrar(funcion, contenido, repeticiones):
+    tiempos = []
+    resultado = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion(contenido)
+        tiempos.append(time.perf_counter() - inicio)
+    return min(tiempos), resultado
+
+
+def comparar(nombre, contenido, repeticiones):
+    t_defecto, esperado = cronometrar(por_defecto, contenido, repeticiones)
+    t_orjson, obtenido = cronometrar(serializar, contenido, repeticiones)
+    assert json.loads(obtenido) == json.loads(esperado)
+    print(f"{nombre:<35} tamaño={len(obtenido) / 1024:9,.0f} KB  jsonable_encoder={t_defecto:8.3f}s  "
+          f"orjson={t_orjson:8.3f}s  aceleracion={t_defecto / t_orjson:6.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--puntos", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--variables", type=int, nargs="+", default=[100, 300])
+    parser.add_argument("--repeticiones", type=int, default=3)
+    args = parser.parse_args()
+
+    for puntos in args.puntos:
+        comparar(f"kmeans plot_data ({puntos:,} puntos)", respuesta_kmeans(puntos), args.repeticiones)
+
+    for variables in args.variables:
+        for formato in ("heatmap", "compacto"):
+            comparar(f"correlacion {formato} ({variables} vars)", respuesta_correlacion(variables, formato), args.repeticiones)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,354 @@
+"""
+Suite de benchmarks de todas las herramientas de análisis.
+
+Genera datasets sintéticos del tamaño pedido (columnas con formato "$1,234.5 B",
+porcentajes, fechas, categorías de cardinalidad configurable, texto libre y
+columnas numéricas extra) y cronometra cada etapa:
+
+    subida        ingestion.procesar_archivo (copia, limpieza, columnar, perfil)
+    lectura_csv   ingestion.leer_archivo
+    limpieza      ingestion.limpiar_dataframe
+    carga         storage.leer_columnar (sin caché) y cargar_dataset (caché caliente)
+    pareto        statistics.calcular_pareto (completo, top_n sobre Empresa y ponderado por Ventas)
+    <herramienta> cada rama de analysis.ejecutar_herramienta (la que usa /analizar/cuantitativo)
+
+Por etapa reporta percentiles de latencia, pico de memoria (tracemalloc, en una
+corrida aparte para no distorsionar los tiempos) y throughput, y lo escribe en
+JSON. Con --comparar se contrasta contra un JSON anterior y el proceso termina
+con código 1 si alguna etapa empeoró más que --tolerancia.
+
+Trabaja en un directorio temporal (data/ y modelos propios): no toca los
+datasets subidos.
+
+Uso (desde project/back):
+    python -m benchmarks.bench_suite --filas 10000 100000 --salida bench.json
+    python -m benchmarks.bench_suite --filas 1000000 --herramientas resumen pivot_table kmeans
+    python -m benchmarks.bench_suite --filas 100000 --comparar bench.json --tolerancia 0.2
+"""
+import argparse
+import datetime
+import functools
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+from app.core import config
+from app.schemas.analysis import AnalisisRequest
+from app.services import analysis, executor, ingestion, sentiment, statistics, storage
+from app.services.cache import dataset_cache
+
+ARCHIVO = "bench.csv"
+
+PALABRAS = [
+    "good", "great", "excellent", "bad", "poor", "terrible", "growth", "loss", "market", "profit",
+    "bank", "energy", "services", "group", "holdings", "industrial", "strong", "weak", "stable", "new",
+    "ventas", "clientes", "mercado", "entrega", "calidad", "precio", "servicio", "producto", "retraso", "fallo",
+]
+
+# (tipo_analisis, columnas_x, columna_y, parametros) sobre las columnas de `generar_dataset`
+HERRAMIENTAS = {
+    "resumen": (["Ventas", "Activos", "Empleados", "Puntaje"], "", {}),
+    "frecuencias": (["Pais"], "", {}),
+    "correlacion": ([], "", {}),
+    "outliers": (["Puntaje"], "", {}),
+    "ttest": (["Puntaje"], "Segmento", {}),
+    "anova": (["Puntaje"], "Sector", {}),
+    "regresion_lineal": (["Activos", "Empleados", "Sector"], "Ventas", {}),
+    "regresion_logistica": (["Activos", "Empleados"], "Segmento", {}),
+    "arbol_decision": (["Activos", "Empleados"], "Ventas", {}),
+    "kmeans": (["Activos", "Puntaje"], "", {"n_clusters": 4}),
+    "nube_palabras": ([], "Comentario", {}),
+    "sentimiento": ([], "Comentario", {}),
+    "random_forest": (["Activos", "Empleados", "Puntaje"], "Ventas", {"algoritmo": "auto"}),
+    "descomposicion_serie": (["Fecha"], "Ventas", {"periodo": 12}),
+    "pivot_table": (["Segmento", "Ventas"], "Sector", {}),
+}
+
+
+def _formatear_montos(valores, rng):
+    """
+    Montos como los de los archivos de muestra: "$252.9 B", "€1,070.0 M", "12.5 K".
+    """
+    simbolos = rng.choice(["$", "€", "£", ""], len(valores), p=[0.7, 0.1, 0.1, 0.1])
+    escalas = rng.choice([" B", " M", " K", ""], len(valores), p=[0.4, 0.4, 0.1, 0.1])
+    return simbolos.astype(object) + pd.Series(valores).map("{:,.1f}".format).to_numpy() + escalas.astype(object)
+
+
+def generar_dataset(filas, columnas_extra=0, cardinalidad=50, textos_unicos=5000, semilla=42):
+    """
+    DataFrame sintético (crudo, como llegaría en el CSV) con una columna por
+    tipo de dato que usan las herramientas.
+    """
+    rng = np.random.default_rng(semilla)
+    activos = rng.gamma(2.0, 150.0, filas).round(1)
+    ventas = (activos * rng.uniform(0.2, 1.5, filas)).round(1)
+
+    # Países con distribución de Zipf: pocos concentran la mayoría (Pareto con sentido)
+    pesos = 1 / np.arange(1, cardinalidad + 1)
+    paises = np.array([f"Pais {i:03d}" for i in range(cardinalidad)], dtype=object)
+    frases = np.array([
+        " ".join(rng.choice(PALABRAS, rng.integers(3, 9))) for _ in range(min(textos_unicos, filas))
+    ], dtype=object)
+    dias = pd.Timestamp("2015-01-01") + pd.to_timedelta(rng.integers(0, 3650, filas), unit="D")
+
+    df = pd.DataFrame({
+        "Empresa": "Empresa " + pd.Series(np.arange(filas)).astype(str),
+        "Pais": paises[rng.choice(cardinalidad, filas, p=pesos / pesos.sum())],
+        "Sector": rng.choice([f"Sector {i}" for i in range(12)], filas),
+        "Segmento": rng.choice(["Pyme", "Corporativo"], filas, p=[0.7, 0.3]),
+        "Fecha": dias.strftime("%Y-%m-%d"),
+        "Ventas": _formatear_montos(ventas, rng),
+        "Activos": _formatear_montos(activos, rng),
+        "Margen": pd.Series(rng.uniform(-5, 40, filas).round(2)).astype(str).to_numpy() + "%",
+        "Empleados": rng.integers(1, 50_000, filas),
+        "Puntaje": rng.normal(50, 15, filas).round(3),
+        "Comentario": frases[rng.integers(0, len(frases), filas)],
+    })
+    for i in range(columnas_extra):
+        df[f"x{i + 1}"] = rng.normal(size=filas)
+    # Huecos como en los datos reales
+    for col in ("Ventas", "Puntaje", "Comentario"):
+        df.loc[rng.random(filas) < 0.01, col] = np.nan
+    return df
+
+
+def resumir(tiempos, filas=None, bytes_entrada=None):
+    tiempos = np.asarray(tiempos)
+    p50 = float(np.percentile(tiempos, 50))
+    resumen = {
+        "repeticiones": len(tiempos),
+        "min_s": float(tiempos.min()),
+        "p50_s": p50,
+        "p90_s": float(np.percentile(tiempos, 90)),
+        "p95_s": float(np.percentile(tiempos, 95)),
+        "p99_s": float(np.percentile(tiempos, 99)),
+        "max_s": float(tiempos.max()),
+        "media_s": float(tiempos.mean()),
+    }
+    if filas is not None and p50 > 0:
+        resumen["filas_por_s"] = filas / p50
+    if bytes_entrada is not None and p50 > 0:
+        resumen["mb_por_s"] = bytes_entrada / 1024 / 1024 / p50
+    return resumen
+
+
+def medir(funcion, preparar, repeticiones, memoria=True):
+    """
+    Corre `funcion(preparar())` `repeticiones` veces (preparar no se cronometra)
+    y, si `memoria`, una vez más bajo tracemalloc para el pico de memoria.
+    Retorna (tiempos, pico_mb o None, último resultado).
+    """
+    tiempos = []
+    resultado = None
+    for _ in range(repeticiones):
+        argumento = preparar()
+        inicio = time.perf_counter()
+        resultado = funcion(argumento)
+        tiempos.append(time.perf_counter() - inicio)
+    if not memoria:
+        return tiempos, None, resultado
+
+    argumento = preparar()
+    tracemalloc.start()
+    try:
+        funcion(argumento)
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return tiempos, pico / 1024 / 1024, resultado
+
+
+def medir_etapa(resultados, nombre, funcion, preparar, repeticiones, filas=None, bytes_entrada=None, memoria=True):
+    try:
+        tiempos, pico_mb, resultado = medir(funcion, preparar, repeticiones, memoria)
+    except Exception as e:
+        resultados[nombre] = {"error": f"{type(e).__name__}: {e}"}
+        print(f"  {nombre:<22} ERROR {e}")
+        return None
+    resultados[nombre] = {**resumir(tiempos, filas, bytes_entrada), "memoria_pico_mb": pico_mb}
+    if isinstance(resultado, dict) and "error" in resultado:
+        # Error de validación de la herramienta: el tiempo medido no es el del análisis
+        resultados[nombre]["error_validacion"] = str(resultado["error"])
+    print(f"  {nombre:<22} p50={resultados[nombre]['p50_s']:9.4f}s  p95={resultados[nombre]['p95_s']:9.4f}s"
+          + (f"  pico={pico_mb:9.1f} MB" if pico_mb is not None else ""))
+    return resultado
+
+
+def subir(ruta):
+    with open(ruta, "rb") as f:
+        return ingestion.procesar_archivo(SimpleNamespace(filename=ARCHIVO, file=f))
+
+
+def correr_tamano(filas, args):
+    print(f"\n== {filas:,} filas ==")
+    inicio = time.perf_counter()
+    crudo = generar_dataset(filas, args.columnas, args.cardinalidad, args.textos_unicos)
+    ruta = os.path.join(ingestion.UPLOAD_DIR, f"fuente-{ARCHIVO}")
+    crudo.to_csv(ruta, index=False)
+    generacion_s = time.perf_counter() - inicio
+    tamano = os.path.getsize(ruta)
+    del crudo
+
+    etapas = {}
+    etapa = functools.partial(medir_etapa, etapas, memoria=not args.sin_memoria)
+    sin_preparar = lambda: None  # noqa: E731
+    etapa("subida", lambda _: subir(ruta), sin_preparar, args.repeticiones_ingesta, filas, tamano)
+    crudo = etapa("lectura_csv", lambda _: ingestion.leer_archivo(ruta), sin_preparar,
+                  args.repeticiones_ingesta, filas, tamano)
+    if crudo is not None:
+        etapa("limpieza", ingestion.limpiar_dataframe, crudo.copy, args.repeticiones_ingesta, filas)
+        del crudo
+
+    file_location = ingestion.ruta_dataset(ARCHIVO)
+    etapa("carga_columnar", lambda _: storage.leer_columnar(file_location), sin_preparar,
+          args.repeticiones, filas)
+    dataset_cache.limpiar()
+    ingestion.cargar_dataset(ARCHIVO)
+    etapa("carga_cache", lambda _: ingestion.cargar_dataset(ARCHIVO), sin_preparar, args.repeticiones, filas)
+
+    columna_pareto = storage.leer_columnar(file_location, ["Pais"])
+    etapa("pareto", lambda df: statistics.calcular_pareto(df, "Pais"), lambda: columna_pareto,
+          args.repeticiones, filas)
+    # Una categoría por fila (como los nombres de empresa de Top_2000): todo el ranking vs top_n + otros
+    columnas_pareto = storage.leer_columnar(file_location, ["Empresa", "Pais", "Ventas"])
+    etapa("pareto_empresas", lambda df: statistics.calcular_pareto(df, "Empresa"),
+          lambda: columnas_pareto, args.repeticiones, filas)
+    etapa("pareto_top_n", lambda df: statistics.calcular_pareto(df, "Empresa", top_n=20),
+          lambda: columnas_pareto, args.repeticiones, filas)
+    etapa("pareto_ponderado", lambda df: statistics.calcular_pareto(df, "Pais", "Ventas"),
+          lambda: columnas_pareto, args.repeticiones, filas)
+
+    for tool in args.herramientas:
+        columnas_x, columna_y, parametros = HERRAMIENTAS[tool]
+        request = AnalisisRequest(
+            filename=ARCHIVO, tipo_analisis=tool, columnas_x=columnas_x, columna_y=columna_y, parametros=parametros
+        )
+        df = storage.leer_columnar(file_location, analysis.columnas_requeridas(request))
+
+        def preparar(df=df):
+            # Corridas en frío: sin polaridades de la corrida anterior
+            sentiment.cache_polaridad.limpiar()
+            return df
+
+        etapa(tool, lambda datos, request=request: analysis.ejecutar_herramienta(datos, request),
+              preparar, args.repeticiones, filas)
+
+    return {
+        "filas": filas,
+        "columnas": len(storage.leer_manifiesto(file_location)["columnas"]),
+        "csv_mb": tamano / 1024 / 1024,
+        "generacion_s": generacion_s,
+        "etapas": etapas,
+    }
+
+
+def entorno():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    import pyarrow
+    import sklearn
+    return {
+        "commit": commit,
+        "python": sys.version.split()[0],
+        "plataforma": platform.platform(),
+        "cpus": os.cpu_count(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "pyarrow": pyarrow.__version__,
+        "sklearn": sklearn.__version__,
+    }
+
+
+def comparar(actual, base, tolerancia, minimo_s):
+    """
+    Etapas cuyo p50 empeoró más que `tolerancia` (proporción) respecto de `base`.
+    Se ignoran las etapas más rápidas que `minimo_s` en la base (ruido).
+    """
+    anteriores = {r["filas"]: r["etapas"] for r in base["resultados"]}
+    regresiones = []
+    for resultado in actual["resultados"]:
+        for nombre, medida in resultado["etapas"].items():
+            previa = anteriores.get(resultado["filas"], {}).get(nombre)
+            if not previa or "p50_s" not in previa or "p50_s" not in medida or previa["p50_s"] < minimo_s:
+                continue
+            cambio = medida["p50_s"] / previa["p50_s"] - 1
+            if cambio > tolerancia:
+                regresiones.append({
+                    "filas": resultado["filas"], "etapa": nombre,
+                    "p50_base_s": previa["p50_s"], "p50_s": medida["p50_s"], "cambio": cambio,
+                })
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filas", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--columnas", type=int, default=0, help="columnas numéricas extra (x1, x2...)")
+    parser.add_argument("--cardinalidad", type=int, default=50, help="valores distintos de la columna Pais")
+    parser.add_argument("--textos-unicos", type=int, default=5000, help="frases distintas de la columna Comentario")
+    parser.add_argument("--herramientas", nargs="+", choices=list(HERRAMIENTAS), default=list(HERRAMIENTAS))
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--repeticiones-ingesta", type=int, default=3)
+    parser.add_argument("--sin-memoria", action="store_true",
+                        help="omitir la corrida bajo tracemalloc (más rápido en datasets grandes)")
+    parser.add_argument("--salida", default="bench_suite.json")
+    parser.add_argument("--comparar", help="JSON de una corrida anterior")
+    parser.add_argument("--tolerancia", type=float, default=0.2, help="empeoramiento permitido del p50 (0.2 = 20%%)")
+    parser.add_argument("--minimo-s", type=float, default=0.005, help="no comparar etapas más rápidas que esto")
+    args = parser.parse_args()
+
+    salida = os.path.abspath(args.salida)
+    base = None
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            base = json.load(f)
+
+    # Se trabaja en un directorio temporal, aunque DATA_DIR/MODELOS_DIR apunten a otro lado
+    original = os.getcwd()
+    temporal = tempfile.mkdtemp(prefix="bench-suite-")
+    os.chdir(temporal)
+    ingestion.UPLOAD_DIR = "data"
+    config.MODELOS_DIR = os.path.join("data", "modelos")
+    os.makedirs(ingestion.UPLOAD_DIR, exist_ok=True)
+    try:
+        reporte = {
+            "fecha": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "entorno": entorno(),
+            "parametros": {k: v for k, v in vars(args).items() if k not in ("salida", "comparar")},
+            "resultados": [correr_tamano(filas, args) for filas in args.filas],
+        }
+    finally:
+        os.chdir(original)
+        shutil.rmtree(temporal, ignore_errors=True)
+        executor.cerrar()
+
+    if base is not None:
+        reporte["regresiones"] = comparar(reporte, base, args.tolerancia, args.minimo_s)
+        for r in reporte["regresiones"]:
+            print(f"REGRESIÓN {r['etapa']} ({r['filas']:,} filas): "
+                  f"{r['p50_base_s']:.4f}s -> {r['p50_s']:.4f}s (+{r['cambio']:.0%})")
+
+    with open(salida, "w", encoding="utf-8") as f:
+        json.dump(reporte, f, ensure_ascii=False, indent=2)
+    print(f"\nResultados en {salida}")
+    if base is not None and reporte["regresiones"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+"""
+Fixtures comunes: cada sesión de pruebas usa su propio directorio de datos
+(DATA_DIR se lee al importar app.core.config, antes de importar la app).
+"""
+import io
+import os
+import tempfile
+
+os.environ.setdefault("DATA_DIR", tempfile.mkdtemp(prefix="analisis-tests-"))
+
+import pytest  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def cliente():
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+
+    with TestClient(app) as cliente:
+        yield cliente
+
+
+@pytest.fixture
+def subir(cliente):
+    """
+    Sube `df` como CSV con el nombre dado y retorna la respuesta de /upload.
+    """
+    def subir(nombre, df):
+        contenido = io.BytesIO()
+        df.to_csv(contenido, index=False)
+        return cliente.post("/api/v1/upload", files={"file": (nombre, contenido.getvalue(), "text/csv")})
+
+    return subir
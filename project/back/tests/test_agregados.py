@@ -0,0 +1,105 @@
+"""
+Datasets con filas anexadas: los análisis incrementales (calculados desde los
+agregados con solo las filas nuevas) coinciden con subir el archivo completo.
+"""
+import io
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services import analysis
+
+ANALISIS = "/api/v1/analizar/cuantitativo"
+
+
+def _porcion(semilla, filas):
+    azar = np.random.default_rng(semilla)
+    return pd.DataFrame({
+        "region": azar.choice(["norte", "sur", "este", "oeste"], size=filas),
+        "canal": azar.choice(["web", "tienda"], size=filas),
+        "ventas": azar.gamma(2.0, 100.0, size=filas).round(2),
+        "costo": azar.normal(50, 10, size=filas).round(2),
+    })
+
+
+def _csv(df):
+    contenido = io.BytesIO()
+    df.to_csv(contenido, index=False)
+    return contenido.getvalue()
+
+
+def _cerca(a, b, camino="resultado"):
+    if isinstance(a, dict):
+        assert isinstance(b, dict) and set(a) == set(b), camino
+        for clave in a:
+            _cerca(a[clave], b[clave], f"{camino}.{clave}")
+    elif isinstance(a, list):
+        assert isinstance(b, list) and len(a) == len(b), camino
+        for i, (x, y) in enumerate(zip(a, b)):
+            _cerca(x, y, f"{camino}[{i}]")
+    elif isinstance(a, float) and isinstance(b, (int, float)):
+        assert (math.isnan(a) and math.isnan(b)) or b == pytest.approx(a, rel=1e-9, abs=1e-9), camino
+    else:
+        assert a == b, camino
+
+
+@pytest.fixture(scope="module")
+def datasets(cliente):
+    partes = [_porcion(1, 400), _porcion(2, 250), _porcion(3, 120)]
+    archivo = lambda nombre, df: {"file": (nombre, _csv(df), "text/csv")}
+    assert cliente.post("/api/v1/upload", files=archivo("anexado.csv", partes[0])).status_code == 200
+    for i, parte in enumerate(partes[1:]):
+        respuesta = cliente.post("/api/v1/datasets/anexado.csv/append", files=archivo(f"parte{i}.csv", parte))
+        assert respuesta.status_code == 200
+    assert respuesta.json()["rows"] == 770
+    completo = pd.concat(partes, ignore_index=True)
+    assert cliente.post("/api/v1/upload", files=archivo("completo.csv", completo)).status_code == 200
+    return "anexado.csv", "completo.csv"
+
+
+@pytest.mark.parametrize("request_base", [
+    {"tipo_analisis": "resumen", "columnas_x": ["ventas", "costo"]},
+    {"tipo_analisis": "frecuencias", "columnas_x": ["region"]},
+    {"tipo_analisis": "correlacion"},
+    {"tipo_analisis": "pivot_table", "columna_y": "region", "columnas_x": ["canal", "ventas"]},
+    {"tipo_analisis": "pivot_table", "columna_y": "region", "columnas_x": ["canal", "costo"], "parametros": {"aggfunc": "mean"}},
+])
+def test_analisis_incremental_igual_al_completo(monkeypatch, cliente, datasets, request_base):
+    incrementales = []
+
+    def espiar(request):
+        resultado = original(request)
+        incrementales.append(request.filename if resultado is not None else None)
+        return resultado
+
+    original = analysis.analizar_con_agregados
+    monkeypatch.setattr(analysis, "analizar_con_agregados", espiar)
+    anexado, completo = (
+        cliente.post(ANALISIS, json={"filename": nombre, **request_base}) for nombre in datasets
+    )
+    assert anexado.status_code == completo.status_code == 200
+    # El dataset anexado sale de los agregados; el completo, del cálculo sobre el DataFrame
+    assert incrementales == [datasets[0], None]
+    _cerca(anexado.json(), completo.json())
+
+
+@pytest.mark.parametrize("extra", [{}, {"top_n": 2}])
+def test_pareto_incremental_igual_al_completo(cliente, datasets, extra):
+    anexado, completo = (
+        cliente.post("/api/v1/analizar/pareto", json={"filename": nombre, "columna": "region", **extra}).json()
+        for nombre in datasets
+    )
+    _cerca(anexado, completo)
+
+
+def test_anexar_invalida_resultados_en_cache(cliente, subir):
+    subir("cache_anexo.csv", _porcion(4, 50))
+    request = {"filename": "cache_anexo.csv", "tipo_analisis": "resumen", "columnas_x": ["ventas"]}
+    assert cliente.post(ANALISIS, json=request).headers["X-Cache"] == "miss"
+    assert cliente.post(ANALISIS, json=request).headers["X-Cache"] == "hit"
+    cliente.post("/api/v1/datasets/cache_anexo.csv/append",
+                 files={"file": ("extra.csv", _csv(_porcion(5, 10)), "text/csv")})
+    respuesta = cliente.post(ANALISIS, json=request)
+    assert respuesta.headers["X-Cache"] == "miss"
@@ -0,0 +1,34 @@
+"""
+Presupuesto de arranque de la API (ver benchmarks/bench_arranque.py): cada worker
+de uvicorn paga `import app.main`, así que las librerías de modelos deben
+cargarse solo en la herramienta que las usa.
+"""
+import statistics
+
+import pytest
+
+from benchmarks import bench_arranque
+
+REPETICIONES = 3
+
+
+@pytest.fixture(scope="module")
+def corridas():
+    # Cada medición corre en un proceso nuevo: sys.modules limpio
+    return [bench_arranque.medir(precalentar=False) for _ in range(REPETICIONES)]
+
+
+def test_sin_librerias_pesadas_al_importar(corridas):
+    for corrida in corridas:
+        assert corrida["modulos_pesados"] == []
+
+
+def test_tiempo_de_import_dentro_del_presupuesto(corridas):
+    assert statistics.median(c["import_s"] for c in corridas) <= bench_arranque.MAX_IMPORT_S
+
+
+def test_memoria_dentro_del_presupuesto(corridas):
+    rss = [c["rss_mb"] for c in corridas if c["rss_mb"] is not None]
+    if not rss:
+        pytest.skip("RSS no disponible en esta plataforma")
+    assert statistics.median(rss) <= bench_arranque.MAX_RSS_MB
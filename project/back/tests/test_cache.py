@@ -0,0 +1,80 @@
+"""
+Cachés: DatasetCache (DataFrames por archivo y conjunto de columnas) y
+ResultCache (resultados por request y versión del dataset).
+"""
+import os
+
+import pandas as pd
+
+from app.services.cache import DatasetCache
+from app.services.result_cache import ResultCache
+
+ANALISIS = "/api/v1/analizar/cuantitativo"
+
+
+def _archivo(tmp_path, contenido="x"):
+    ruta = tmp_path / "datos.bin"
+    ruta.write_text(contenido)
+    return str(ruta)
+
+
+def test_orden_de_columnas_comparte_entrada(tmp_path):
+    ruta = _archivo(tmp_path)
+    cache = DatasetCache(max_bytes=10 * 1024 * 1024)
+    cargas = []
+
+    def cargar():
+        cargas.append(1)
+        return pd.DataFrame({"a": [1, 2], "b": [3, 4], "c": [5, 6]})[["a", "b"]]
+
+    primero = cache.obtener(ruta, cargar, ["a", "b"])
+    segundo = cache.obtener(ruta, cargar, ["b", "a"])
+    assert len(cargas) == 1
+    assert list(primero.columns) == ["a", "b"]
+    assert list(segundo.columns) == ["b", "a"]
+    assert cache.estadisticas()["entradas"] == 1
+
+
+def test_cada_lectura_es_una_copia(tmp_path):
+    ruta = _archivo(tmp_path)
+    cache = DatasetCache(max_bytes=10 * 1024 * 1024)
+    df = cache.obtener(ruta, lambda: pd.DataFrame({"a": [1, 2]}))
+    df.loc[0, "a"] = 99
+    assert cache.obtener(ruta, lambda: None)["a"].tolist() == [1, 2]
+
+
+def test_archivo_modificado_se_vuelve_a_cargar(tmp_path):
+    ruta = _archivo(tmp_path, "v1")
+    cache = DatasetCache(max_bytes=10 * 1024 * 1024)
+    cache.obtener(ruta, lambda: pd.DataFrame({"v": [1]}))
+    with open(ruta, "w") as f:
+        f.write("version 2")
+    os.utime(ruta, ns=(os.stat(ruta).st_atime_ns, os.stat(ruta).st_mtime_ns + 10**9))
+    assert cache.obtener(ruta, lambda: pd.DataFrame({"v": [2]}))["v"].tolist() == [2]
+
+
+def test_result_cache_expira_y_respeta_el_maximo():
+    cache = ResultCache(max_entradas=2, ttl_s=60)
+    for clave in ("a", "b", "c"):
+        cache.guardar(clave, {"clave": clave})
+    assert cache.obtener("a") is None  # expulsada (LRU)
+    assert cache.obtener("c") == {"clave": "c"}
+
+    vencida = ResultCache(max_entradas=2, ttl_s=-1)
+    vencida.guardar("a", {"clave": "a"})
+    assert vencida.obtener("a") is None
+
+
+def test_resultado_memoizado_por_version_del_dataset(cliente, subir):
+    request = {"filename": "memo.csv", "tipo_analisis": "resumen", "columnas_x": ["v"], "parametros": {"a": 1, "b": 2}}
+    subir("memo.csv", pd.DataFrame({"v": [1.0, 2.0, 3.0]}))
+    assert cliente.post(ANALISIS, json=request).headers["X-Cache"] == "miss"
+    # El orden de las claves de parametros no cambia la clave
+    mismo = {**request, "parametros": {"b": 2, "a": 1}}
+    assert cliente.post(ANALISIS, json=mismo).headers["X-Cache"] == "hit"
+
+    # Otro contenido con el mismo nombre: nueva versión, nuevo cálculo
+    subir("memo.csv", pd.DataFrame({"v": [10.0, 20.0, 30.0]}))
+    respuesta = cliente.post(ANALISIS, json=request)
+    assert respuesta.headers["X-Cache"] == "miss"
+    assert cliente.post(ANALISIS, json=request).json() == respuesta.json()
@@ -0,0 +1,99 @@
+"""
+Ingesta en streaming (INGESTA_STREAMING_MIN_MB=0, porciones chicas): el esquema
+se fija con la primera porción y se ensancha si una porción posterior trae
+valores que no entran, como lo habría tipado la lectura completa del CSV.
+"""
+import pandas as pd
+import pytest
+
+from app.core import config
+from app.services import ingestion, profiling
+
+FILAS = 3000
+PORCION = 1000
+
+
+@pytest.fixture
+def streaming(monkeypatch):
+    monkeypatch.setattr(config, "INGESTA_STREAMING_MIN_MB", 0)
+    monkeypatch.setattr(config, "INGESTA_CHUNK_FILAS", PORCION)
+
+
+def _datos():
+    df = pd.DataFrame({
+        "id": range(FILAS),
+        "entero": range(FILAS),
+        "numero": range(FILAS),
+        "activo": [i % 2 == 0 for i in range(FILAS)],
+    })
+    # Solo la última porción trae valores que el esquema de la primera no admite
+    df = df.astype({"entero": object, "numero": object, "activo": object})
+    df.loc[FILAS - 1, "entero"] = 0.5
+    df.loc[FILAS - 1, "numero"] = "sin dato"
+    df.loc[FILAS - 1, "activo"] = "maybe"
+    return df
+
+
+def test_porcion_posterior_ensancha_el_esquema(streaming, subir):
+    respuesta = subir("ensanchar.csv", _datos())
+    assert respuesta.status_code == 200
+    assert respuesta.json()["rows"] == FILAS
+
+    df = ingestion.cargar_dataset("ensanchar.csv")
+    assert df["entero"].dtype == "float64"
+    assert df["entero"].iloc[-1] == 0.5
+    assert df["entero"].iloc[1] == 1.0
+    assert df["numero"].iloc[-1] == "sin dato"
+    assert df["numero"].iloc[1] == "1"
+    assert df["activo"].iloc[-1] == "maybe"
+    assert df["activo"].iloc[0] == "True"
+
+
+def test_streaming_coincide_con_la_ingesta_completa(monkeypatch, streaming, subir):
+    subir("porciones.csv", _datos())
+    monkeypatch.setattr(config, "INGESTA_STREAMING_MIN_MB", 1024)
+    subir("completo.csv", _datos())
+
+    porciones = ingestion.cargar_dataset("porciones.csv")
+    completo = ingestion.cargar_dataset("completo.csv")
+    assert list(porciones.dtypes.astype(str)) == list(completo.dtypes.astype(str))
+    assert porciones["entero"].equals(completo["entero"])
+    assert porciones["numero"].iloc[-1] == completo["numero"].iloc[-1]
+
+    perfil = {c["nombre"]: c for c in ingestion.perfil_dataset("porciones.csv").a_dict()["columnas"]}
+    assert perfil["entero"]["tipo"] == "numerica"
+    assert perfil["entero"]["max"] == FILAS - 2
+    assert perfil["entero"]["filas"] == FILAS
+
+
+def test_csv_ilegible_responde_400(subir, cliente):
+    respuesta = cliente.post("/api/v1/upload", files={"file": ("vacio.csv", b"", "text/csv")})
+    assert respuesta.status_code == 400
+
+
+def test_csv_de_una_columna(subir):
+    respuesta = subir("una_columna.csv", pd.DataFrame({"v": [1.5, 2.5, 3.5]}))
+    assert respuesta.status_code == 200
+    assert ingestion.cargar_dataset("una_columna.csv")["v"].tolist() == [1.5, 2.5, 3.5]
+
+
+def test_montos_con_texto_en_una_porcion_posterior(streaming, subir):
+    # "$1,100.5 B" se limpia a número en la primera porción; "N/D" llega después
+    montos = [f"${i:,}.5 B" for i in range(FILAS)]
+    montos[-1] = "N/D"
+    df = pd.DataFrame({"empresa": [f"e{i}" for i in range(FILAS)], "ventas": montos})
+    assert subir("montos.csv", df).status_code == 200
+
+    perfil = {c["nombre"]: c for c in ingestion.perfil_dataset("montos.csv").a_dict()["columnas"]}
+    assert perfil["ventas"]["filas"] == FILAS
+    assert perfil["ventas"]["nulos"] == 0
+    assert ingestion.cargar_dataset("montos.csv")["ventas"].iloc[-1] == "N/D"
+
+
+def test_perfil_numerico_ignora_textos_en_min_max():
+    columna = profiling.PerfilColumna("ventas", "float64")
+    columna.actualizar(pd.Series([1100.5, 2.0]))
+    columna.actualizar(pd.Series([3.5, "N/D"], dtype=object))
+    assert (columna.minimo, columna.maximo) == (2.0, 1100.5)
+    assert columna.filas == 4
+    assert columna.cardinalidad == 4
@@ -0,0 +1,55 @@
+"""
+`limpiar_columna` (vectorizada) debe dar exactamente lo mismo que aplicar
+`extraer_metadata_valor` celda por celda, que es la limpieza original.
+"""
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services import ingestion
+
+CASOS = [
+    "$252.9 B", "$1,100.5 B", "€ 12 M", "£3.2K", "¥ 400", "15.3%", "-0.5", "+7", ".5", "5.", "1,234",
+    "12 k", "  $4,090.7 B  ", "$-3 M", "N/D", "n/a", "", "   ", "1e5", "\t$5", " 5", "$", "B", "M",
+    "1,2,3", "$$5", "5 B B", "5%%", "abc", "12/03/2024", "$ 1 . 5", "0", "-", "100%B", "B5", "5 €",
+    1, 2.5, 0, -3, np.nan, None, float("nan"),
+]
+
+
+def _celda_por_celda(serie):
+    ternas = [ingestion.extraer_metadata_valor(v) for v in serie]
+    return [list(t) for t in zip(*ternas)]
+
+
+def _iguales(a, b):
+    assert len(a) == len(b)
+    for x, y in zip(a, b):
+        if pd.isna(x) and pd.isna(y):
+            continue
+        assert type(x) is type(y) and x == y, (x, y)
+
+
+def _comparar(valores):
+    serie = pd.Series(valores, dtype=object)
+    esperado = _celda_por_celda(serie)
+    obtenido = ingestion.limpiar_columna(serie)
+    for columna_esperada, columna_obtenida in zip(esperado, obtenido):
+        _iguales(columna_esperada, list(columna_obtenida))
+
+
+def test_casos_conocidos():
+    _comparar(CASOS)
+
+
+def test_columna_solo_texto():
+    _comparar([c for c in CASOS if isinstance(c, str)])
+
+
+@pytest.mark.parametrize("semilla", range(5))
+def test_valores_aleatorios(semilla):
+    azar = random.Random(semilla)
+    alfabeto = "0123456789.,$€£¥%BMKbmk -+ \t"
+    valores = ["".join(azar.choice(alfabeto) for _ in range(azar.randint(0, 8))) for _ in range(2000)]
+    _comparar(valores)
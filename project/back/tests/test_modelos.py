@@ -0,0 +1,39 @@
+"""
+Modelos guardados (parametros.guardar_modelo): el resultado no se memoiza, así
+que el modelo_id de la respuesta siempre existe en el registro.
+"""
+import numpy as np
+import pandas as pd
+
+ANALISIS = "/api/v1/analizar/cuantitativo"
+
+
+def _request(guardar_modelo):
+    return {
+        "filename": "modelos.csv", "tipo_analisis": "regresion_lineal", "columna_y": "y",
+        "columnas_x": ["x"], "parametros": {"guardar_modelo": guardar_modelo},
+    }
+
+
+def test_guardar_modelo_no_reutiliza_un_modelo_eliminado(cliente, subir):
+    x = np.arange(50, dtype=float)
+    assert subir("modelos.csv", pd.DataFrame({"x": x, "y": 2 * x + 1})).status_code == 200
+
+    primera = cliente.post(ANALISIS, json=_request(True))
+    assert primera.status_code == 200
+    assert primera.headers["X-Cache"] == "bypass"
+    modelo_id = primera.json()["modelo_id"]
+    assert cliente.delete(f"/api/v1/modelos/{modelo_id}").status_code == 200
+
+    segunda = cliente.post(ANALISIS, json=_request(True))
+    assert segunda.headers["X-Cache"] == "bypass"
+    nuevo_id = segunda.json()["modelo_id"]
+    assert nuevo_id != modelo_id
+    assert cliente.get(f"/api/v1/modelos/{nuevo_id}").status_code == 200
+
+
+def test_sin_guardar_modelo_se_memoiza(cliente, subir):
+    x = np.arange(50, dtype=float)
+    subir("modelos.csv", pd.DataFrame({"x": x, "y": 2 * x + 1}))
+    assert cliente.post(ANALISIS, json=_request(False)).headers["X-Cache"] == "miss"
+    assert cliente.post(ANALISIS, json=_request(False)).headers["X-Cache"] == "hit"
@@ -0,0 +1,122 @@
+"""
+Pareto: el ranking coincide con el `calcular_pareto` original (value_counts
+completo) y el mismo request da el mismo resultado con cualquier motor
+(MOTOR_CONSULTAS=pandas o duckdb); los empates se ordenan por etiqueta.
+"""
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.core import config
+from app.services import statistics
+
+PARETO = "/api/v1/analizar/pareto"
+
+
+@pytest.fixture(scope="module")
+def empates(cliente):
+    # 'c' aparece antes que 'b' y ambas tienen 183 filas: el orden de aparición no decide el empate
+    conteos = {"z": 600, "c": 183, "b": 183, "a": 20, "d": 20, "e": 5}
+    etiquetas = [e for e, n in conteos.items() for _ in range(n)]
+    df = pd.DataFrame({"categoria": etiquetas, "valor": 1.0, "lote": [i % 4 for i in range(len(etiquetas))]})
+    df = pd.concat([df, df.assign(lote=9)], ignore_index=True)
+    contenido = io.BytesIO()
+    df.to_csv(contenido, index=False)
+    assert cliente.post("/api/v1/upload", files={"file": ("empates.csv", contenido.getvalue(), "text/csv")}).status_code == 200
+    return "empates.csv"
+
+
+@pytest.mark.parametrize("extra", [
+    {},
+    {"filtros": [{"columna": "lote", "op": "<", "valor": 9}]},
+    {"filtros": [{"columna": "lote", "op": "<", "valor": 9}], "columna_valor": "valor"},
+    {"top_n": 2},
+    {"offset": 1, "limit": 2},
+])
+def test_mismo_ranking_en_ambos_motores(monkeypatch, cliente, empates, extra):
+    pytest.importorskip("duckdb")
+    body = {"filename": empates, "columna": "categoria", **extra}
+    respuestas = {}
+    for motor in ("pandas", "duckdb"):
+        monkeypatch.setattr(config, "MOTOR_CONSULTAS", motor)
+        respuesta = cliente.post(PARETO, json=body)
+        assert respuesta.status_code == 200
+        respuestas[motor] = respuesta.json()
+    assert respuestas["pandas"] == respuestas["duckdb"]
+
+
+def test_empates_por_etiqueta(cliente, empates):
+    items = cliente.post(PARETO, json={"filename": empates, "columna": "categoria"}).json()["items"]
+    assert [i["etiqueta"] for i in items] == ["z", "b", "c", "a", "d", "e"]
+
+
+def _pareto_original(serie):
+    """
+    `calcular_pareto` original (ranking completo con value_counts y clase por % acumulado),
+    con los empates ordenados por etiqueta como el actual.
+    """
+    conteos = serie.value_counts()
+    conteos = conteos.iloc[np.lexsort((conteos.index.to_numpy(), -conteos.to_numpy()))]
+    pareto_df = conteos.rename_axis("etiqueta").reset_index(name="frecuencia")
+    total = pareto_df["frecuencia"].sum()
+    pareto_df["porcentaje"] = pareto_df["frecuencia"] / total * 100
+    pareto_df["acumulado"] = pareto_df["porcentaje"].cumsum()
+    pareto_df["clase"] = np.where(pareto_df["acumulado"] <= 80, "A", np.where(pareto_df["acumulado"] <= 95, "B", "C"))
+    return pareto_df.to_dict(orient="records")
+
+
+def _serie_aleatoria(semilla):
+    # 1009 filas (primo): ningún % acumulado cae justo en 80 o 95, donde el float del original redondea distinto
+    azar = np.random.default_rng(semilla)
+    etiquetas = [f"cat{i:03d}" for i in range(azar.integers(5, 300))]
+    return pd.Series(azar.choice(etiquetas, size=1009, p=azar.dirichlet(np.full(len(etiquetas), 0.3))))
+
+
+def _iguales(obtenidos, esperados):
+    assert len(obtenidos) == len(esperados)
+    for obtenido, esperado in zip(obtenidos, esperados):
+        assert (obtenido["etiqueta"], obtenido["frecuencia"], obtenido["clase"]) == (
+            esperado["etiqueta"], esperado["frecuencia"], esperado["clase"])
+        assert obtenido["porcentaje"] == pytest.approx(esperado["porcentaje"])
+        assert obtenido["acumulado"] == pytest.approx(esperado["acumulado"])
+
+
+@pytest.mark.parametrize("semilla", range(10))
+def test_coincide_con_el_pareto_original(semilla):
+    serie = _serie_aleatoria(semilla)
+    esperado = _pareto_original(serie)
+    resultado = statistics.calcular_pareto(pd.DataFrame({"c": serie}), "c")
+    assert resultado["total_categorias"] == len(esperado)
+    assert resultado["otros"] is None
+    _iguales(resultado["items"], esperado)
+
+
+@pytest.mark.parametrize("semilla", range(10))
+def test_paginas_y_otros_son_cortes_del_ranking_original(semilla):
+    serie = _serie_aleatoria(semilla)
+    esperado = _pareto_original(serie)
+    df = pd.DataFrame({"c": serie})
+
+    pagina = statistics.calcular_pareto(df, "c", offset=3, limit=7)
+    _iguales(pagina["items"], esperado[3:10])
+
+    top_n = min(5, len(esperado) - 1)
+    resultado = statistics.calcular_pareto(df, "c", top_n=top_n)
+    _iguales(resultado["items"], esperado[:top_n])
+    resto = pd.DataFrame(esperado[top_n:])
+    otros = {o["clase"]: o for o in resultado["otros"]}
+    for clase, grupo in resto.groupby("clase"):
+        assert otros[clase]["categorias"] == len(grupo)
+        assert otros[clase]["frecuencia"] == grupo["frecuencia"].sum()
+        assert otros[clase]["porcentaje"] == pytest.approx(grupo["porcentaje"].sum())
+    assert set(otros) == set(resto["clase"])
+
+
+def test_ponderado_es_el_pareto_de_la_suma():
+    df = pd.DataFrame({"c": list("aabbbcd"), "v": [5.0, 5.0, 1.0, 1.0, 1.0, 20.0, 0.0]})
+    items = statistics.calcular_pareto(df, "c", columna_valor="v")["items"]
+    assert [(i["etiqueta"], i["frecuencia"], i["valor"]) for i in items] == [
+        ("c", 1, 20.0), ("a", 2, 10.0), ("b", 3, 3.0), ("d", 1, 0.0)]
+    assert [i["clase"] for i in items] == ["A", "B", "C", "C"]
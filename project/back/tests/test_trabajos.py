@@ -0,0 +1,99 @@
+"""
+Trabajos asíncronos (POST /jobs, GET /jobs/{id}, DELETE, SSE en /eventos): los
+suscriptores no pierden cambios y el último evento ('fin') siempre llega.
+"""
+import asyncio
+import json
+
+import numpy as np
+import pandas as pd
+
+from app.schemas.analysis import AnalisisRequest
+from app.services import analysis, jobs
+
+
+def _trabajo():
+    return jobs.Trabajo(AnalisisRequest(filename="x.csv", tipo_analisis="resumen", columnas_x=["a"]))
+
+
+def test_cambio_durante_el_envio_no_se_pierde():
+    async def escenario():
+        trabajo = _trabajo()
+        version = trabajo.version
+        # El trabajo termina mientras el suscriptor todavía envía el evento anterior
+        trabajo.actualizar(estado="completado", etapa="completado", progreso=100)
+        return await trabajo.esperar_cambio(version, timeout=0.05), trabajo.terminado
+
+    assert asyncio.run(escenario()) == (True, True)
+
+
+def test_sin_cambios_vence_el_timeout():
+    async def escenario():
+        trabajo = _trabajo()
+        return await trabajo.esperar_cambio(trabajo.version, timeout=0.05)
+
+    assert asyncio.run(escenario()) is False
+
+
+def _eventos(cliente, job_id):
+    eventos = []
+    with cliente.stream("GET", f"/api/v1/jobs/{job_id}/eventos") as respuesta:
+        assert respuesta.status_code == 200
+        evento = None
+        for linea in respuesta.iter_lines():
+            if linea.startswith("event: "):
+                evento = linea[len("event: "):]
+            elif linea.startswith("data: "):
+                eventos.append((evento, json.loads(linea[len("data: "):])))
+                if evento == "fin":
+                    break
+    return eventos
+
+
+def test_ciclo_de_vida_completo(cliente, subir):
+    subir("trabajos.csv", pd.DataFrame({"a": np.arange(100.0), "b": np.arange(100.0) % 7}))
+    request = {"filename": "trabajos.csv", "tipo_analisis": "resumen", "columnas_x": ["a", "b"]}
+
+    creado = cliente.post("/api/v1/jobs", json=request)
+    assert creado.status_code == 202
+    job_id = creado.json()["job_id"]
+
+    eventos = _eventos(cliente, job_id)
+    evento, datos = eventos[-1]
+    assert evento == "fin"
+    assert datos["estado"] == "completado" and datos["progreso"] == 100
+    assert all(e == "progreso" for e, _ in eventos[:-1])
+
+    directo = cliente.post("/api/v1/analizar/cuantitativo", json=request).json()
+    assert datos["resultado"] == directo
+    estado = cliente.get(f"/api/v1/jobs/{job_id}").json()
+    assert estado["estado"] == "completado" and estado["resultado"] == directo
+    assert job_id in [t["job_id"] for t in cliente.get("/api/v1/jobs").json()]
+
+
+def test_error_del_analisis_llega_como_fin(cliente):
+    creado = cliente.post("/api/v1/jobs", json={"filename": "no_existe.csv", "tipo_analisis": "resumen"})
+    evento, datos = _eventos(cliente, creado.json()["job_id"])[-1]
+    assert evento == "fin"
+    assert (datos["estado"], datos["codigo_error"]) == ("error", 404)
+
+
+def test_cancelar_un_trabajo_en_curso(monkeypatch, cliente):
+    async def lento(request, al_avanzar):
+        al_avanzar("analizando", 40)
+        await asyncio.sleep(30)
+
+    monkeypatch.setattr(analysis, "analizar_memoizado", lento)
+    job_id = cliente.post("/api/v1/jobs", json={"filename": "x.csv", "tipo_analisis": "resumen"}).json()["job_id"]
+
+    cancelado = cliente.delete(f"/api/v1/jobs/{job_id}")
+    assert cancelado.status_code == 200
+    assert cancelado.json()["estado"] == "cancelado"
+    evento, datos = _eventos(cliente, job_id)[-1]
+    assert (evento, datos["estado"]) == ("fin", "cancelado")
+
+
+def test_trabajo_inexistente(cliente):
+    assert cliente.get("/api/v1/jobs/no-existe").status_code == 404
+    assert cliente.delete("/api/v1/jobs/no-existe").status_code == 404
+    assert cliente.get("/api/v1/jobs/no-existe/eventos").status_code == 404